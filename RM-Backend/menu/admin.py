@@ -1,7 +1,8 @@
 # menu/admin.py
 
 from django.contrib import admin
-from .models import Category, MenuItem, MenuItemVariant, Bill, OrderItem, FoodType, Cuisine
+from restromanager.admin_mixins import LargeTableAdminMixin
+from .models import Category, MenuItem, MenuItemVariant, Bill, OrderItem, FoodType, Cuisine, Station
 
 @admin.register(FoodType)
 class FoodTypeAdmin(admin.ModelAdmin):
@@ -17,10 +18,12 @@ class MenuItemVariantInline(admin.TabularInline):
     extra = 1
 
 @admin.register(MenuItem)
-class MenuItemAdmin(admin.ModelAdmin):
+class MenuItemAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     inlines = [MenuItemVariantInline]
     # Add the new 'is_available' field to the list display
     list_display = ('name', 'category', 'restaurant', 'is_available')
+    list_select_related = ('category', 'restaurant')
+    autocomplete_fields = ('restaurant', 'category')
     list_filter = ('restaurant', 'category', 'is_available', 'food_types', 'cuisines')
     search_fields = ('name', 'description')
     
@@ -33,10 +36,25 @@ class MenuItemAdmin(admin.ModelAdmin):
             return qs
         return qs.filter(restaurant=request.user.restaurant)
 
+@admin.register(Station)
+class StationAdmin(admin.ModelAdmin):
+    list_display = ('name', 'slug', 'restaurant')
+    list_filter = ('restaurant',)
+    list_select_related = ('restaurant',)
+    search_fields = ('name',)
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if request.user.is_superuser:
+            return qs
+        return qs.filter(restaurant=request.user.restaurant)
+
 @admin.register(Category)
-class CategoryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'restaurant')
+class CategoryAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    list_display = ('name', 'restaurant', 'station')
     list_filter = ('restaurant',)
+    list_select_related = ('restaurant', 'station')
+    search_fields = ('name',)
+    autocomplete_fields = ('restaurant', 'station')
     def get_queryset(self, request):
         qs = super().get_queryset(request)
         if request.user.is_superuser:
@@ -46,14 +64,22 @@ class CategoryAdmin(admin.ModelAdmin):
 class OrderItemInline(admin.TabularInline):
     model = OrderItem
     extra = 0
-    readonly_fields = ('variant', 'quantity', 'status')
+    # Station is read-only too: as a <select> every line would list all stations
+    readonly_fields = ('variant', 'quantity', 'status', 'station')
+    def get_queryset(self, request):
+        # variant's __str__ reads the menu item name
+        return super().get_queryset(request).select_related('variant__menu_item', 'station')
     def has_delete_permission(self, request, obj=None):
         return False
 
 @admin.register(Bill)
-class BillAdmin(admin.ModelAdmin):
+class BillAdmin(LargeTableAdminMixin, admin.ModelAdmin):
     list_display = ('id', 'customer_name', 'table_number', 'restaurant', 'payment_status', 'created_at')
-    list_filter = ('restaurant', 'payment_status', 'created_at')
+    list_filter = ('restaurant', 'payment_status')
+    list_select_related = ('restaurant',)
+    # Backed by the created_at indexes of Bill
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ('restaurant',)
     inlines = [OrderItemInline]
     def get_queryset(self, request):
         qs = super().get_queryset(request)
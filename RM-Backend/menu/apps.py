@@ -4,3 +4,8 @@ from django.apps import AppConfig
 class MenuConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'menu'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+        # Times the statements of every database connection, web and worker
+        from restromanager import slow_queries  # noqa: F401
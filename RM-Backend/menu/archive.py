@@ -0,0 +1,136 @@
+# menu/archive.py
+
+from collections import Counter
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import ArchivedBill, ArchivedOrderItem, Bill, OrderItem
+
+# Hot/cold storage of bills. PAID bills older than a cutoff are moved, with
+# their items, from Bill/OrderItem into ArchivedBill/ArchivedOrderItem, so
+# the kitchen and cashier lists only work over recent and open bills. The
+# reports and analytics read from both tables through the helpers below.
+
+BILL_FIELDS = (
+    'id', 'restaurant_id', 'customer_name', 'table_number',
+    'payment_status', 'payment_method', 'created_at', 'updated_at',
+)
+ITEM_FIELDS = ('id', 'bill_id', 'variant_id', 'quantity', 'status', 'station_id', 'created_at', 'updated_at')
+
+
+def archive_batch(cutoff, batch_size):
+    """
+    Moves up to `batch_size` PAID bills created before `cutoff` into the
+    archive tables. The copy and the delete run in one transaction, so a
+    bill is always in exactly one of the two tables and an interrupted run
+    can simply be started again. Returns the number of bills moved.
+    """
+    with transaction.atomic():
+        bill_ids = list(
+            Bill.objects.filter(payment_status=Bill.PaymentStatus.PAID, created_at__lt=cutoff)
+            .order_by('id').select_for_update(skip_locked=True)
+            .values_list('id', flat=True)[:batch_size]
+        )
+        if not bill_ids:
+            return 0
+        ArchivedBill.objects.bulk_create([
+            ArchivedBill(**row) for row in Bill.objects.filter(id__in=bill_ids).values(*BILL_FIELDS)
+        ])
+        ArchivedOrderItem.objects.bulk_create([
+            ArchivedOrderItem(**row) for row in OrderItem.objects.filter(bill_id__in=bill_ids).values(*ITEM_FIELDS)
+        ], batch_size=5000)
+        OrderItem.objects.filter(bill_id__in=bill_ids).delete()
+        Bill.objects.filter(id__in=bill_ids).delete()
+    return len(bill_ids)
+
+
+def archive_paid_bills(older_than_days, batch_size=1000):
+    """
+    Archives every PAID bill older than `older_than_days` in batches and
+    yields the number of bills moved by each batch. The cutoff is fixed when
+    the run starts.
+    """
+    cutoff = timezone.now() - timedelta(days=older_than_days)
+    while True:
+        moved = archive_batch(cutoff, batch_size)
+        if not moved:
+            return
+        yield moved
+
+
+def created_on(day):
+    """
+    Same rows as created_at__date=day, as a range the created_at indexes
+    can be used for.
+    """
+    return created_between(day, day)
+
+
+def created_between(first_day, last_day):
+    """Rows created from the start of first_day to the end of last_day, as a range."""
+    start = timezone.make_aware(datetime.combine(first_day, time.min))
+    end = timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min))
+    return {'created_at__gte': start, 'created_at__lt': end}
+
+
+def created_in_month(year, month):
+    """Same rows as created_at__year=year, created_at__month=month, as a range."""
+    start = timezone.make_aware(datetime(year, month, 1))
+    end = timezone.make_aware(datetime(year + month // 12, month % 12 + 1, 1))
+    return {'created_at__gte': start, 'created_at__lt': end}
+
+
+def paid_sales(**filters):
+    """
+    Total of quantity * price of the paid order items matching `filters`
+    (OrderItem lookups such as created_at__date or bill__restaurant), over
+    the live and the archived items.
+    """
+    total_sales = Sum(F('quantity') * F('variant__price'))
+    live = OrderItem.objects.filter(
+        bill__payment_status=Bill.PaymentStatus.PAID, **filters
+    ).aggregate(total_sales=total_sales)['total_sales']
+    # Only PAID bills are archived
+    archived = ArchivedOrderItem.objects.filter(**filters).aggregate(total_sales=total_sales)['total_sales']
+    return (live or 0) + (archived or 0)
+
+
+def bill_count(**filters):
+    """Number of bills matching `filters` (Bill lookups), live and archived."""
+    return Bill.objects.filter(**filters).count() + ArchivedBill.objects.filter(**filters).count()
+
+
+def top_dish(**filters):
+    """
+    'Name (variant)' of the variant sold most among the paid order items
+    matching `filters`, live and archived, or 'N/A' when nothing was sold.
+    """
+    dishes = top_dishes(1, **filters)
+    if not dishes:
+        return "N/A"
+    return dishes[0][0]
+
+
+def top_dishes(limit, **filters):
+    """
+    ('Name (variant)', quantity) of the `limit` variants sold most among the
+    paid order items matching `filters`, live and archived, most sold first.
+    """
+    quantities = Counter()
+    querysets = [
+        OrderItem.objects.filter(bill__payment_status=Bill.PaymentStatus.PAID, **filters),
+        ArchivedOrderItem.objects.filter(**filters),
+    ]
+    for queryset in querysets:
+        rows = queryset.values_list('variant__menu_item__name', 'variant__variant_name').annotate(
+            total_quantity=Sum('quantity')
+        ).order_by()
+        for name, variant_name, total_quantity in rows:
+            quantities[(name, variant_name)] += total_quantity
+    return [
+        (f"{name} ({variant_name})", quantity)
+        for (name, variant_name), quantity in quantities.most_common(limit)
+    ]
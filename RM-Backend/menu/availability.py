@@ -0,0 +1,36 @@
+# menu/availability.py
+
+from django.db import transaction
+
+from .broadcasts import push_menu_availability
+from .menu_cache import bump_menu_version
+from .models import MenuItem
+
+
+def set_availability(restaurant, is_available, item_ids=None, category_id=None, cuisine_id=None):
+    """
+    Marks the menu items of a restaurant selected by ids, category or
+    cuisine as available or not, with one UPDATE. Items that already have
+    that availability are left alone. After commit the restaurant's menu
+    version is bumped (QuerySet.update() sends no signals) and the open
+    public menus get the change. Returns the ids of the changed items.
+    """
+    items = MenuItem.objects.filter(restaurant=restaurant).exclude(is_available=is_available)
+    if item_ids is not None:
+        items = items.filter(id__in=item_ids)
+    if category_id is not None:
+        items = items.filter(category_id=category_id)
+    if cuisine_id is not None:
+        items = items.filter(cuisines=cuisine_id)
+
+    with transaction.atomic():
+        changed_ids = list(items.select_for_update(of=('self',)).order_by('id').values_list('id', flat=True))
+        if not changed_ids:
+            return []
+        MenuItem.objects.filter(id__in=changed_ids).update(is_available=is_available)
+
+        def publish():
+            bump_menu_version(restaurant.id)
+            push_menu_availability(restaurant, changed_ids, is_available)
+        transaction.on_commit(publish)
+    return changed_ids
@@ -0,0 +1,219 @@
+# menu/broadcasts.py
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db.models import F, Sum
+
+from .models import Bill, MenuItem, Station
+from .presence import groups_with_listeners, has_listeners, listener_counts
+from .serializers import PublicMenuItemSerializer
+
+
+def cashier_group_name(restaurant_slug):
+    return f'cashier_notifications_{restaurant_slug}'
+
+
+def chef_group_name(restaurant_slug, station_slug=None):
+    """
+    The whole-kitchen group when no station is given (tablets that show
+    every ticket), otherwise the group of one station.
+    """
+    if station_slug is None:
+        return f'chef_notifications_{restaurant_slug}'
+    return f'chef_{restaurant_slug}_{station_slug}'
+
+
+def customer_group_name(bill_id):
+    return f'customer_{bill_id}'
+
+
+def menu_group_name(restaurant_slug):
+    return f'menu_{restaurant_slug}'
+
+
+def connected_screens(restaurant):
+    """
+    How many chef, station, cashier and customer screens of a restaurant
+    are connected right now, from the presence registry.
+    """
+    station_slugs = list(Station.objects.filter(restaurant=restaurant).values_list('slug', flat=True))
+    bill_ids = list(Bill.objects.filter(
+        restaurant=restaurant, payment_status=Bill.PaymentStatus.PENDING
+    ).values_list('id', flat=True))
+    chef_group = chef_group_name(restaurant.slug)
+    cashier_group = cashier_group_name(restaurant.slug)
+    station_groups = {slug: chef_group_name(restaurant.slug, slug) for slug in station_slugs}
+    customer_groups = [customer_group_name(bill_id) for bill_id in bill_ids]
+
+    counts = listener_counts([chef_group, cashier_group, *station_groups.values(), *customer_groups])
+    watched_bills = [group for group in customer_groups if counts[group]]
+    return {
+        'chef': counts[chef_group],
+        'stations': {slug: counts[group] for slug, group in station_groups.items()},
+        'cashier': counts[cashier_group],
+        'customers': sum(counts[group] for group in watched_bills),
+        'bills_watched': len(watched_bills),
+    }
+
+
+def chef_ticket_items(order_items):
+    """The item list of a chef ticket, for OrderItems with their variant loaded."""
+    return [{
+        'order_item_id': item.id, 'name': item.variant.menu_item.name,
+        'variant': item.variant.variant_name, 'quantity': item.quantity
+    } for item in order_items]
+
+
+def broadcast_new_order(restaurant_slug, bill, order_items, sequence=None):
+    """
+    Sends a new ticket to the kitchen. The whole-kitchen group gets every
+    item; each station group only gets the items of its own station, so a
+    station tablet never receives (or renders) other stations' tickets.
+    Groups nobody is connected to are skipped. Returns the ticket items.
+    `sequence` is the number of the OrderEvent being published, if any.
+    """
+    items = chef_ticket_items(order_items)
+    channel_layer = get_channel_layer()
+
+    def send(group_name, ticket_items):
+        data = {
+            'bill_id': bill.id, 'customer_name': bill.customer_name,
+            'table_number': bill.table_number, 'items': ticket_items
+        }
+        if sequence is not None:
+            data['sequence'] = sequence
+        async_to_sync(channel_layer.group_send)(group_name, {'type': 'send.new.order', 'data': data})
+
+    tickets = {chef_group_name(restaurant_slug): items}
+    station_ids = {item.station_id for item in order_items if item.station_id}
+    if station_ids:
+        station_slugs = dict(Station.objects.filter(id__in=station_ids).values_list('id', 'slug'))
+        for item, ticket_item in zip(order_items, items):
+            if item.station_id:
+                group_name = chef_group_name(restaurant_slug, station_slugs[item.station_id])
+                tickets.setdefault(group_name, []).append(ticket_item)
+
+    for group_name in groups_with_listeners(tickets):
+        send(group_name, tickets[group_name])
+    return items
+
+
+def pending_bills_queryset(restaurant):
+    """
+    PENDING bills of one restaurant, oldest first, with the bill total
+    computed by the database instead of in Python.
+    """
+    return Bill.objects.filter(
+        restaurant=restaurant,
+        payment_status=Bill.PaymentStatus.PENDING
+    ).annotate(
+        total_amount=Sum(F('order_items__quantity') * F('order_items__variant__price'))
+    ).order_by('created_at')
+
+
+def _compact_bill(row):
+    return {
+        'id': row['id'],
+        'customer_name': row['customer_name'],
+        'table_number': row['table_number'],
+        'created_at': row['created_at'].isoformat(),
+        'total_price': float(row['total_amount'] or 0),
+        'item_count': row['item_count'] or 0,
+    }
+
+
+def _compact_bill_rows(bills):
+    return bills.values(
+        'id', 'customer_name', 'table_number', 'created_at'
+    ).annotate(
+        item_count=Sum('order_items__quantity'),
+        total_amount=Sum(F('order_items__quantity') * F('order_items__variant__price')),
+    )
+
+
+def pending_bills_snapshot(restaurant_slug):
+    """
+    The compact list of PENDING bills a cashier screen receives on connect.
+    """
+    rows = _compact_bill_rows(Bill.objects.filter(
+        restaurant__slug=restaurant_slug,
+        payment_status=Bill.PaymentStatus.PENDING
+    )).order_by('created_at')
+    return {
+        'type': 'pending_bills_snapshot',
+        'bills': [_compact_bill(row) for row in rows],
+    }
+
+
+def _send_cashier_delta(restaurant_slug, data):
+    channel_layer = get_channel_layer()
+    async_to_sync(channel_layer.group_send)(
+        cashier_group_name(restaurant_slug),
+        {'type': 'cashier.bill.delta', 'data': data}
+    )
+
+
+def push_bill_to_cashier(bill, event='bill_added', sequence=None):
+    """
+    Pushes the compact summary of one bill after it was created
+    ('bill_added') or had items added to it ('bill_updated').
+    """
+    if not has_listeners(cashier_group_name(bill.restaurant.slug)):
+        return
+    row = _compact_bill_rows(Bill.objects.filter(id=bill.id)).first()
+    if row is None:
+        return
+    data = {'type': event, 'bill': _compact_bill(row)}
+    if sequence is not None:
+        data['sequence'] = sequence
+    _send_cashier_delta(bill.restaurant.slug, data)
+
+
+def push_bills_paid_to_cashier(restaurant_slug, bill_ids, sequence=None):
+    """
+    Tells every cashier screen of the restaurant to drop the settled bills.
+    """
+    if not bill_ids or not has_listeners(cashier_group_name(restaurant_slug)):
+        return
+    data = {'type': 'bill_paid', 'bill_ids': list(bill_ids)}
+    if sequence is not None:
+        data['sequence'] = sequence
+    _send_cashier_delta(restaurant_slug, data)
+
+
+def close_customer_bills(bill_ids):
+    """
+    Sends the final 'bill_closed' event to the screens of settled bills;
+    the consumers then close, which removes them from the bill's group.
+    """
+    groups = groups_with_listeners(customer_group_name(bill_id) for bill_id in bill_ids)
+    if not groups:
+        return
+    channel_layer = get_channel_layer()
+    for bill_id in bill_ids:
+        group_name = customer_group_name(bill_id)
+        if group_name in groups:
+            async_to_sync(channel_layer.group_send)(group_name, {'type': 'bill.closed', 'bill_id': bill_id})
+
+
+def is_bill_open(bill_id):
+    return Bill.objects.filter(id=bill_id, payment_status=Bill.PaymentStatus.PENDING).exists()
+
+
+def push_menu_availability(restaurant, item_ids, is_available):
+    """
+    Tells the open public menus of a restaurant that items were taken off
+    ('unavailable_ids') or put back on ('available_items'). Items put back
+    are sent whole, since the menu the customer loaded does not have them.
+    """
+    group_name = menu_group_name(restaurant.slug)
+    if not item_ids or not has_listeners(group_name):
+        return
+    if is_available:
+        items = MenuItem.objects.filter(
+            id__in=item_ids, is_available=True
+        ).order_by('id').prefetch_related('variants', 'food_types', 'cuisines')
+        data = {'type': 'menu_availability', 'available_items': PublicMenuItemSerializer(items, many=True).data}
+    else:
+        data = {'type': 'menu_availability', 'unavailable_ids': list(item_ids)}
+    async_to_sync(get_channel_layer().group_send)(group_name, {'type': 'menu.availability', 'data': data})
@@ -1,56 +1,130 @@
 # menu/consumers.py
 
-import json
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from django.conf import settings
 from channels.generic.websocket import AsyncWebsocketConsumer
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import InvalidToken
+
+from restaurants.models import Restaurant
+
+from .broadcasts import cashier_group_name, chef_group_name, customer_group_name, is_bill_open, menu_group_name, pending_bills_snapshot
+from .framing import FramedConsumerMixin
+from .kitchen_queue import queue_update_message
+from .outbound import OutboundQueueMixin
+from .presence import PresenceConsumerMixin
 
-class ChefConsumer(AsyncWebsocketConsumer):
+def cashier_restaurant_slug(query_string):
+    """
+    The slug of the restaurant whose cashier screen the access token in
+    ?token= may open, with the rules of IsCashierOrAdmin and
+    get_user_restaurant, or None. Browsers cannot send an Authorization
+    header with a WebSocket, hence the query parameter.
+    """
+    token = parse_qs(query_string.decode()).get('token', [None])[0]
+    if not token:
+        return None
+    authentication = JWTAuthentication()
+    try:
+        validated_token = authentication.get_validated_token(token)
+        user = authentication.get_user(validated_token)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    user_role = getattr(user, 'role', None)
+    if user_role not in ('ADMIN', 'CASHIER') and validated_token.get('role') != 'CASHIER':
+        return None
+    restaurant = getattr(user, 'restaurant', None)
+    if restaurant is not None:
+        return restaurant.slug
+    return Restaurant.objects.filter(id=validated_token.get('restaurant_id')).values_list('slug', flat=True).first()
+
+
+class ChefConsumer(PresenceConsumerMixin, OutboundQueueMixin, FramedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.restaurant_slug = self.scope['url_route']['kwargs']['restaurant_slug']
-        self.group_name = f'chef_notifications_{self.restaurant_slug}'
+        # Station tablets (ws/chef/<slug>/<station>/) only join their station's group
+        self.station_slug = self.scope['url_route']['kwargs'].get('station_slug')
+        self.group_name = chef_group_name(self.restaurant_slug, self.station_slug)
 
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.accept_framed()
+        await self.track_presence(self.group_name)
 
     async def disconnect(self, close_code):
+        await self.untrack_presence()
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     # This method is called when a message with 'type': 'send.new.order' is sent to the group
     async def send_new_order(self, event):
         order_data = event['data']
-        await self.send(text_data=json.dumps(order_data))
+        await self.send_event(order_data)
         
-class CashierConsumer(AsyncWebsocketConsumer):
+class CashierConsumer(PresenceConsumerMixin, OutboundQueueMixin, FramedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         self.restaurant_slug = self.scope['url_route']['kwargs']['restaurant_slug']
-        self.group_name = f'cashier_notifications_{self.restaurant_slug}'
+        self.group_name = cashier_group_name(self.restaurant_slug)
+
+        # The snapshot and the deltas carry every open bill, so only the
+        # restaurant's own cashiers and admins get past the handshake
+        allowed_slug = await database_sync_to_async(cashier_restaurant_slug)(self.scope.get('query_string', b''))
+        if allowed_slug != self.restaurant_slug:
+            await self.close()
+            return
 
         await self.channel_layer.group_add(self.group_name, self.channel_name)
-        await self.accept()
+        await self.accept_framed()
+        await self.track_presence(self.group_name)
+
+        # Send the current pending bills once; after this the screen only
+        # receives deltas and never has to poll the REST list.
+        snapshot = await database_sync_to_async(pending_bills_snapshot)(self.restaurant_slug)
+        await self.send_event(snapshot)
 
     async def disconnect(self, close_code):
+        await self.untrack_presence()
         await self.channel_layer.group_discard(self.group_name, self.channel_name)
 
     # This method is called when an order is ready for payment
     async def order_ready_for_payment(self, event):
         order_data = event['data']
-        await self.send(text_data=json.dumps(order_data))
+        await self.send_event(order_data)
+
+    # Called with 'type': 'cashier.bill.delta' for bill_added, bill_updated and bill_paid
+    async def cashier_bill_delta(self, event):
+        await self.send_event(event['data'])
 
 
-class CustomerConsumer(AsyncWebsocketConsumer):
+class CustomerConsumer(PresenceConsumerMixin, OutboundQueueMixin, FramedConsumerMixin, AsyncWebsocketConsumer):
     async def connect(self):
         
         self.bill_id = self.scope['url_route']['kwargs']['bill_id']
-        self.group_name = f'customer_{self.bill_id}'
+        self.group_name = customer_group_name(self.bill_id)
 
         # Join the correct room group
         await self.channel_layer.group_add(
             self.group_name,
             self.channel_name
         )
-        await self.accept()
+        await self.accept_framed()
         # --- END OF FIX ---
 
+        # A bill that was settled before the page connected is closed at once
+        if not await database_sync_to_async(is_bill_open)(self.bill_id):
+            await self.bill_closed({'bill_id': int(self.bill_id)})
+            return
+        await self.track_presence(self.group_name)
+        self.start_idle_reaper(getattr(settings, 'WS_CUSTOMER_IDLE_SECONDS', 60 * 60))
+
+        # Tell the customer where their order is in the kitchen queue
+        queue_update = await database_sync_to_async(queue_update_message)(self.bill_id)
+        if queue_update is not None:
+            await self.send_event(queue_update)
+
     async def disconnect(self, close_code):
+        await self.untrack_presence()
         # Discard from the correct group name
         await self.channel_layer.group_discard(
             self.group_name,
@@ -61,9 +135,37 @@ class CustomerConsumer(AsyncWebsocketConsumer):
     # with {'type': 'order_status_update', ...}
     async def order_status_update(self, event):
         # The event itself is the message, so we send it directly.
-        await self.send(text_data=json.dumps(event))
+        await self.send_event(event)
 
     # This handles the old message format for backward compatibility
     async def send_status_update(self, event):
         data = event['data']
-        await self.send(text_data=json.dumps(data))
\ No newline at end of file
+        await self.send_event(data)
+
+    # Sent with {'type': 'bill.closed'} once the bill is paid; this is the
+    # last event of the connection
+    async def bill_closed(self, event):
+        await self.send_final_event({'type': 'bill_closed', 'bill_id': event['bill_id']}, 1000)
+
+
+class MenuConsumer(PresenceConsumerMixin, OutboundQueueMixin, FramedConsumerMixin, AsyncWebsocketConsumer):
+    """
+    Open public menus of a restaurant. The menu itself comes from the REST
+    list; this connection only delivers availability changes afterwards.
+    """
+    async def connect(self):
+        self.restaurant_slug = self.scope['url_route']['kwargs']['restaurant_slug']
+        self.group_name = menu_group_name(self.restaurant_slug)
+
+        await self.channel_layer.group_add(self.group_name, self.channel_name)
+        await self.accept_framed()
+        await self.track_presence(self.group_name)
+        self.start_idle_reaper(getattr(settings, 'WS_CUSTOMER_IDLE_SECONDS', 60 * 60))
+
+    async def disconnect(self, close_code):
+        await self.untrack_presence()
+        await self.channel_layer.group_discard(self.group_name, self.channel_name)
+
+    # Called with 'type': 'menu.availability' when items are taken off or put back on
+    async def menu_availability(self, event):
+        await self.send_event(event['data'])
@@ -0,0 +1,112 @@
+# menu/fast_serializers.py
+
+import heapq
+from operator import itemgetter
+
+from rest_framework import serializers
+
+from .models import ArchivedOrderItem, OrderItem
+
+# The fast read path for the large staff lists. Bills and their items are
+# fetched as flat rows with values()/values_list() and grouped with dicts,
+# instead of building model instances and running the nested ModelSerializers
+# for every line. The output matches KitchenOrderSerializer,
+# CashierBillSerializer and RestaurantOrderListSerializer exactly; the field
+# instances below do the same datetime and Decimal formatting as theirs.
+
+_datetime = serializers.DateTimeField()
+_price = serializers.DecimalField(max_digits=10, decimal_places=2)
+
+
+def _bill_rows(bills, fields):
+    # prefetch_related() of the serializer querysets does not apply to values()
+    return list(bills.prefetch_related(None).values(*fields))
+
+
+def _items_by_bill(bill_ids, fields, item_filter=None, item_model=OrderItem):
+    items = item_model.objects.filter(bill_id__in=bill_ids)
+    if item_filter:
+        items = items.filter(**item_filter)
+    grouped = {bill_id: [] for bill_id in bill_ids}
+    for row in items.order_by('id').values_list('bill_id', *fields):
+        grouped[row[0]].append(row[1:])
+    return grouped
+
+
+def kitchen_orders(bills, item_filter=None):
+    """Same output as KitchenOrderSerializer(bills, many=True).data."""
+    rows = _bill_rows(bills, ('id', 'table_number', 'customer_name', 'created_at'))
+    items = _items_by_bill(
+        [row['id'] for row in rows],
+        ('id', 'variant__menu_item__name', 'variant__variant_name', 'quantity', 'status'),
+        item_filter
+    )
+    return [{
+        'id': row['id'],
+        'table_number': row['table_number'],
+        'customer_name': row['customer_name'],
+        'created_at': _datetime.to_representation(row['created_at']),
+        'order_items': [{
+            'id': item_id, 'name': name, 'variant_name': variant_name,
+            'quantity': quantity, 'status': item_status
+        } for item_id, name, variant_name, quantity, item_status in items[row['id']]],
+    } for row in rows]
+
+
+def _priced_items(bill_ids, item_model=OrderItem):
+    items = _items_by_bill(
+        bill_ids, ('variant__menu_item__name', 'variant__variant_name', 'quantity', 'variant__price'),
+        item_model=item_model
+    )
+    payload, totals = {}, {}
+    for bill_id, bill_items in items.items():
+        payload[bill_id] = [{
+            'name': name, 'variant_name': variant_name,
+            'quantity': quantity, 'price': _price.to_representation(price)
+        } for name, variant_name, quantity, price in bill_items]
+        totals[bill_id] = sum(price * quantity for _, _, quantity, price in bill_items)
+    return payload, totals
+
+
+def cashier_bills(bills):
+    """Same output as CashierBillSerializer(bills, many=True).data."""
+    rows = _bill_rows(bills, ('id', 'customer_name', 'table_number', 'payment_status', 'created_at'))
+    items, totals = _priced_items([row['id'] for row in rows])
+    return [{
+        'id': row['id'],
+        'customer_name': row['customer_name'],
+        'table_number': row['table_number'],
+        'payment_status': row['payment_status'],
+        'created_at': _datetime.to_representation(row['created_at']),
+        'order_items': items[row['id']],
+        'total_price': totals[row['id']],
+    } for row in rows]
+
+
+def restaurant_orders(bills, archived_bills=None):
+    """
+    Same output as RestaurantOrderListSerializer(bills, many=True).data.
+
+    With `archived_bills` (an ArchivedBill queryset), those bills are listed
+    too. Both querysets must be ordered newest first; the result is as well.
+    """
+    fields = ('id', 'customer_name', 'table_number', 'payment_status', 'payment_method', 'created_at')
+    rows = _bill_rows(bills, fields)
+    items, totals = _priced_items([row['id'] for row in rows])
+    if archived_bills is not None:
+        archived_rows = _bill_rows(archived_bills, fields)
+        # Archived bills keep their ids, so they never clash with live ones
+        archived_items, archived_totals = _priced_items([row['id'] for row in archived_rows], ArchivedOrderItem)
+        items.update(archived_items)
+        totals.update(archived_totals)
+        rows = list(heapq.merge(rows, archived_rows, key=itemgetter('created_at'), reverse=True))
+    return [{
+        'id': row['id'],
+        'customer_name': row['customer_name'],
+        'table_number': row['table_number'],
+        'payment_status': row['payment_status'],
+        'payment_method': row['payment_method'],
+        'created_at': _datetime.to_representation(row['created_at']),
+        'total_price': totals[row['id']],
+        'order_items': items[row['id']],
+    } for row in rows]
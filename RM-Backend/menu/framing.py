@@ -0,0 +1,104 @@
+# menu/framing.py
+
+import json
+
+import msgpack
+
+# Clients that offer this subprotocol on connect get binary msgpack frames
+MSGPACK_SUBPROTOCOL = 'msgpack'
+
+# Long field name -> short key used in msgpack frames. Keys that are not
+# listed are sent unchanged, so new fields never break older clients.
+# Frontends keep the reverse map to restore the JSON field names.
+COMPACT_KEYS = {
+    'type': 't',
+    'data': 'd',
+    'id': 'i',
+    'bill_id': 'b',
+    'bill_ids': 'bs',
+    'bill': 'bl',
+    'bills': 'bb',
+    'order_item_id': 'oi',
+    'customer_name': 'cn',
+    'table_number': 'tn',
+    'items': 'it',
+    'name': 'n',
+    'item_name': 'in',
+    'variant': 'v',
+    'variant_name': 'vn',
+    'quantity': 'q',
+    'price': 'p',
+    'status': 's',
+    'preparation_time': 'pt',
+    'queue_position': 'qp',
+    'items_ahead': 'ia',
+    'estimated_wait_minutes': 'ew',
+    'estimated_ready_at': 'er',
+    'created_at': 'ca',
+    'total_price': 'tp',
+    'totalAmount': 'ta',
+    'item_count': 'ic',
+    'available_items': 'ai',
+    'unavailable_ids': 'ui',
+}
+EXPANDED_KEYS = {short: key for key, short in COMPACT_KEYS.items()}
+
+
+def compact(value):
+    """Renames the keys of an event (recursively) to their short form."""
+    if isinstance(value, dict):
+        return {COMPACT_KEYS.get(key, key): compact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [compact(item) for item in value]
+    return value
+
+
+def expand(value):
+    """The reverse of `compact`, for frames received from msgpack clients."""
+    if isinstance(value, dict):
+        return {EXPANDED_KEYS.get(key, key): expand(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand(item) for item in value]
+    return value
+
+
+def encode_msgpack(event):
+    return msgpack.packb(compact(event), use_bin_type=True)
+
+
+def encode_json(event):
+    return json.dumps(event)
+
+
+def decode_frame(text_data=None, bytes_data=None):
+    """A frame sent by a client as a dict, or None if it cannot be read."""
+    try:
+        if bytes_data is not None:
+            message = expand(msgpack.unpackb(bytes_data))
+        else:
+            message = json.loads(text_data)
+    except (ValueError, TypeError, msgpack.UnpackException):
+        return None
+    return message if isinstance(message, dict) else None
+
+
+class FramedConsumerMixin:
+    """
+    Negotiates the frame format of a WebSocket consumer. Clients that list
+    'msgpack' in their subprotocols receive binary frames with the compact
+    field names above; everyone else keeps receiving JSON text frames.
+    """
+    use_msgpack = False
+
+    async def accept_framed(self):
+        if MSGPACK_SUBPROTOCOL in self.scope.get('subprotocols', ()):
+            self.use_msgpack = True
+            await self.accept(subprotocol=MSGPACK_SUBPROTOCOL)
+        else:
+            await self.accept()
+
+    async def send_event(self, event):
+        if self.use_msgpack:
+            await self.send(bytes_data=encode_msgpack(event))
+        else:
+            await self.send(text_data=encode_json(event))
@@ -0,0 +1,127 @@
+# menu/idempotency.py
+
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+def _ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL_SECONDS', 24 * 60 * 60))
+
+
+def _fingerprint(data):
+    payload = json.dumps(data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _scope(view, request, kwargs):
+    """
+    The namespace of a key: the view, its URL kwargs and who is calling, so
+    staff of two restaurants sending the same key never share a response.
+    """
+    parts = [view.__class__.__name__] + [f'{name}={kwargs[name]}' for name in sorted(kwargs)]
+    if request.user and request.user.is_authenticated:
+        parts.append(f'user={request.user.pk}')
+    restaurant_id = request.auth.get('restaurant_id') if request.auth else None
+    if restaurant_id is not None:
+        parts.append(f'restaurant={restaurant_id}')
+    return ':'.join(parts)
+
+
+def _claim(scope, key, fingerprint):
+    """
+    Gets or creates the row for (scope, key) and locks it until the end of
+    the surrounding transaction.
+
+    A concurrent duplicate blocks on the unique (scope, key) index until the
+    first request commits, so only one of them ever runs the view.
+    """
+    now = timezone.now()
+    record, created = IdempotencyKey.objects.select_for_update().get_or_create(
+        scope=scope,
+        key=key,
+        defaults={'request_fingerprint': fingerprint, 'expires_at': now + _ttl()}
+    )
+    if not created and record.expires_at <= now:
+        # An expired key is treated like a new one
+        record.request_fingerprint = fingerprint
+        record.response_status = None
+        record.response_body = None
+        record.expires_at = now + _ttl()
+        record.save()
+        created = True
+    return record, created
+
+
+def idempotent(view_method):
+    """
+    Makes an APIView `post` safe to retry when the client sends an
+    Idempotency-Key header. Requests without the header behave as before.
+
+    The first 2xx response is stored and replayed for every later request
+    with the same key; error responses are not stored so the client can fix
+    the request and try again with the same key.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key:
+            return view_method(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{IDEMPOTENCY_HEADER} must be at most {MAX_KEY_LENGTH} characters.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        scope = _scope(self, request, kwargs)
+        fingerprint = _fingerprint(request.data)
+
+        with transaction.atomic():
+            record, created = _claim(scope, key, fingerprint)
+            if not created:
+                if record.request_fingerprint != fingerprint:
+                    return Response(
+                        {'error': f'{IDEMPOTENCY_HEADER} was already used for a different request.'},
+                        status=status.HTTP_422_UNPROCESSABLE_ENTITY
+                    )
+                if record.response_status is not None:
+                    return Response(
+                        record.response_body,
+                        status=record.response_status,
+                        headers={REPLAYED_HEADER: 'true'}
+                    )
+
+            response = view_method(self, request, *args, **kwargs)
+
+            if status.is_success(response.status_code):
+                record.response_status = response.status_code
+                record.response_body = response.data
+                record.save(update_fields=['response_status', 'response_body'])
+            else:
+                record.delete()
+            return response
+
+    return wrapper
+
+
+def purge_expired_keys():
+    """
+    Deletes the stored responses whose TTL has passed. Returns the number
+    of deleted keys.
+    """
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
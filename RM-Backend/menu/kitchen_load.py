@@ -0,0 +1,133 @@
+# menu/kitchen_load.py
+
+from django.db.models import F, Sum
+from django.db.models.functions import Coalesce
+from rest_framework import status
+from rest_framework.response import Response
+
+from restaurants.models import Restaurant
+from .kitchen_queue import OUTSTANDING_STATUSES, get_kitchen_queue_settings
+from .models import Bill, KitchenLoad, OrderItem
+
+
+def _outstanding_totals(order_items):
+    # A line of quantity 3 is three dishes for the kitchen
+    totals = order_items.filter(status__in=OUTSTANDING_STATUSES).aggregate(
+        items=Coalesce(Sum('quantity'), 0),
+        minutes=Coalesce(Sum(F('quantity') * F('variant__preparation_time')), 0),
+    )
+    return totals['items'], totals['minutes']
+
+
+def rebuild_kitchen_load(restaurant_id):
+    """
+    Recomputes the counters of one restaurant from OrderItem. Only used to
+    create the row and by the rebuild_kitchen_load command.
+    """
+    items, minutes = _outstanding_totals(OrderItem.objects.filter(
+        bill__restaurant_id=restaurant_id,
+        bill__payment_status=Bill.PaymentStatus.PENDING
+    ))
+    KitchenLoad.objects.update_or_create(
+        restaurant_id=restaurant_id,
+        defaults={'outstanding_items': items, 'outstanding_minutes': minutes}
+    )
+    return items, minutes
+
+
+def get_kitchen_load(restaurant_id):
+    """Returns (outstanding_items, outstanding_minutes) with one primary-key lookup."""
+    row = KitchenLoad.objects.filter(restaurant_id=restaurant_id).values_list(
+        'outstanding_items', 'outstanding_minutes'
+    ).first()
+    if row is None:
+        return rebuild_kitchen_load(restaurant_id)
+    return row
+
+
+def _change_load(restaurant_id, items, minutes):
+    if not items and not minutes:
+        return
+    updated = KitchenLoad.objects.filter(restaurant_id=restaurant_id).update(
+        outstanding_items=F('outstanding_items') + items,
+        outstanding_minutes=F('outstanding_minutes') + minutes
+    )
+    if not updated:
+        # First change for this restaurant: the rebuild already counts it
+        rebuild_kitchen_load(restaurant_id)
+
+
+def add_items(restaurant_id, order_items):
+    """Counts freshly created OrderItems (with their variant loaded)."""
+    _change_load(
+        restaurant_id,
+        sum(item.quantity for item in order_items),
+        sum(item.quantity * item.variant.preparation_time for item in order_items)
+    )
+
+
+def apply_status_change(restaurant_id, order_item, old_status):
+    """
+    Called with the item and its bill locked, so a bill paid at the same
+    time is either still PENDING here or already taken off.
+    """
+    if order_item.bill.payment_status != Bill.PaymentStatus.PENDING:
+        # Items of paid bills were already taken off by remove_bills
+        return
+    was_outstanding = old_status in OUTSTANDING_STATUSES
+    is_outstanding = order_item.status in OUTSTANDING_STATUSES
+    if was_outstanding == is_outstanding:
+        return
+    sign = 1 if is_outstanding else -1
+    _change_load(
+        restaurant_id,
+        sign * order_item.quantity,
+        sign * order_item.quantity * order_item.variant.preparation_time
+    )
+
+
+def remove_bills(restaurant_id, bill_ids):
+    """Drops the outstanding items of bills that were just paid."""
+    if not bill_ids:
+        return
+    items, minutes = _outstanding_totals(OrderItem.objects.filter(bill_id__in=bill_ids))
+    _change_load(restaurant_id, -items, -minutes)
+
+
+def quoted_wait_minutes(outstanding_minutes):
+    parallel_cooks = max(1, get_kitchen_queue_settings()['PARALLEL_COOKS'])
+    return -(-outstanding_minutes // parallel_cooks)
+
+
+def check_kitchen_capacity(restaurant, accept_wait=False, override=False):
+    """
+    Returns None when a new order may go to the kitchen, otherwise the
+    response to send instead of inserting it.
+
+    With the QUOTE policy the customer gets a 409 with the quoted wait and
+    can place the order anyway by sending `accept_wait: true`. With the
+    REJECT policy the order is refused with 503. Captains may pass
+    `override_capacity: true` to skip the check.
+    """
+    if restaurant.kitchen_capacity is None or override:
+        return None
+    items, minutes = get_kitchen_load(restaurant.id)
+    load = minutes if restaurant.kitchen_capacity_unit == Restaurant.CapacityUnit.MINUTES else items
+    if load < restaurant.kitchen_capacity:
+        return None
+
+    quoted_wait = quoted_wait_minutes(minutes)
+    if restaurant.kitchen_overload_policy == Restaurant.OverloadPolicy.QUOTE:
+        if accept_wait:
+            return None
+        return Response({
+            'error': 'The kitchen is very busy right now.',
+            'quoted_wait_minutes': quoted_wait,
+            'hint': 'Send the order again with "accept_wait": true to place it anyway.'
+        }, status=status.HTTP_409_CONFLICT)
+
+    return Response(
+        {'error': 'The kitchen is not taking new orders right now.', 'quoted_wait_minutes': quoted_wait},
+        status=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={'Retry-After': str(min(600, 60 * max(1, quoted_wait)))}
+    )
@@ -0,0 +1,295 @@
+# menu/kitchen_queue.py
+
+import threading
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Bill, OrderItem
+
+OUTSTANDING_STATUSES = (OrderItem.OrderStatus.PENDING, OrderItem.OrderStatus.ACCEPTED)
+
+DEFAULTS = {
+    # How many items the kitchen prepares at the same time
+    'PARALLEL_COOKS': 3,
+    # Each worker process only sees its own order and status changes, so
+    # the queue is rebuilt from the database at most this often
+    'RESYNC_SECONDS': 300,
+}
+
+
+def get_kitchen_queue_settings():
+    return {**DEFAULTS, **getattr(settings, 'KITCHEN_QUEUE', {})}
+
+
+class FenwickTree:
+    """Prefix sums over a fixed number of slots, O(log n) per operation."""
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0] * (size + 1)
+
+    def add(self, index, delta):
+        index += 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix(self, index):
+        """Sum of slots 0..index (inclusive)."""
+        index += 1
+        total = 0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+
+class KitchenQueue:
+    """
+    The outstanding (PENDING or ACCEPTED) items of one restaurant in arrival
+    order. Every item gets the next slot number; three Fenwick trees over
+    the slots hold the prep minutes, the item count and the first slot of
+    every bill, so the wait and the queue position of a bill are prefix sums.
+    """
+
+    def __init__(self, parallel_cooks=1, size=64):
+        self.parallel_cooks = max(1, parallel_cooks)
+        self.lock = threading.Lock()
+        self.built_at = time.monotonic()
+        self._items = {}        # order_item_id -> (slot, bill_id, minutes)
+        self._bill_slots = {}   # bill_id -> sorted list of outstanding slots
+        self._slot_items = {}   # slot -> order_item_id
+        self._next_slot = 0
+        self._reset_trees(size)
+
+    def _reset_trees(self, size):
+        self._minutes = FenwickTree(size)
+        self._counts = FenwickTree(size)
+        self._bill_heads = FenwickTree(size)
+
+    def _compact(self):
+        """Renumbers the outstanding items from slot 0 when slots run out."""
+        items = sorted(self._items.items(), key=lambda entry: entry[1][0])
+        self._items = {}
+        self._bill_slots = {}
+        self._slot_items = {}
+        self._next_slot = 0
+        self._reset_trees(max(64, 2 * len(items)))
+        for order_item_id, (_, bill_id, minutes) in items:
+            self._insert(order_item_id, bill_id, minutes)
+
+    def _insert(self, order_item_id, bill_id, minutes):
+        if self._next_slot >= self._minutes.size:
+            self._compact()
+        slot = self._next_slot
+        self._next_slot += 1
+        self._items[order_item_id] = (slot, bill_id, minutes)
+        self._slot_items[slot] = order_item_id
+        self._minutes.add(slot, minutes)
+        self._counts.add(slot, 1)
+        slots = self._bill_slots.setdefault(bill_id, [])
+        if not slots:
+            self._bill_heads.add(slot, 1)
+        slots.append(slot)
+
+    def add(self, order_item_id, bill_id, minutes):
+        if order_item_id not in self._items:
+            self._insert(order_item_id, bill_id, minutes)
+
+    def remove(self, order_item_id):
+        entry = self._items.pop(order_item_id, None)
+        if entry is None:
+            return
+        slot, bill_id, minutes = entry
+        del self._slot_items[slot]
+        self._minutes.add(slot, -minutes)
+        self._counts.add(slot, -1)
+        slots = self._bill_slots[bill_id]
+        if slots[0] == slot:
+            self._bill_heads.add(slot, -1)
+            if len(slots) > 1:
+                self._bill_heads.add(slots[1], 1)
+        slots.remove(slot)
+        if not slots:
+            del self._bill_slots[bill_id]
+
+    def remove_bill(self, bill_id):
+        for slot in list(self._bill_slots.get(bill_id, ())):
+            self.remove(self._slot_items[slot])
+
+    def bill_eta(self, bill_id):
+        """
+        Queue position and estimated wait of a bill, or None when none of
+        its items are outstanding.
+        """
+        slots = self._bill_slots.get(bill_id)
+        if not slots:
+            return None
+        first_slot, last_slot = slots[0], slots[-1]
+        return self._eta(
+            self._bill_heads.prefix(first_slot), self._counts.prefix(first_slot) - 1,
+            self._minutes.prefix(last_slot)
+        )
+
+    def bill_eta_after(self, order_item_id, bill_id, minutes):
+        """
+        bill_eta(bill_id) as it will be once the item is added with `minutes`
+        (or removed, when minutes is None), without changing the queue.
+        """
+        entry = self._items.get(order_item_id)
+        slots = self._bill_slots.get(bill_id, [])
+        if minutes is not None and entry is None:
+            # Added behind everything that is queued now
+            last_slot = self._minutes.size - 1
+            if slots:
+                position, items_ahead = self._bill_heads.prefix(slots[0]), self._counts.prefix(slots[0]) - 1
+            else:
+                position, items_ahead = self._bill_heads.prefix(last_slot) + 1, len(self._items)
+            return self._eta(position, items_ahead, self._minutes.prefix(last_slot) + minutes)
+        if minutes is None and entry is not None:
+            slot, _, removed_minutes = entry
+            remaining = [other for other in slots if other != slot]
+            if not remaining:
+                return None
+            first_slot, last_slot = remaining[0], remaining[-1]
+            # The bill keeps one head, on its first remaining slot
+            return self._eta(
+                self._bill_heads.prefix(first_slot),
+                self._counts.prefix(first_slot) - 1 - (slot < first_slot),
+                self._minutes.prefix(last_slot) - (removed_minutes if slot < last_slot else 0)
+            )
+        return self.bill_eta(bill_id)
+
+    def _eta(self, queue_position, items_ahead, minutes):
+        return {
+            'queue_position': queue_position,
+            'items_ahead': items_ahead,
+            'estimated_wait_minutes': -(-minutes // self.parallel_cooks),
+        }
+
+    @property
+    def outstanding_items(self):
+        return len(self._items)
+
+
+_queues = {}
+_registry_lock = threading.Lock()
+
+
+def _build_queue(restaurant_id):
+    config = get_kitchen_queue_settings()
+    queue = KitchenQueue(parallel_cooks=config['PARALLEL_COOKS'])
+    rows = OrderItem.objects.filter(
+        bill__restaurant_id=restaurant_id,
+        bill__payment_status=Bill.PaymentStatus.PENDING,
+        status__in=OUTSTANDING_STATUSES
+    ).annotate(
+        minutes=F('quantity') * F('variant__preparation_time')
+    ).order_by('id').values_list('id', 'bill_id', 'minutes')
+    for order_item_id, bill_id, minutes in rows:
+        queue.add(order_item_id, bill_id, minutes)
+    return queue
+
+
+def get_kitchen_queue(restaurant_id):
+    """
+    Returns the queue of a restaurant, building it from the database the
+    first time it is needed in this process (and again after RESYNC_SECONDS).
+    """
+    resync_seconds = get_kitchen_queue_settings()['RESYNC_SECONDS']
+    queue = _queues.get(restaurant_id)
+    if queue is None or time.monotonic() - queue.built_at > resync_seconds:
+        queue = _build_queue(restaurant_id)
+        with _registry_lock:
+            _queues[restaurant_id] = queue
+    return queue
+
+
+def reset_kitchen_queues():
+    with _registry_lock:
+        _queues.clear()
+
+
+def _item_minutes(order_item):
+    # Like the kitchen load, a line of four naans is four naans to cook
+    return order_item.quantity * order_item.variant.preparation_time
+
+
+def record_new_items(restaurant_id, order_items):
+    """
+    Adds freshly created OrderItems (with their variant loaded) once the
+    transaction that created them commits (right away outside of one), so
+    a request that rolls back leaves no phantom items in the queue.
+    """
+    def add():
+        queue = get_kitchen_queue(restaurant_id)
+        with queue.lock:
+            for item in order_items:
+                queue.add(item.id, item.bill_id, _item_minutes(item))
+
+    transaction.on_commit(add)
+
+
+def record_status_change(restaurant_id, order_item):
+    """
+    Moves the item into or out of the queue once the transaction commits,
+    and returns the ETA its bill will have then (as get_bill_eta does).
+    """
+    minutes = _item_minutes(order_item) if order_item.status in OUTSTANDING_STATUSES else None
+    queue = get_kitchen_queue(restaurant_id)
+    with queue.lock:
+        eta = queue.bill_eta_after(order_item.id, order_item.bill_id, minutes)
+
+    def apply():
+        queue = get_kitchen_queue(restaurant_id)
+        with queue.lock:
+            if minutes is None:
+                queue.remove(order_item.id)
+            else:
+                queue.add(order_item.id, order_item.bill_id, minutes)
+
+    transaction.on_commit(apply)
+    return _with_ready_time(eta)
+
+
+def record_bills_closed(restaurant_id, bill_ids):
+    queue = get_kitchen_queue(restaurant_id)
+    with queue.lock:
+        for bill_id in bill_ids:
+            queue.remove_bill(bill_id)
+
+
+def get_bill_eta(restaurant_id, bill_id):
+    """
+    The live queue position and ready time of a bill, as sent to customers.
+    All values are None once nothing of the bill is left in the kitchen.
+    """
+    queue = get_kitchen_queue(restaurant_id)
+    with queue.lock:
+        eta = queue.bill_eta(bill_id)
+    return _with_ready_time(eta)
+
+
+def _with_ready_time(eta):
+    if eta is None:
+        return {'queue_position': None, 'items_ahead': None,
+                'estimated_wait_minutes': None, 'estimated_ready_at': None}
+    ready_at = timezone.now() + timedelta(minutes=eta['estimated_wait_minutes'])
+    eta['estimated_ready_at'] = ready_at.isoformat()
+    return eta
+
+
+def queue_update_message(bill_id):
+    """
+    The 'queue_update' event a customer screen receives when it connects,
+    or None for an unknown bill.
+    """
+    restaurant_id = Bill.objects.filter(id=bill_id).values_list('restaurant_id', flat=True).first()
+    if restaurant_id is None:
+        return None
+    return {'type': 'queue_update', 'bill_id': int(bill_id), **get_bill_eta(restaurant_id, int(bill_id))}
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from menu.archive import archive_paid_bills
+
+class Command(BaseCommand):
+    help = (
+        'Moves PAID bills older than --days, with their order items, into the '
+        'archive tables in batches. Safe to interrupt and run again.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=90, help='Archive bills created more than this many days ago')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Bills moved per transaction')
+
+    def handle(self, *args, **options):
+        total = 0
+        for moved in archive_paid_bills(options['days'], options['batch_size']):
+            total += moved
+            self.stdout.write(f'Archived {total} bills...')
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} bills older than {options["days"]} days.'))
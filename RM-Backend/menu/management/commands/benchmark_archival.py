@@ -0,0 +1,142 @@
+import statistics
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import OuterRef
+from django.utils import timezone
+
+from menu import fast_serializers
+from menu.archive import archive_paid_bills, created_in_month, created_on, paid_sales, top_dish
+from menu.broadcasts import pending_bills_queryset
+from menu.models import ArchivedBill, Bill, Category, MenuItem, MenuItemVariant, OrderItem
+from restaurants.models import Restaurant
+
+ITEMS_PER_BILL = 4
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the kitchen, cashier, report and analytics reads over a year of '
+        'order history, before and after archiving the old paid bills. Test '
+        'data is created in a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--bills', type=int, default=500000,
+                            help=f'Bills of history to create, with {ITEMS_PER_BILL} items each')
+        parser.add_argument('--open-bills', type=int, default=200, help='PENDING bills of today')
+        parser.add_argument('--archive-days', type=int, default=30)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+
+    def run(self, options):
+        started = time.perf_counter()
+        restaurant = self.create_history(options['bills'], options['open_bills'])
+        self.stdout.write(
+            f"Created {options['bills']} bills and {options['bills'] * ITEMS_PER_BILL} items "
+            f'in {time.perf_counter() - started:.0f}s'
+        )
+        self.analyze()
+        today = timezone.now().date()
+        cases = [
+            ('kitchen list', lambda: fast_serializers.kitchen_orders(
+                Bill.objects.filter(restaurant=restaurant, payment_status=Bill.PaymentStatus.PENDING)
+                .order_by('created_at')
+            )),
+            ('cashier list', lambda: fast_serializers.cashier_bills(pending_bills_queryset(restaurant))),
+            ('report month', lambda: fast_serializers.restaurant_orders(
+                Bill.objects.filter(restaurant=restaurant, created_at__year=today.year, created_at__month=today.month)
+                .order_by('-created_at'),
+                ArchivedBill.objects.filter(restaurant=restaurant, created_at__year=today.year, created_at__month=today.month)
+                .order_by('-created_at'),
+            )),
+            ('analytics', lambda: (
+                paid_sales(bill__restaurant=restaurant, **created_on(today)),
+                paid_sales(bill__restaurant=restaurant, **created_in_month(today.year, today.month)),
+                top_dish(bill__restaurant=restaurant, **created_on(today)),
+            )),
+        ]
+        before = {label: self.time_case(build, options['repeat']) for label, build in cases}
+        outputs = {label: build() for label, build in cases}
+
+        started = time.perf_counter()
+        archived = sum(archive_paid_bills(options['archive_days'], batch_size=5000))
+        self.stdout.write(f'Archived {archived} bills in {time.perf_counter() - started:.0f}s\n')
+        self.analyze()
+
+        self.stdout.write(f"{'read':<14} {'live only ms':>13} {'archived ms':>12} {'speedup':>8}  same output")
+        for label, build in cases:
+            after = self.time_case(build, options['repeat'])
+            self.stdout.write(
+                f'{label:<14} {before[label]:>13.1f} {after:>12.1f} {before[label] / after:>7.1f}x  '
+                f'{build() == outputs[label]}'
+            )
+
+    def analyze(self):
+        # Fresh planner statistics, as autovacuum would have in production
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def time_case(self, build, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            build()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def create_history(self, bill_count, open_bills):
+        restaurant = Restaurant.objects.create(
+            name='Benchmark Kitchen', slug='benchmark-kitchen-archival', latitude=0, longitude=0
+        )
+        category = Category.objects.create(restaurant=restaurant, name='Mains')
+        variants = []
+        for n in range(20):
+            menu_item = MenuItem.objects.create(restaurant=restaurant, category=category, name=f'Dish {n}')
+            variants.append(MenuItemVariant.objects.create(
+                menu_item=menu_item, variant_name='Full', price=100 + n * 5 + 0.5
+            ))
+
+        # A year of paid bills, oldest first, then today's open ones
+        now = timezone.now()
+        for chunk_start in range(0, bill_count, 10000):
+            chunk = range(chunk_start, min(chunk_start + 10000, bill_count))
+            bills = Bill.objects.bulk_create([
+                Bill(restaurant=restaurant, customer_name=f'Guest {n}', table_number=str(n % 30),
+                     payment_status=Bill.PaymentStatus.PAID, payment_method=Bill.PaymentMethod.ONLINE)
+                for n in chunk
+            ])
+            if not all(bill.pk for bill in bills):
+                bills = list(Bill.objects.filter(restaurant=restaurant).order_by('-id')[:len(chunk)])[::-1]
+            OrderItem.objects.bulk_create([
+                OrderItem(bill=bill, variant=variants[(bill.pk + k) % len(variants)], quantity=1 + k % 3,
+                          status=OrderItem.OrderStatus.COMPLETED)
+                for bill in bills for k in range(ITEMS_PER_BILL)
+            ], batch_size=5000)
+            # auto_now_add ignores the values given to bulk_create
+            for n, bill in zip(chunk, bills):
+                bill.created_at = now - timedelta(days=365 * (bill_count - n) / bill_count)
+            Bill.objects.bulk_update(bills, ['created_at'], batch_size=5000)
+        OrderItem.objects.filter(bill__restaurant=restaurant).update(
+            created_at=Bill.objects.filter(id=OuterRef('bill_id')).values('created_at')
+        )
+
+        for n in range(open_bills):
+            bill = Bill.objects.create(restaurant=restaurant, customer_name=f'Open {n}', table_number=str(n % 30))
+            OrderItem.objects.bulk_create([
+                OrderItem(bill=bill, variant=variants[(n + k) % len(variants)]) for k in range(ITEMS_PER_BILL)
+            ])
+        return restaurant
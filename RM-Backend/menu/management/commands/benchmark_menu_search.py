@@ -0,0 +1,120 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test import RequestFactory
+
+from menu.models import Category, Cuisine, FoodType, MenuItem, MenuItemVariant
+from menu.search import MenuSearchIndex, get_menu_search_index, reset_menu_search_indexes
+from menu.views import PublicMenuSearchView
+from restaurants.models import Restaurant
+
+WORDS = [
+    'paneer', 'chicken', 'mutton', 'dal', 'makhani', 'tikka', 'masala', 'butter', 'garlic', 'naan',
+    'biryani', 'korma', 'kadai', 'palak', 'aloo', 'gobi', 'chana', 'rajma', 'jeera', 'rice',
+    'tandoori', 'malai', 'kofta', 'shahi', 'dum', 'hyderabadi', 'lucknowi', 'vindaloo', 'saag', 'keema',
+    'dosa', 'idli', 'vada', 'uttapam', 'sambar', 'rasam', 'pongal', 'appam', 'stew', 'pepper',
+]
+DESCRIPTION_WORDS = [
+    'slow', 'cooked', 'with', 'whole', 'spices', 'finished', 'cream', 'smoky', 'charcoal', 'fresh',
+    'herbs', 'tangy', 'tomato', 'gravy', 'served', 'coconut', 'chutney', 'crispy', 'golden', 'mild',
+]
+QUERIES = [
+    ('prefix', 'pan'), ('prefix', 'butter chi'), ('word', 'biryani'), ('typo', 'panner tika'),
+    ('typo', 'biriyani'), ('description', 'smoky'), ('no match', 'pizza'),
+]
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Measures menu search queries per second on a generated menu. The '
+        'menu is created in a transaction that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--items', type=int, default=1000)
+        parser.add_argument('--seconds', type=float, default=2.0, help='How long to run each query')
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.run(options)
+                raise Rollback
+        except Rollback:
+            pass
+        reset_menu_search_indexes()
+
+    def run(self, options):
+        restaurant, food_types, cuisines = self.create_menu(options['items'])
+        started = time.perf_counter()
+        MenuSearchIndex.build(restaurant.id)
+        self.stdout.write(f"Built the index of {options['items']} items in {(time.perf_counter() - started) * 1000:.0f} ms")
+
+        index = get_menu_search_index(restaurant.id)
+        view = PublicMenuSearchView.as_view(throttle_classes=[])
+        factory = RequestFactory()
+        cases = [(label, {'q': query}) for label, query in QUERIES]
+        cases += [
+            ('filter only', {'food_type': food_types[0].id}),
+            ('text + filters', {'q': 'masala', 'food_type': food_types[0].id, 'cuisine': cuisines[1].id}),
+        ]
+        self.stdout.write(f"{'query':<16} {'q':<14} {'results':>7} {'index qps':>10} {'request qps':>12}")
+        for label, params in cases:
+            query = params.get('q', '')
+            filters = {
+                'food_types': [params['food_type']] if 'food_type' in params else [],
+                'cuisines': [params['cuisine']] if 'cuisine' in params else [],
+            }
+            results = index.search(query, **filters)
+            index_qps = self.queries_per_second(lambda: index.search(query, **filters), options['seconds'])
+            request_qps = self.queries_per_second(
+                lambda: view(factory.get('/', params), restaurant_slug=restaurant.slug).render(),
+                options['seconds']
+            )
+            self.stdout.write(f'{label:<16} {query:<14} {len(results):>7} {index_qps:>10,.0f} {request_qps:>12,.0f}')
+
+    def queries_per_second(self, run, seconds):
+        count = 0
+        started = time.perf_counter()
+        while time.perf_counter() - started < seconds:
+            run()
+            count += 1
+        return count / (time.perf_counter() - started)
+
+    def create_menu(self, size):
+        rng = random.Random(42)
+        restaurant = Restaurant.objects.create(
+            name='Benchmark Kitchen', slug='benchmark-kitchen-search', latitude=0, longitude=0
+        )
+        food_types = [FoodType.objects.get_or_create(name=name)[0] for name in ('Veg', 'Non-Veg', 'Vegan')]
+        cuisines = [
+            Cuisine.objects.get_or_create(name=name)[0]
+            for name in ('North Indian', 'South Indian', 'Mughlai', 'Chinese')
+        ]
+        categories = [Category.objects.create(restaurant=restaurant, name=f'Section {n}') for n in range(12)]
+        items = MenuItem.objects.bulk_create([
+            MenuItem(
+                restaurant=restaurant, category=rng.choice(categories),
+                name=' '.join(rng.sample(WORDS, rng.randint(2, 4))).title() + f' {n}',
+                description=' '.join(rng.choices(DESCRIPTION_WORDS, k=8)),
+            )
+            for n in range(size)
+        ])
+        if not all(item.pk for item in items):
+            items = list(MenuItem.objects.filter(restaurant=restaurant).order_by('id'))
+        MenuItemVariant.objects.bulk_create([
+            MenuItemVariant(menu_item=item, variant_name='Full', price=rng.randint(90, 450)) for item in items
+        ])
+        MenuItem.food_types.through.objects.bulk_create([
+            MenuItem.food_types.through(menuitem_id=item.id, foodtype_id=rng.choice(food_types).id) for item in items
+        ])
+        MenuItem.cuisines.through.objects.bulk_create([
+            MenuItem.cuisines.through(menuitem_id=item.id, cuisine_id=cuisine.id)
+            for item in items for cuisine in rng.sample(cuisines, 2)
+        ])
+        return restaurant, food_types, cuisines
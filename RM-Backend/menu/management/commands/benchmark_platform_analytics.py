@@ -0,0 +1,79 @@
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+from django.utils import timezone
+
+from menu.models import Bill, Category, MenuItem, MenuItemVariant, OrderItem
+from menu.platform_analytics import period_days, platform_analytics
+from restaurants.models import Restaurant
+
+
+class Command(BaseCommand):
+    help = (
+        'Times the platform analytics with 1, 2, 4 and 8 worker threads on '
+        'generated restaurants. The worker threads only see committed rows, '
+        'so the restaurants are committed and deleted again at the end.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--restaurants', type=int, default=40)
+        parser.add_argument('--bills', type=int, default=2000, help='Paid bills per restaurant')
+        parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+
+    def handle(self, *args, **options):
+        restaurants = self.create_restaurants(options['restaurants'], options['bills'])
+        try:
+            self.run(options)
+        finally:
+            Restaurant.objects.filter(id__in=[restaurant.id for restaurant in restaurants]).delete()
+
+    def run(self, options):
+        first_day, last_day = period_days('month')
+        self.stdout.write(f"{'workers':>7} {'cold ms':>9} {'cached ms':>10}")
+        baseline = None
+        for workers in options['workers']:
+            with override_settings(PLATFORM_ANALYTICS={'MAX_WORKERS': workers}):
+                cache.clear()
+                started = time.perf_counter()
+                result = platform_analytics(first_day, last_day)
+                cold = (time.perf_counter() - started) * 1000
+                started = time.perf_counter()
+                platform_analytics(first_day, last_day)
+                cached = (time.perf_counter() - started) * 1000
+            if baseline is None:
+                baseline = result
+            elif result != baseline:
+                self.stderr.write(f'{workers} workers gave a different result')
+            self.stdout.write(f'{workers:>7} {cold:>9.0f} {cached:>10.1f}')
+        cache.clear()
+
+    def create_restaurants(self, count, bill_count):
+        suffix = int(timezone.now().timestamp())
+        restaurants = []
+        for n in range(count):
+            restaurant = Restaurant.objects.create(
+                name=f'Benchmark Kitchen {n}', slug=f'benchmark-platform-{suffix}-{n}', latitude=0, longitude=0
+            )
+            category = Category.objects.create(restaurant=restaurant, name='Mains')
+            variants = [
+                MenuItemVariant.objects.create(
+                    menu_item=MenuItem.objects.create(restaurant=restaurant, category=category, name=f'Dish {k}'),
+                    variant_name='Full', price=100 + k * 10
+                )
+                for k in range(10)
+            ]
+            bills = Bill.objects.bulk_create([
+                Bill(restaurant=restaurant, customer_name=f'Guest {b}', table_number=str(b % 20),
+                     payment_status=Bill.PaymentStatus.PAID)
+                for b in range(bill_count)
+            ])
+            if not all(bill.pk for bill in bills):
+                bills = list(Bill.objects.filter(restaurant=restaurant))
+            OrderItem.objects.bulk_create([
+                OrderItem(bill=bill, variant=variants[(b + k) % len(variants)], quantity=1 + k)
+                for b, bill in enumerate(bills) for k in range(3)
+            ], batch_size=5000)
+            restaurants.append(restaurant)
+        return restaurants
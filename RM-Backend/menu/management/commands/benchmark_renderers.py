@@ -0,0 +1,92 @@
+import datetime
+import time
+from decimal import Decimal
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from restromanager import renderers
+from restromanager.renderers import FastJSONRenderer, encode_fragment
+
+
+def menu_payload(items=300):
+    """Shape of PublicMenuListView."""
+    return [{
+        'id': n, 'name': f'Dish {n}', 'description': 'Slow cooked with whole spices and finished with cream.',
+        'food_types': ['Veg'], 'cuisines': ['North Indian', 'Punjabi'],
+        'variants': [
+            {'variant_name': 'Half', 'price': f'{120 + n % 50}.00', 'preparation_time': 15},
+            {'variant_name': 'Full', 'price': f'{210 + n % 50}.50', 'preparation_time': 20},
+        ],
+    } for n in range(items)]
+
+
+def report_payload(bills=5000):
+    """Shape of the yearly AdminOrderReportView, built from model values."""
+    created_at = datetime.datetime(2025, 8, 20, 13, 2, 11, 503271, tzinfo=datetime.timezone.utc)
+    return [{
+        'id': n, 'customer_name': f'Guest {n}', 'table_number': str(n % 30),
+        'payment_status': 'PAID', 'payment_method': 'ONLINE',
+        'created_at': created_at + datetime.timedelta(minutes=n),
+        'total_price': Decimal('540.50'),
+        'order_items': [
+            {'name': 'Paneer Tikka', 'variant_name': 'Full', 'quantity': 2, 'price': Decimal('210.25')},
+            {'name': 'Butter Naan', 'variant_name': 'Regular', 'quantity': 4, 'price': Decimal('30.00')},
+        ],
+    } for n in range(bills)]
+
+
+def kitchen_payload(bills=400):
+    """Shape of KitchenOrderListView."""
+    return [{
+        'id': n, 'table_number': str(n % 30), 'customer_name': f'Guest {n}',
+        'created_at': '2025-08-20T18:32:11.503271+05:30',
+        'order_items': [
+            {'id': n * 3 + k, 'name': 'Dal Makhani', 'variant_name': 'Half', 'quantity': 1, 'status': 'PENDING'}
+            for k in range(3)
+        ],
+    } for n in range(bills)]
+
+
+class Command(BaseCommand):
+    help = "Compares DRF's JSONRenderer with the project renderer on real payload shapes"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        repeat = options['repeat']
+        menu = menu_payload()
+        # The public menu is served from cached, already-encoded items
+        menu_fragments = [encode_fragment(item) for item in menu]
+        payloads = [
+            ('public menu', menu, menu_fragments),
+            ('year report', report_payload(), None),
+            ('kitchen list', kitchen_payload(), None),
+        ]
+        self.stdout.write(f'orjson installed: {renderers.orjson is not None}')
+        self.stdout.write(
+            f"{'payload':<14} {'KB':>6} {'DRF ms':>8} {'stdlib ms':>10} {'fast ms':>8} {'fragments ms':>13}  same bytes"
+        )
+        for label, data, fragments in payloads:
+            expected = JSONRenderer().render(data)
+            drf_ms = self.time_render(JSONRenderer(), data, repeat)
+            with mock.patch.object(renderers, 'orjson', None):
+                stdlib_ms = self.time_render(FastJSONRenderer(), data, repeat)
+            fast_ms = self.time_render(FastJSONRenderer(), data, repeat)
+            same = FastJSONRenderer().render(data) == expected
+            fragment_column = '-'
+            if fragments is not None:
+                fragment_column = f'{self.time_render(FastJSONRenderer(), fragments, repeat):.2f}'
+                same = same and FastJSONRenderer().render(fragments) == expected
+            self.stdout.write(
+                f'{label:<14} {len(expected) / 1024:>6.0f} {drf_ms:>8.2f} {stdlib_ms:>10.2f} '
+                f'{fast_ms:>8.2f} {fragment_column:>13}  {same}'
+            )
+
+    def time_render(self, renderer, data, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            renderer.render(data)
+        return (time.perf_counter() - started) / repeat * 1000
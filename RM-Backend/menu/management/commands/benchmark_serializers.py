@@ -0,0 +1,85 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from menu import fast_serializers
+from menu.models import Bill, Category, MenuItem, MenuItemVariant, OrderItem
+from menu.serializers import CashierBillSerializer, KitchenOrderSerializer, RestaurantOrderListSerializer
+from restaurants.models import Restaurant
+
+ITEMS_PER_BILL = 4
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compares the DRF serializers of the staff order lists with the '
+        'values()-based fast path. Test data is created in a transaction '
+        'that is rolled back afterwards.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000],
+                            help='Numbers of order items to benchmark with')
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            try:
+                with transaction.atomic():
+                    self.run_size(size)
+                    raise Rollback
+            except Rollback:
+                pass
+
+    def run_size(self, size):
+        restaurant = self.create_orders(size)
+        bills = Bill.objects.filter(restaurant=restaurant).order_by('created_at')
+        cases = [
+            ('kitchen list', KitchenOrderSerializer, fast_serializers.kitchen_orders),
+            ('cashier list', CashierBillSerializer, fast_serializers.cashier_bills),
+            ('order report', RestaurantOrderListSerializer, fast_serializers.restaurant_orders),
+        ]
+        self.stdout.write(f'\n{size} items in {size // ITEMS_PER_BILL} bills')
+        self.stdout.write(f"{'payload':<14} {'serializer rows/s':>18} {'fast rows/s':>12} {'speedup':>8}  same JSON")
+        for label, serializer_class, fast in cases:
+            slow_json, slow_seconds = self.timed(lambda: serializer_class(
+                bills.prefetch_related('order_items__variant__menu_item'), many=True
+            ).data)
+            fast_json, fast_seconds = self.timed(lambda: fast(bills))
+            self.stdout.write(
+                f'{label:<14} {size / slow_seconds:>18,.0f} {size / fast_seconds:>12,.0f} '
+                f'{slow_seconds / fast_seconds:>7.1f}x  {slow_json == fast_json}'
+            )
+
+    def timed(self, build):
+        started = time.perf_counter()
+        content = JSONRenderer().render(build())
+        return content, time.perf_counter() - started
+
+    def create_orders(self, size):
+        restaurant = Restaurant.objects.create(
+            name='Benchmark Kitchen', slug='benchmark-kitchen-serializers', latitude=0, longitude=0
+        )
+        category = Category.objects.create(restaurant=restaurant, name='Mains')
+        variants = []
+        for n in range(20):
+            menu_item = MenuItem.objects.create(restaurant=restaurant, category=category, name=f'Dish {n}')
+            variants.append(MenuItemVariant.objects.create(
+                menu_item=menu_item, variant_name='Full', price=100 + n * 5 + 0.5
+            ))
+        bills = Bill.objects.bulk_create([
+            Bill(restaurant=restaurant, customer_name=f'Guest {n}', table_number=str(n % 30))
+            for n in range(size // ITEMS_PER_BILL)
+        ])
+        if not all(bill.pk for bill in bills):
+            bills = list(Bill.objects.filter(restaurant=restaurant).order_by('id'))
+        OrderItem.objects.bulk_create([
+            OrderItem(bill=bill, variant=variants[(bill.pk + n) % len(variants)], quantity=1 + n % 3)
+            for bill in bills for n in range(ITEMS_PER_BILL)
+        ], batch_size=5000)
+        return restaurant
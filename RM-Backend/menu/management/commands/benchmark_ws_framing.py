@@ -0,0 +1,63 @@
+import time
+
+from django.core.management.base import BaseCommand
+from menu.framing import encode_json, encode_msgpack
+
+
+def sample_events():
+    """Typical events as the views and consumers send them."""
+    items = [{
+        'order_item_id': 1000 + n, 'name': name, 'variant': variant, 'quantity': quantity
+    } for n, (name, variant, quantity) in enumerate([
+        ('Paneer Tikka', 'Full', 2), ('Butter Naan', 'Regular', 4),
+        ('Dal Makhani', 'Half', 1), ('Sweet Lassi', 'Glass', 3),
+    ])]
+    bill = {
+        'id': 512, 'customer_name': 'Asha', 'table_number': '12',
+        'created_at': '2025-08-20T19:42:11.503000+05:30', 'total_price': 1240.0, 'item_count': 10,
+    }
+    return {
+        'new order (chef)': {
+            'bill_id': 512, 'customer_name': 'Asha', 'table_number': '12', 'items': items
+        },
+        'status update (customer)': {
+            'type': 'order_status_update', 'order_item_id': 1001, 'status': 'ACCEPTED',
+            'item_name': 'Butter Naan', 'preparation_time': 10, 'queue_position': 3,
+            'items_ahead': 7, 'estimated_wait_minutes': 14,
+            'estimated_ready_at': '2025-08-20T19:56:11.503000+05:30',
+        },
+        'bill added (cashier)': {'type': 'bill_added', 'bill': bill},
+        'snapshot, 30 bills (cashier)': {
+            'type': 'pending_bills_snapshot',
+            'bills': [{**bill, 'id': bill['id'] + n} for n in range(30)],
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = 'Compares JSON and msgpack WebSocket frames: bytes on the wire and encode time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        self.stdout.write(
+            f"{'event':<30} {'json B':>7} {'msgpack B':>10} {'saved':>6} "
+            f"{'json us':>8} {'msgpack us':>11}"
+        )
+        for label, event in sample_events().items():
+            json_size = len(encode_json(event).encode())
+            msgpack_size = len(encode_msgpack(event))
+            json_us = self.time_encoder(encode_json, event, iterations)
+            msgpack_us = self.time_encoder(encode_msgpack, event, iterations)
+            self.stdout.write(
+                f'{label:<30} {json_size:>7} {msgpack_size:>10} '
+                f'{1 - msgpack_size / json_size:>6.0%} {json_us:>8.2f} {msgpack_us:>11.2f}'
+            )
+
+    def time_encoder(self, encode, event, iterations):
+        started = time.perf_counter()
+        for _ in range(iterations):
+            encode(event)
+        return (time.perf_counter() - started) / iterations * 1e6
@@ -0,0 +1,9 @@
+from django.core.management.base import BaseCommand
+from menu.idempotency import purge_expired_keys
+
+class Command(BaseCommand):
+    help = 'Deletes stored Idempotency-Key responses whose TTL has passed'
+
+    def handle(self, *args, **kwargs):
+        deleted = purge_expired_keys()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys.'))
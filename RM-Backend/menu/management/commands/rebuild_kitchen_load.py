@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from restaurants.models import Restaurant
+from menu.kitchen_load import rebuild_kitchen_load
+
+class Command(BaseCommand):
+    help = 'Recomputes the kitchen load counters from the order items'
+
+    def handle(self, *args, **kwargs):
+        for restaurant in Restaurant.objects.order_by('id'):
+            items, minutes = rebuild_kitchen_load(restaurant.id)
+            self.stdout.write(f'{restaurant.slug}: {items} items, {minutes} prep minutes outstanding')
+        self.stdout.write(self.style.SUCCESS('Kitchen load counters rebuilt.'))
@@ -0,0 +1,51 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+from django.utils import timezone
+
+from menu.models import OrderEvent, OrderEventCursor
+from menu.outbox import publish_pending, restaurants_with_pending_events
+
+
+class Command(BaseCommand):
+    help = (
+        'Publishes order events (menu.outbox) that are still unpublished, e.g. '
+        'after the channel layer was down for longer than the publish task '
+        'kept retrying, and deletes published events older than --keep-days. '
+        'Run it from cron, or with --loop next to the task workers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=7,
+                            help='Published events older than this are deleted (0 keeps everything)')
+        parser.add_argument('--loop', type=float, metavar='SECONDS',
+                            help='Keep running, sweeping every SECONDS')
+
+    def handle(self, *args, **options):
+        while True:
+            self.sweep(options['keep_days'])
+            if not options['loop']:
+                return
+            time.sleep(options['loop'])
+
+    def sweep(self, keep_days):
+        for restaurant_id in restaurants_with_pending_events():
+            try:
+                published = publish_pending(restaurant_id)
+            except Exception as exc:
+                self.stderr.write(f'Restaurant {restaurant_id}: {exc}')
+                continue
+            self.stdout.write(f'Restaurant {restaurant_id}: published {published} events')
+
+        if keep_days:
+            # Only events the relay is past; screens further behind reload
+            cutoff = timezone.now() - timedelta(days=keep_days)
+            published = Q()
+            for restaurant_id, sequence in OrderEventCursor.objects.values_list('restaurant_id', 'published_sequence'):
+                published |= Q(restaurant_id=restaurant_id, sequence__lte=sequence)
+            if published:
+                deleted, _ = OrderEvent.objects.filter(published, created_at__lt=cutoff).delete()
+                if deleted:
+                    self.stdout.write(f'Deleted {deleted} events older than {keep_days} days')
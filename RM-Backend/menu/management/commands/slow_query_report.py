@@ -0,0 +1,92 @@
+import json
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from restromanager.slow_queries import get_slow_query_settings
+
+
+def read_records(path, backup_count):
+    """The records of the log and of its rotated backups, oldest file first."""
+    files = [Path(f'{path}.{n}') for n in range(backup_count, 0, -1)] + [Path(path)]
+    for log_file in files:
+        if not log_file.exists():
+            continue
+        with log_file.open() as lines:
+            for line in lines:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # A line cut short by a crash while it was written
+                    continue
+
+
+def top_offenders(records, limit):
+    """Records grouped by SQL fingerprint, the most total time first."""
+    groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                  'views': Counter(), 'call_sites': Counter()})
+    for record in records:
+        group = groups[record['fingerprint']]
+        group['sql'] = record['sql']
+        group['count'] += 1
+        group['total_ms'] += record['duration_ms']
+        group['max_ms'] = max(group['max_ms'], record['duration_ms'])
+        group['views'][record.get('view') or '-'] += 1
+        group['call_sites'][record.get('call_site') or '-'] += 1
+    offenders = sorted(groups.items(), key=lambda item: item[1]['total_ms'], reverse=True)[:limit]
+    return [{
+        'fingerprint': key,
+        'sql': group['sql'],
+        'count': group['count'],
+        'total_ms': round(group['total_ms'], 3),
+        'mean_ms': round(group['total_ms'] / group['count'], 3),
+        'max_ms': round(group['max_ms'], 3),
+        'views': group['views'].most_common(3),
+        'call_sites': group['call_sites'].most_common(3),
+    } for key, group in offenders]
+
+
+class Command(BaseCommand):
+    help = (
+        'Aggregates the slow query log (restromanager.slow_queries) into the '
+        'statements that cost the most time in total, grouped by SQL '
+        'fingerprint, with the views and lines of code that issued them.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--file', help='Log to read (defaults to SLOW_QUERIES["LOG_FILE"])')
+        parser.add_argument('--limit', type=int, default=20, help='Fingerprints to report')
+        parser.add_argument('--since-hours', type=float, help='Only records of the last N hours')
+        parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+
+    def handle(self, *args, **options):
+        config = get_slow_query_settings()
+        path = options['file'] or config['LOG_FILE']
+        if not path:
+            raise CommandError('SLOW_QUERIES["LOG_FILE"] is not set; pass --file.')
+
+        records = read_records(path, config['BACKUP_COUNT'])
+        if options['since_hours']:
+            cutoff = (datetime.now(timezone.utc) - timedelta(hours=options['since_hours'])).isoformat()
+            records = (record for record in records if record['time'] >= cutoff)
+        offenders = top_offenders(records, options['limit'])
+
+        if options['json']:
+            self.stdout.write(json.dumps(offenders, indent=2))
+            return
+        if not offenders:
+            self.stdout.write(f'No slow queries in {path}')
+            return
+        for rank, offender in enumerate(offenders, 1):
+            self.stdout.write(
+                f"{rank}. {offender['fingerprint']}  {offender['count']} x, "
+                f"total {offender['total_ms']:.1f} ms, mean {offender['mean_ms']:.1f} ms, "
+                f"max {offender['max_ms']:.1f} ms"
+            )
+            self.stdout.write(f"   {offender['sql'][:300]}")
+            for view, count in offender['views']:
+                self.stdout.write(f'   view: {view} ({count})')
+            for call_site, count in offender['call_sites']:
+                self.stdout.write(f'   at: {call_site} ({count})')
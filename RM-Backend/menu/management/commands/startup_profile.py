@@ -0,0 +1,136 @@
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+from importlib import import_module
+
+from django.core.management.base import BaseCommand, CommandError
+
+DEFAULT_PROFILES = ['restromanager.settings', 'restromanager.settings_api']
+
+
+def _rss():
+    """Current resident set size in bytes."""
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # Peak instead of current RSS, which is close enough while starting up
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def probe(settings_module):
+    """
+    Starts Django like a worker does and returns the time and memory spent on
+    every step. Runs in a fresh interpreter (see Command.run_profile), since
+    apps can only be loaded once per process.
+    """
+    os.environ['DJANGO_SETTINGS_MODULE'] = settings_module
+    started, rss_at_start = time.perf_counter(), _rss()
+    steps = []
+
+    def timed(step, label, function, *args):
+        rss, step_started = _rss(), time.perf_counter()
+        result = function(*args)
+        steps.append({
+            'step': step, 'label': label,
+            'seconds': time.perf_counter() - step_started, 'rss': _rss() - rss,
+        })
+        return result
+
+    import django
+    from django.apps import AppConfig
+
+    create = AppConfig.create.__func__
+    import_models = AppConfig.import_models
+
+    def timed_create(cls, entry):
+        app_config = timed('import', entry, create, cls, entry)
+        # ready() is overridden by the app configs themselves
+        ready = app_config.ready
+        app_config.ready = lambda: timed('ready', app_config.name, ready)
+        return app_config
+
+    AppConfig.create = classmethod(timed_create)
+    AppConfig.import_models = lambda self: timed('models', self.name, import_models, self)
+    django.setup()
+
+    from django.conf import settings
+    timed('urls', settings.ROOT_URLCONF, import_module, settings.ROOT_URLCONF)
+    # Builds the middleware chain and the WebSocket routing
+    timed('asgi', 'restromanager.asgi', import_module, 'restromanager.asgi')
+    return {
+        'settings': settings_module,
+        'steps': steps,
+        'seconds': time.perf_counter() - started,
+        'rss_before': rss_at_start,
+        'rss': _rss(),
+    }
+
+
+class Command(BaseCommand):
+    help = (
+        'Reports the import time and memory of every installed app, the URLconf '
+        'and the ASGI application for each settings profile, each started in a '
+        'fresh interpreter'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('profiles', nargs='*', default=DEFAULT_PROFILES,
+                            help='Settings modules to compare')
+        parser.add_argument('--json', action='store_true', help='Print the raw measurements')
+
+    def handle(self, *args, **options):
+        reports = [self.run_profile(settings_module) for settings_module in options['profiles']]
+        if options['json']:
+            self.stdout.write(json.dumps(reports, indent=2))
+            return
+        for report in reports:
+            self.write_report(report)
+        self.stdout.write(f"\n{'settings':<32} {'startup ms':>11} {'RSS MB':>8}")
+        for report in reports:
+            self.stdout.write(
+                f"{report['settings']:<32} {report['seconds'] * 1000:>11.1f} {report['rss'] / 2 ** 20:>8.1f}"
+            )
+
+    def run_profile(self, settings_module):
+        result = subprocess.run(
+            [sys.executable, '-m', __name__, settings_module],
+            capture_output=True, text=True, cwd=os.getcwd(),
+            env={**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, sys.path))},
+        )
+        if result.returncode:
+            raise CommandError(f'{settings_module} failed to start:\n{result.stderr}')
+        # Apps may print while loading; the report is the last line
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def write_report(self, report):
+        apps = {}
+        for step in report['steps']:
+            if step['step'] in ('import', 'models', 'ready'):
+                # Entries like 'users.apps.UsersConfig' are reported by app name later
+                label = step['label'].split('.apps.')[0]
+                app = apps.setdefault(label, {'import': 0, 'models': 0, 'ready': 0, 'rss': 0})
+                app[step['step']] += step['seconds']
+                app['rss'] += step['rss']
+        self.stdout.write(f"\n{report['settings']}")
+        self.stdout.write(
+            f"{'app':<28} {'import ms':>10} {'models ms':>10} {'ready ms':>9} {'RSS KB':>8}"
+        )
+        for label, app in apps.items():
+            self.stdout.write(
+                f"{label:<28} {app['import'] * 1000:>10.1f} {app['models'] * 1000:>10.1f} "
+                f"{app['ready'] * 1000:>9.1f} {app['rss'] / 1024:>8.0f}"
+            )
+        for step in report['steps']:
+            if step['step'] in ('urls', 'asgi'):
+                self.stdout.write(
+                    f"{step['label']:<28} {step['seconds'] * 1000:>10.1f} {'':>10} {'':>9} {step['rss'] / 1024:>8.0f}"
+                )
+
+
+if __name__ == '__main__':
+    print(json.dumps(probe(sys.argv[1])))
@@ -0,0 +1,106 @@
+# menu/menu_cache.py
+
+import logging
+import time
+
+from django.core.cache import cache
+
+from restromanager.renderers import JSONFragment, encode_fragment
+from .models import MenuItem
+from .serializers import PublicMenuItemSerializer
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'menu_version_global'
+FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+# Every public menu item is kept in the cache as encoded JSON under a key
+# that includes two version counters: one per restaurant (bumped when its
+# items or variants change) and a global one (bumped when a food type or
+# cuisine is renamed). Bumping a counter makes all old fragments unreachable;
+# they expire on their own. When the cache cannot be reached the menu is
+# serialized from the database instead, so public menus keep working.
+
+
+def _restaurant_version_key(restaurant_id):
+    return f'menu_version_{restaurant_id}'
+
+
+def _read_versions(keys):
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            # Start from the clock so a counter lost from the cache never
+            # comes back with a value that old fragments were stored under
+            cache.add(key, time.time_ns(), None)
+            values[key] = cache.get(key)
+    return values
+
+
+def menu_version(restaurant_id):
+    """The current menu version of a restaurant, or None when the cache is down."""
+    restaurant_key = _restaurant_version_key(restaurant_id)
+    try:
+        values = _read_versions([GLOBAL_VERSION_KEY, restaurant_key])
+    except Exception:
+        logger.warning("Cache unavailable, reading the menu of restaurant %s from the database",
+                       restaurant_id, exc_info=True)
+        return None
+    return f'{values[GLOBAL_VERSION_KEY]}_{values[restaurant_key]}'
+
+
+def bump_menu_version(restaurant_id=None):
+    """Invalidates the cached menu of one restaurant, or of all of them."""
+    key = GLOBAL_VERSION_KEY if restaurant_id is None else _restaurant_version_key(restaurant_id)
+    try:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+    except Exception:
+        # Runs after the write committed, so it must not fail the request
+        logger.warning("Could not invalidate the cached menu of %s",
+                       'every restaurant' if restaurant_id is None else f'restaurant {restaurant_id}',
+                       exc_info=True)
+
+
+def public_menu_fragments(restaurant):
+    """
+    The public menu of a restaurant as a list of JSONFragments, in the same
+    order and with the same content as PublicMenuItemSerializer. Only items
+    that changed since they were last served are serialized again.
+    """
+    item_ids = list(MenuItem.objects.filter(
+        restaurant=restaurant, is_available=True
+    ).values_list('id', flat=True))
+    return menu_item_fragments(restaurant.id, item_ids)
+
+
+def menu_item_fragments(restaurant_id, item_ids):
+    """
+    The cached public JSON of the given items of one restaurant, in the
+    order of `item_ids`.
+    """
+    version = menu_version(restaurant_id)
+    keys = {item_id: f'public_menu_item_{item_id}_{version}' for item_id in item_ids}
+    cached = {}
+    if version is not None:
+        try:
+            cached = cache.get_many(list(keys.values()))
+        except Exception:
+            logger.warning("Could not read the cached menu of restaurant %s", restaurant_id, exc_info=True)
+            version = None
+
+    missing = [item_id for item_id in item_ids if keys[item_id] not in cached]
+    if missing:
+        items = MenuItem.objects.filter(id__in=missing).prefetch_related('variants', 'food_types', 'cuisines')
+        encoded = {keys[item.id]: bytes(encode_fragment(PublicMenuItemSerializer(item).data)) for item in items}
+        if version is not None:
+            try:
+                cache.set_many(encoded, FRAGMENT_TIMEOUT)
+            except Exception:
+                logger.warning("Could not cache the menu of restaurant %s", restaurant_id, exc_info=True)
+        cached.update(encoded)
+
+    # An item deleted between the two queries is simply left out
+    return [JSONFragment(cached[keys[item_id]]) for item_id in item_ids if keys[item_id] in cached]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0007_idempotencykey'),
+        ('restaurants', '0002_restaurant_kitchen_capacity_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='KitchenLoad',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='kitchen_load', serialize=False, to='restaurants.restaurant')),
+                ('outstanding_items', models.IntegerField(default=0)),
+                ('outstanding_minutes', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+    ]
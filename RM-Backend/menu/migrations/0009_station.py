@@ -0,0 +1,42 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0008_kitchenload'),
+        ('restaurants', '0002_restaurant_kitchen_capacity_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Station',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(help_text="Used in the chef tablet URL, e.g. 'tandoor'")),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stations', to='restaurants.restaurant')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='station',
+            field=models.ForeignKey(blank=True, help_text='Kitchen station that prepares the items of this category', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='categories', to='menu.station'),
+        ),
+        migrations.AddField(
+            model_name='orderitem',
+            name='station',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='menu.station'),
+        ),
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['station', 'status'], name='menu_orderi_station_d878b5_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='station',
+            unique_together={('restaurant', 'slug')},
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0009_station'),
+        ('restaurants', '0002_restaurant_kitchen_capacity_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['created_at'], name='menu_bill_created_c99d01_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bill',
+            index=models.Index(fields=['restaurant', 'created_at'], name='menu_bill_restaur_ba26a6_idx'),
+        ),
+    ]
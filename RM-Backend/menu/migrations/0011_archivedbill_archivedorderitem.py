@@ -0,0 +1,50 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0010_bill_created_at_indexes'),
+        ('restaurants', '0002_restaurant_kitchen_capacity_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedBill',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('customer_name', models.CharField(max_length=150)),
+                ('table_number', models.CharField(max_length=50)),
+                ('payment_status', models.CharField(choices=[('PENDING', 'Pending'), ('PAID', 'Paid')], max_length=20)),
+                ('payment_method', models.CharField(blank=True, choices=[('OFFLINE', 'Offline'), ('ONLINE', 'Online')], max_length=20, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='restaurants.restaurant')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ArchivedOrderItem',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('quantity', models.PositiveIntegerField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('ACCEPTED', 'Accepted'), ('COMPLETED', 'Completed'), ('DECLINED', 'Declined')], max_length=20)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('bill', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='order_items', to='menu.archivedbill')),
+                ('station', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='menu.station')),
+                ('variant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='menu.menuitemvariant')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='archivedbill',
+            index=models.Index(fields=['restaurant', 'created_at'], name='menu_archiv_restaur_d407cb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedorderitem',
+            index=models.Index(fields=['created_at'], name='menu_archiv_created_1ee94c_idx'),
+        ),
+    ]
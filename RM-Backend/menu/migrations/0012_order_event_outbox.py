@@ -0,0 +1,46 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:22
+
+import django.core.serializers.json
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0011_archivedbill_archivedorderitem'),
+        ('restaurants', '0002_restaurant_kitchen_capacity_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OrderEventCursor',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='restaurants.restaurant')),
+                ('published_sequence', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderEventSequence',
+            fields=[
+                ('restaurant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='restaurants.restaurant')),
+                ('last_sequence', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='OrderEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sequence', models.PositiveBigIntegerField()),
+                ('event_type', models.CharField(choices=[('ITEMS_ADDED', 'Items added'), ('ITEM_STATUS', 'Item status changed'), ('BILLS_PAID', 'Bills paid')], max_length=20)),
+                ('bill_id', models.BigIntegerField(blank=True, null=True)),
+                ('data', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='restaurants.restaurant')),
+            ],
+            options={
+                'unique_together': {('restaurant', 'sequence')},
+            },
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.5 on 2026-10-19 08:27
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('menu', '0012_order_event_outbox'),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='menuitemvariant',
+            unique_together={('menu_item', 'variant_name')},
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.core.serializers.json import DjangoJSONEncoder
 from restaurants.models import Restaurant
 
 # --- NEW: Models for flexible categorization ---
@@ -18,9 +19,25 @@ class Cuisine(models.Model):
 
 # --- UPDATED: Existing Models ---
 
+class Station(models.Model):
+    """ A kitchen station with its own chef tablet, e.g. Tandoor, Bar, Desserts """
+    restaurant = models.ForeignKey(Restaurant, related_name='stations', on_delete=models.CASCADE)
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=50, help_text="Used in the chef tablet URL, e.g. 'tandoor'")
+
+    class Meta:
+        unique_together = ('restaurant', 'slug')
+
+    def __str__(self):
+        return self.name
+
 class Category(models.Model):
     restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
+    station = models.ForeignKey(
+        Station, related_name='categories', on_delete=models.SET_NULL, null=True, blank=True,
+        help_text="Kitchen station that prepares the items of this category"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -56,6 +73,10 @@ class MenuItemVariant(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        # Orders name a variant by (menu item, variant name)
+        unique_together = ('menu_item', 'variant_name')
+
     def __str__(self):
         return f"{self.menu_item.name} ({self.variant_name})"
 
@@ -74,6 +95,15 @@ class Bill(models.Model):
     payment_method = models.CharField(max_length=20, choices=PaymentMethod.choices, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        # created_at alone for the admin date hierarchy across restaurants,
+        # and per restaurant for the staff lists and reports
+        indexes = [
+            models.Index(fields=['created_at']),
+            models.Index(fields=['restaurant', 'created_at']),
+        ]
+
     def __str__(self):
         return f"Bill for {self.customer_name} at Table {self.table_number}"
 
@@ -87,7 +117,148 @@ class OrderItem(models.Model):
     variant = models.ForeignKey(MenuItemVariant, on_delete=models.CASCADE)
     quantity = models.PositiveIntegerField(default=1)
     status = models.CharField(max_length=20, choices=OrderStatus.choices, default=OrderStatus.PENDING)
+    # Copied from the item's category when the order is placed, so the
+    # kitchen list can be filtered per station without joining the menu
+    station = models.ForeignKey(Station, on_delete=models.SET_NULL, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['station', 'status'])]
+
+    @staticmethod
+    def stations_of(variant_ids):
+        """{variant_id: station_id} for the variants of a cart, in one query."""
+        return dict(MenuItemVariant.objects.filter(id__in=variant_ids).values_list(
+            'id', 'menu_item__category__station_id'
+        ))
+
+    def save(self, *args, **kwargs):
+        # Single items only; carts are created with stations_of() and
+        # bulk_create() instead of a lookup per line
+        if self._state.adding and self.station_id is None:
+            self.station_id = Category.objects.filter(
+                menu_items__variants__id=self.variant_id
+            ).values_list('station_id', flat=True).first()
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f"{self.quantity}x {self.variant.menu_item.name} ({self.variant.variant_name})"
+
+class IdempotencyKey(models.Model):
+    """
+    Remembers the first successful response of an order-creating request so
+    that a retried request with the same Idempotency-Key gets it replayed
+    instead of creating a second Bill or duplicate OrderItems.
+    """
+    scope = models.CharField(max_length=255)
+    key = models.CharField(max_length=255)
+    request_fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        unique_together = ('scope', 'key')
+
+    def __str__(self):
+        return f"{self.scope} [{self.key}]"
+
+class KitchenLoad(models.Model):
+    """
+    Running totals of the outstanding (PENDING or ACCEPTED) items of a
+    restaurant, kept up to date with F() updates on every order and status
+    change so the capacity check never has to scan OrderItem.
+    """
+    restaurant = models.OneToOneField(Restaurant, primary_key=True, on_delete=models.CASCADE, related_name='kitchen_load')
+    outstanding_items = models.IntegerField(default=0)
+    outstanding_minutes = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.restaurant} kitchen load"
+
+class ArchivedBill(models.Model):
+    """
+    A PAID bill moved out of Bill by the archive_bills command (menu.archive),
+    so the live tables only hold recent and open bills. Keeps the id and
+    timestamps of the original bill.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
+    customer_name = models.CharField(max_length=150)
+    table_number = models.CharField(max_length=50)
+    payment_status = models.CharField(max_length=20, choices=Bill.PaymentStatus.choices)
+    payment_method = models.CharField(max_length=20, choices=Bill.PaymentMethod.choices, null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['restaurant', 'created_at'])]
+
+    def __str__(self):
+        return f"Archived bill for {self.customer_name} at Table {self.table_number}"
+
+class ArchivedOrderItem(models.Model):
+    """An OrderItem of an ArchivedBill, with its original id and timestamps."""
+    id = models.BigIntegerField(primary_key=True)
+    bill = models.ForeignKey(ArchivedBill, related_name='order_items', on_delete=models.CASCADE)
+    variant = models.ForeignKey(MenuItemVariant, on_delete=models.CASCADE)
+    quantity = models.PositiveIntegerField()
+    status = models.CharField(max_length=20, choices=OrderItem.OrderStatus.choices)
+    station = models.ForeignKey(Station, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [models.Index(fields=['created_at'])]
+
+    def __str__(self):
+        return f"{self.quantity}x {self.variant.menu_item.name} ({self.variant.variant_name})"
+
+class OrderEvent(models.Model):
+    """
+    Append-only outbox of order changes (menu.outbox). Each event is written
+    in the same transaction as the change it describes and numbered per
+    restaurant without gaps; the relay publishes them to the WebSocket
+    groups in sequence order, and screens that missed some can read them
+    back from their last sequence.
+    """
+    class EventType(models.TextChoices):
+        ITEMS_ADDED = 'ITEMS_ADDED', 'Items added'
+        ITEM_STATUS = 'ITEM_STATUS', 'Item status changed'
+        BILLS_PAID = 'BILLS_PAID', 'Bills paid'
+
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE)
+    sequence = models.PositiveBigIntegerField()
+    event_type = models.CharField(max_length=20, choices=EventType.choices)
+    # Not a foreign key: bills are archived, the events stay
+    bill_id = models.BigIntegerField(null=True, blank=True)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('restaurant', 'sequence')
+
+    def __str__(self):
+        return f"{self.restaurant_id}#{self.sequence} {self.event_type}"
+
+class OrderEventSequence(models.Model):
+    """
+    Last sequence number given to an OrderEvent of a restaurant. Writers
+    increment it with an UPDATE, which holds the row until they commit, so
+    events commit in sequence order.
+    """
+    restaurant = models.OneToOneField(Restaurant, primary_key=True, on_delete=models.CASCADE, related_name='+')
+    last_sequence = models.PositiveBigIntegerField(default=0)
+
+class OrderEventCursor(models.Model):
+    """
+    Last sequence of a restaurant published by the relay. A separate row
+    from OrderEventSequence so that publishing never blocks the writers.
+    """
+    restaurant = models.OneToOneField(Restaurant, primary_key=True, on_delete=models.CASCADE, related_name='+')
+    published_sequence = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,192 @@
+# menu/outbound.py
+
+import asyncio
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .framing import decode_frame
+
+DEFAULTS = {
+    # Frames a client may have unacknowledged before new events are queued
+    'ACK_WINDOW': 20,
+    # A client that keeps more than this many events queued for longer than
+    # STALL_SECONDS is disconnected and told to resync
+    'HIGH_WATER': 50,
+    'STALL_SECONDS': 30,
+    # Hard limit on queued events per connection
+    'MAX_QUEUE': 200,
+}
+
+# Close code sent to clients that fell too far behind
+RESYNC_CLOSE_CODE = 4008
+# Close code sent to connections closed by the idle reaper
+IDLE_CLOSE_CODE = 4009
+
+
+def get_outbound_settings():
+    return {**DEFAULTS, **getattr(settings, 'WS_OUTBOUND', {})}
+
+
+def merge_key(event):
+    """
+    Events with the same key replace each other while they wait in the
+    queue (the latest wins); None means the event is always kept.
+    """
+    event_type = event.get('type')
+    if event_type == 'order_status_update':
+        return ('order_status_update', event.get('order_item_id'))
+    if event_type == 'queue_update':
+        return ('queue_update', event.get('bill_id'))
+    if event_type == 'bill_updated':
+        return ('bill_updated', event['bill']['id'])
+    return None
+
+
+_connections = weakref.WeakSet()
+_totals = {'merged': 0, 'disconnected': 0, 'idle_closed': 0}
+_totals_lock = threading.Lock()
+
+
+def _count(name):
+    with _totals_lock:
+        _totals[name] += 1
+
+
+def get_outbound_stats():
+    """Queue depth of the WebSocket connections of this worker process."""
+    connections = list(_connections)
+    depths = [len(connection.outbound_pending) for connection in connections]
+    with _totals_lock:
+        totals = dict(_totals)
+    return {
+        'connections': len(connections),
+            'queued_events': sum(depths),
+        'max_queue_depth': max(depths, default=0),
+        'in_flight': sum(connection.outbound_in_flight for connection in connections),
+        'merged_events': totals['merged'],
+        'slow_client_disconnects': totals['disconnected'],
+        'idle_closed': totals['idle_closed'],
+    }
+
+
+class OutboundQueueMixin:
+    """
+    Bounds what a WebSocket connection can have in flight. Every frame gets
+    a `seq` number and clients acknowledge them with
+    {"type": "ack", "seq": <last seq received>}. At most ACK_WINDOW frames
+    are sent unacknowledged; later events wait in a per-connection queue
+    where status updates of the same item are merged. The server cannot see
+    how much the transport has buffered, so a client that does not ack is
+    treated like one on a stalled network.
+
+    A client that stays behind is disconnected with a 'resync_required'
+    event and close code 4008, and reloads its state when it reconnects.
+    Consumers may also start an idle reaper, which closes the connection
+    (code 4009) once the client has sent nothing for a while.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.outbound_pending = OrderedDict()
+        self.outbound_seq = 0
+        self.acked_seq = 0
+        self.backlog_since = None
+        self.outbound_closed = False
+        self._unique_events = 0
+        self.last_received = time.monotonic()
+        self.idle_task = None
+        _connections.add(self)
+
+    @property
+    def outbound_in_flight(self):
+        return self.outbound_seq - self.acked_seq
+
+    async def _send_numbered(self, event):
+        self.outbound_seq += 1
+        await super().send_event({**event, 'seq': self.outbound_seq})
+
+    async def send_event(self, event):
+        if self.outbound_closed:
+            return
+        config = get_outbound_settings()
+        if not self.outbound_pending and self.outbound_in_flight < config['ACK_WINDOW']:
+            await self._send_numbered(event)
+            return
+
+        key = merge_key(event)
+        if key is None:
+            self._unique_events += 1
+            key = ('event', self._unique_events)
+        elif key in self.outbound_pending:
+            _count('merged')
+        self.outbound_pending[key] = event
+        await self._check_backlog(config)
+
+    async def _check_backlog(self, config):
+        depth = len(self.outbound_pending)
+        if depth <= config['HIGH_WATER']:
+            self.backlog_since = None
+            return
+        now = time.monotonic()
+        if self.backlog_since is None:
+            self.backlog_since = now
+        if depth > config['MAX_QUEUE'] or now - self.backlog_since > config['STALL_SECONDS']:
+            await self.disconnect_slow_client()
+
+    async def send_final_event(self, event, code=None):
+        """
+        Sends a last event ahead of anything still queued and closes the
+        connection.
+        """
+        self.outbound_closed = True
+        self.outbound_pending.clear()
+        await super().send_event(event)
+        await self.close(code=code)
+
+    async def disconnect_slow_client(self):
+        _count('disconnected')
+        await self.send_final_event({'type': 'resync_required', 'reason': 'slow_client'}, RESYNC_CLOSE_CODE)
+
+    def start_idle_reaper(self, timeout):
+        self.idle_task = asyncio.ensure_future(self._reap_when_idle(timeout))
+
+    async def _reap_when_idle(self, timeout):
+        while True:
+            remaining = self.last_received + timeout - time.monotonic()
+            if remaining <= 0:
+                _count('idle_closed')
+                await self.send_final_event({'type': 'idle_timeout'}, IDLE_CLOSE_CODE)
+                return
+            await asyncio.sleep(remaining)
+
+    async def receive(self, text_data=None, bytes_data=None):
+        # Any frame (an ack or a {"type": "ping"}) keeps the connection alive
+        self.last_received = time.monotonic()
+        message = decode_frame(text_data, bytes_data)
+        if not message or message.get('type') != 'ack':
+            return
+        try:
+            seq = int(message['seq'])
+        except (KeyError, TypeError, ValueError):
+            return
+        self.acked_seq = max(self.acked_seq, min(seq, self.outbound_seq))
+        await self._drain()
+
+    async def _drain(self):
+        config = get_outbound_settings()
+        while self.outbound_pending and self.outbound_in_flight < config['ACK_WINDOW']:
+            _, event = self.outbound_pending.popitem(last=False)
+            await self._send_numbered(event)
+        await self._check_backlog(config)
+
+    async def websocket_disconnect(self, message):
+        self.outbound_closed = True
+        self.outbound_pending.clear()
+        _connections.discard(self)
+        if self.idle_task is not None:
+            self.idle_task.cancel()
+        await super().websocket_disconnect(message)
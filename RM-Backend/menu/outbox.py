@@ -0,0 +1,229 @@
+# menu/outbox.py
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from .broadcasts import (
+    broadcast_new_order, cashier_group_name, chef_ticket_items, close_customer_bills,
+    customer_group_name, push_bill_to_cashier, push_bills_paid_to_cashier,
+)
+from .models import Bill, OrderEvent, OrderEventCursor, OrderEventSequence, OrderItem
+from .presence import has_listeners
+
+# Transactional outbox of order events. The views record an OrderEvent in
+# the transaction that changes the bill, so an event exists exactly when
+# the change was committed, even if the channel layer is down at the time.
+# The relay (the publish_order_events task, and the relay_order_events
+# command as a sweep) publishes the events of a restaurant in sequence
+# order and only then moves its cursor, so every event is delivered at
+# least once; messages carry their `sequence` so screens can skip
+# repeats and, after a reconnect, read what they missed from
+# events_after() instead of reloading everything.
+
+DEFAULTS = {
+    'BATCH_SIZE': 100,
+    'REPLAY_LIMIT': 500,
+}
+
+
+def get_outbox_settings():
+    return {**DEFAULTS, **getattr(settings, 'ORDER_EVENTS', {})}
+
+
+def record_event(restaurant_id, event_type, data, bill_id=None):
+    """
+    Appends an event to the restaurant's outbox, numbered after the last
+    one, and has it published once the transaction commits. Must be called
+    inside the transaction.atomic() block that makes the change.
+    """
+    from .tasks import publish_order_events
+
+    OrderEventSequence.objects.get_or_create(restaurant_id=restaurant_id)
+    OrderEventSequence.objects.filter(restaurant_id=restaurant_id).update(last_sequence=F('last_sequence') + 1)
+    sequence = OrderEventSequence.objects.filter(
+        restaurant_id=restaurant_id
+    ).values_list('last_sequence', flat=True).get()
+    event = OrderEvent.objects.create(
+        restaurant_id=restaurant_id, sequence=sequence, event_type=event_type, bill_id=bill_id, data=data
+    )
+    publish_order_events.enqueue(restaurant_id)
+    return event
+
+
+def record_items_added(bill, order_items, cashier_event):
+    """
+    Records new items of a bill ('bill_added' for a new bill, 'bill_updated'
+    for items added to an open one), given with their variant and menu item
+    loaded. Returns the chef ticket items.
+    """
+    items = chef_ticket_items(order_items)
+    record_event(bill.restaurant_id, OrderEvent.EventType.ITEMS_ADDED, {
+        'cashier_event': cashier_event, 'customer_name': bill.customer_name,
+        'table_number': bill.table_number, 'items': items,
+    }, bill_id=bill.id)
+    return items
+
+
+def record_item_status(order_item, eta):
+    """Records a status change of an item, with the bill's ETA after it."""
+    record_event(order_item.bill.restaurant_id, OrderEvent.EventType.ITEM_STATUS, {
+        'order_item_id': order_item.id, 'status': order_item.status, 'eta': eta,
+    }, bill_id=order_item.bill_id)
+
+
+def record_bills_paid(restaurant_id, bill_ids):
+    if bill_ids:
+        record_event(restaurant_id, OrderEvent.EventType.BILLS_PAID, {'bill_ids': list(bill_ids)})
+
+
+def _publish_items_added(event, restaurant_slug):
+    bill = Bill.objects.filter(id=event.bill_id).first()
+    if bill is None:
+        return
+    order_items = list(OrderItem.objects.filter(
+        id__in=[item['order_item_id'] for item in event.data['items']]
+    ).select_related('variant__menu_item').order_by('id'))
+    broadcast_new_order(restaurant_slug, bill, order_items, sequence=event.sequence)
+    push_bill_to_cashier(bill, event.data['cashier_event'], sequence=event.sequence)
+
+
+def _publish_item_status(event, restaurant_slug):
+    order_item = OrderItem.objects.select_related('bill', 'variant__menu_item').filter(
+        id=event.data['order_item_id']
+    ).first()
+    if order_item is None:
+        return
+    channel_layer = get_channel_layer()
+    bill = order_item.bill
+    item_status = event.data['status']
+
+    # Most customers close the page after ordering, so the message is
+    # skipped when nobody is watching the bill
+    customer_group = customer_group_name(bill.id)
+    if has_listeners(customer_group):
+        customer_message = {
+            'type': 'order_status_update',
+            'order_item_id': order_item.id,
+            'status': item_status,
+            'item_name': order_item.variant.menu_item.name,
+            'sequence': event.sequence,
+        }
+        if item_status == OrderItem.OrderStatus.ACCEPTED:
+            customer_message['preparation_time'] = order_item.variant.preparation_time
+        customer_message.update(event.data['eta'])
+        async_to_sync(channel_layer.group_send)(customer_group, customer_message)
+
+    # Check if this is the last item in the order to be marked as COMPLETED
+    cashier_group = cashier_group_name(restaurant_slug)
+    if item_status != OrderItem.OrderStatus.COMPLETED or not has_listeners(cashier_group):
+        return
+    bill_items = list(OrderItem.objects.filter(bill=bill).select_related('variant__menu_item'))
+    if not all(item.status == OrderItem.OrderStatus.COMPLETED for item in bill_items):
+        return
+    total_amount = sum(item.variant.price * item.quantity for item in bill_items)
+    items_data = [{
+        'name': item.variant.menu_item.name,
+        'variant_name': item.variant.variant_name,
+        'quantity': item.quantity,
+        'price': float(item.variant.price)
+    } for item in bill_items]
+    async_to_sync(channel_layer.group_send)(cashier_group, {
+        'type': 'order_ready_for_payment',
+        'data': {
+            'id': bill.id,
+            'table_number': bill.table_number,
+            'totalAmount': float(total_amount),
+            'items': items_data,
+            'sequence': event.sequence,
+        }
+    })
+
+
+def _publish_bills_paid(event, restaurant_slug):
+    push_bills_paid_to_cashier(restaurant_slug, event.data['bill_ids'], sequence=event.sequence)
+    close_customer_bills(event.data['bill_ids'])
+
+
+PUBLISHERS = {
+    OrderEvent.EventType.ITEMS_ADDED: _publish_items_added,
+    OrderEvent.EventType.ITEM_STATUS: _publish_item_status,
+    OrderEvent.EventType.BILLS_PAID: _publish_bills_paid,
+}
+
+
+def publish_batch(restaurant_id, batch_size):
+    """
+    Publishes the next `batch_size` unpublished events of a restaurant, in
+    sequence order, and returns how many were published. The cursor row is
+    locked meanwhile, so a second relay of the same restaurant waits
+    instead of publishing out of order. If an event fails to publish, the
+    cursor is saved after the last one that did, and the error is raised.
+    """
+    OrderEventCursor.objects.get_or_create(restaurant_id=restaurant_id)
+    error = None
+    with transaction.atomic():
+        cursor = OrderEventCursor.objects.select_for_update(of=('self',)).select_related('restaurant').get(
+            restaurant_id=restaurant_id
+        )
+        events = list(OrderEvent.objects.filter(
+            restaurant_id=restaurant_id, sequence__gt=cursor.published_sequence
+        ).order_by('sequence')[:batch_size])
+        published = 0
+        for event in events:
+            try:
+                PUBLISHERS[event.event_type](event, cursor.restaurant.slug)
+            except Exception as exc:
+                error = exc
+                break
+            cursor.published_sequence = event.sequence
+            published += 1
+        if published:
+            cursor.save(update_fields=['published_sequence', 'updated_at'])
+    if error is not None:
+        raise error
+    return published
+
+
+def publish_pending(restaurant_id):
+    """Publishes every unpublished event of a restaurant. Returns how many."""
+    batch_size = get_outbox_settings()['BATCH_SIZE']
+    total = 0
+    while True:
+        published = publish_batch(restaurant_id, batch_size)
+        total += published
+        if published < batch_size:
+            return total
+
+
+def restaurants_with_pending_events():
+    published = dict(OrderEventCursor.objects.values_list('restaurant_id', 'published_sequence'))
+    return [
+        restaurant_id
+        for restaurant_id, last_sequence in OrderEventSequence.objects.values_list('restaurant_id', 'last_sequence')
+        if last_sequence > published.get(restaurant_id, 0)
+    ]
+
+
+def events_after(restaurant_id, after, limit=None):
+    """
+    The events of a restaurant after sequence `after`, oldest first, for a
+    screen or read model catching up. 'reset' is True when events it
+    missed were already pruned, and it has to reload everything instead.
+    """
+    limit = limit or get_outbox_settings()['REPLAY_LIMIT']
+    rows = list(OrderEvent.objects.filter(
+        restaurant_id=restaurant_id, sequence__gt=after
+    ).order_by('sequence').values('sequence', 'event_type', 'bill_id', 'data', 'created_at')[:limit])
+    last_sequence = OrderEventSequence.objects.filter(
+        restaurant_id=restaurant_id
+    ).values_list('last_sequence', flat=True).first() or 0
+    first_kept = rows[0]['sequence'] if rows else last_sequence + 1
+    return {
+        'events': rows,
+        'last_sequence': last_sequence,
+        'reset': after < last_sequence and first_kept > after + 1,
+        'has_more': bool(rows) and rows[-1]['sequence'] < last_sequence,
+    }
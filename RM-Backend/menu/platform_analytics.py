@@ -0,0 +1,137 @@
+# menu/platform_analytics.py
+
+import queue
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.utils import timezone
+
+from restaurants.models import Restaurant
+
+from .archive import bill_count, created_between, paid_sales, top_dishes
+
+DEFAULTS = {
+    # Restaurants aggregated at the same time, each worker thread with its
+    # own database connection
+    'MAX_WORKERS': 4,
+    'CACHE_TTL_SECONDS': 300,
+    'TOP_DISHES': 3,
+}
+
+PERIODS = ('today', 'week', 'month', 'year')
+
+
+def get_platform_analytics_settings():
+    return {**DEFAULTS, **getattr(settings, 'PLATFORM_ANALYTICS', {})}
+
+
+def period_days(period, today=None):
+    """
+    (first day, last day) of a period named like the order report's:
+    today, week (the last 7 days and today), month or year so far.
+    """
+    today = today or timezone.now().date()
+    if period == 'today':
+        return today, today
+    if period == 'week':
+        return today - timedelta(days=7), today
+    if period == 'month':
+        return today.replace(day=1), today
+    if period == 'year':
+        return today.replace(month=1, day=1), today
+    raise ValueError(f"Unknown period {period!r}, expected one of {', '.join(PERIODS)}")
+
+
+def restaurant_analytics(restaurant_id, first_day, last_day, top_dish_count):
+    """Sales, bill count and top dishes of one restaurant, live and archived."""
+    period = created_between(first_day, last_day)
+    return {
+        'sales': paid_sales(bill__restaurant_id=restaurant_id, **period),
+        'orders': bill_count(restaurant_id=restaurant_id, **period),
+        'top_dishes': [
+            {'name': name, 'quantity': quantity}
+            for name, quantity in top_dishes(top_dish_count, bill__restaurant_id=restaurant_id, **period)
+        ],
+    }
+
+
+def cache_key(restaurant_id, first_day, last_day):
+    return f'platform_analytics:{restaurant_id}:{first_day.isoformat()}:{last_day.isoformat()}'
+
+
+def _aggregate_all(restaurant_ids, first_day, last_day, config):
+    """
+    restaurant_analytics of every restaurant, run by up to MAX_WORKERS
+    threads. Each thread takes restaurants from a shared queue until it is
+    empty, so it uses a single connection for all of them, closed when the
+    thread is done.
+    """
+    results = {}
+    pending = queue.SimpleQueue()
+    for restaurant_id in restaurant_ids:
+        pending.put(restaurant_id)
+
+    def work():
+        try:
+            while True:
+                try:
+                    restaurant_id = pending.get_nowait()
+                except queue.Empty:
+                    return
+                results[restaurant_id] = restaurant_analytics(
+                    restaurant_id, first_day, last_day, config['TOP_DISHES']
+                )
+        finally:
+            connections.close_all()
+
+    workers = min(config['MAX_WORKERS'], len(restaurant_ids))
+    if workers <= 1:
+        # Not worth a thread (and a second connection)
+        for restaurant_id in restaurant_ids:
+            results[restaurant_id] = restaurant_analytics(restaurant_id, first_day, last_day, config['TOP_DISHES'])
+        return results
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='platform-analytics') as executor:
+        futures = [executor.submit(work) for _ in range(workers)]
+    for future in futures:
+        # Raises the first error of a worker, if any
+        future.result()
+    return results
+
+
+def platform_analytics(first_day, last_day):
+    """
+    Sales, bill counts and top dishes of every restaurant between first_day
+    and last_day, and the platform totals. The result of each restaurant is
+    cached for CACHE_TTL_SECONDS, so only the restaurants missing from the
+    cache are aggregated, in parallel.
+    """
+    config = get_platform_analytics_settings()
+    restaurants = list(Restaurant.objects.order_by('id').values_list('id', 'name', 'slug'))
+    keys = {restaurant_id: cache_key(restaurant_id, first_day, last_day) for restaurant_id, _, _ in restaurants}
+    cached = cache.get_many(keys.values())
+    results = {restaurant_id: cached[key] for restaurant_id, key in keys.items() if key in cached}
+
+    missing = [restaurant_id for restaurant_id in keys if restaurant_id not in results]
+    if missing:
+        computed = _aggregate_all(missing, first_day, last_day, config)
+        cache.set_many(
+            {keys[restaurant_id]: result for restaurant_id, result in computed.items()},
+            config['CACHE_TTL_SECONDS'],
+        )
+        results.update(computed)
+
+    rows = [
+        {'restaurant_id': restaurant_id, 'name': name, 'slug': slug, **results[restaurant_id]}
+        for restaurant_id, name, slug in restaurants
+    ]
+    rows.sort(key=lambda row: row['sales'], reverse=True)
+    return {
+        'start_date': first_day,
+        'end_date': last_day,
+        'total_sales': sum(row['sales'] for row in rows),
+        'total_orders': sum(row['orders'] for row in rows),
+        'restaurants': rows,
+    }
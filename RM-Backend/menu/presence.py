@@ -0,0 +1,130 @@
+# menu/presence.py
+
+import asyncio
+import random
+import time
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Every open connection re-registers itself once per window
+    'HEARTBEAT_SECONDS': 30,
+}
+
+
+def get_presence_settings():
+    return {**DEFAULTS, **getattr(settings, 'WS_PRESENCE', {})}
+
+
+def current_window():
+    return int(time.time() // get_presence_settings()['HEARTBEAT_SECONDS'])
+
+
+def _key(group_name, window):
+    return f'ws_presence_{group_name}_{window}'
+
+
+# Connections of a group are counted per heartbeat window: a connection adds
+# itself to the current window on connect and again at the start of every
+# window, and takes itself out of the windows it counted in on disconnect.
+# The count of a group is the larger of the current and the previous window,
+# so connections of a crashed worker drop out after two windows and a lost
+# cache entry is rebuilt by the next round of heartbeats.
+
+def mark_present(group_names, window):
+    ttl = 3 * get_presence_settings()['HEARTBEAT_SECONDS']
+    try:
+        for group_name in group_names:
+            key = _key(group_name, window)
+            if not cache.add(key, 1, ttl):
+                try:
+                    cache.incr(key)
+                except ValueError:
+                    cache.add(key, 1, ttl)
+    except Exception:
+        # Presence is advisory: publishers send anyway when the cache is down
+        pass
+
+
+def mark_absent(group_names, windows):
+    try:
+        for group_name in group_names:
+            for window in windows:
+                try:
+                    cache.decr(_key(group_name, window))
+                except ValueError:
+                    pass
+    except Exception:
+        pass
+
+
+def listener_counts(group_names):
+    """Connections per group, with one cache round trip for all groups."""
+    window = current_window()
+    keys = {group_name: (_key(group_name, window), _key(group_name, window - 1)) for group_name in group_names}
+    values = cache.get_many([key for pair in keys.values() for key in pair])
+    return {
+        group_name: max(0, values.get(current, 0), values.get(previous, 0))
+        for group_name, (current, previous) in keys.items()
+    }
+
+
+def groups_with_listeners(group_names):
+    """
+    The subset of `group_names` with at least one open connection. Returns
+    every group when presence tracking is off or the cache is unavailable,
+    so a failed lookup never drops a message.
+    """
+    group_names = list(group_names)
+    if not group_names or not get_presence_settings()['ENABLED']:
+        return set(group_names)
+    try:
+        counts = listener_counts(group_names)
+    except Exception:
+        return set(group_names)
+    return {group_name for group_name, count in counts.items() if count > 0}
+
+
+def has_listeners(group_name):
+    return group_name in groups_with_listeners([group_name])
+
+
+class PresenceConsumerMixin:
+    """
+    Registers the groups of a WebSocket consumer in the presence registry
+    for as long as the connection is open.
+    """
+    presence_groups = ()
+    presence_task = None
+
+    async def track_presence(self, *group_names):
+        if not get_presence_settings()['ENABLED']:
+            return
+        self.presence_groups = group_names
+        self.presence_windows = []
+        await self._mark_presence_window()
+        self.presence_task = asyncio.ensure_future(self._presence_heartbeat())
+
+    async def untrack_presence(self):
+        if self.presence_task is None:
+            return
+        self.presence_task.cancel()
+        self.presence_task = None
+        await sync_to_async(mark_absent)(self.presence_groups, self.presence_windows)
+
+    async def _mark_presence_window(self):
+        window = current_window()
+        await sync_to_async(mark_present)(self.presence_groups, window)
+        # Only the current and the previous window are ever read
+        self.presence_windows = [w for w in self.presence_windows if w >= window - 1] + [window]
+
+    async def _presence_heartbeat(self):
+        heartbeat = get_presence_settings()['HEARTBEAT_SECONDS']
+        while True:
+            # Wake up shortly after the next window starts; the jitter keeps
+            # all connections from hitting the cache at the same moment
+            await asyncio.sleep(heartbeat - time.time() % heartbeat + random.uniform(0, heartbeat / 4))
+            await self._mark_presence_window()
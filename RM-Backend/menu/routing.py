@@ -5,6 +5,8 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/chef/(?P<restaurant_slug>[-\w]+)/$', consumers.ChefConsumer.as_asgi()),
+    re_path(r'ws/chef/(?P<restaurant_slug>[-\w]+)/(?P<station_slug>[-\w]+)/$', consumers.ChefConsumer.as_asgi()),
     re_path(r'ws/cashier/(?P<restaurant_slug>[-\w]+)/$', consumers.CashierConsumer.as_asgi()),
     re_path(r'ws/customer/(?P<bill_id>\d+)/$', consumers.CustomerConsumer.as_asgi()),
+    re_path(r'ws/menu/(?P<restaurant_slug>[-\w]+)/$', consumers.MenuConsumer.as_asgi()),
 ]
\ No newline at end of file
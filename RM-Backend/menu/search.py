@@ -0,0 +1,256 @@
+# menu/search.py
+
+import heapq
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Sum
+from django.utils import timezone
+
+from .menu_cache import menu_version
+from .models import MenuItem, OrderItem
+
+DEFAULTS = {
+    # Popularity (items ordered in this many days) is only refreshed when
+    # the index is rebuilt: on a menu change, or when it gets this old
+    'MAX_AGE_SECONDS': 600,
+    'POPULARITY_DAYS': 30,
+    'RESULT_LIMIT': 20,
+}
+
+# Weight of a query word matching an item in each way; an item's score is
+# the sum over the query words of the best way each one matched
+NAME_PREFIX, NAME_TYPO, DESCRIPTION_PREFIX, DESCRIPTION_TYPO = 4.0, 2.0, 1.0, 0.5
+
+WORD_RE = re.compile(r'\w+')
+
+
+def get_menu_search_settings():
+    return {**DEFAULTS, **getattr(settings, 'MENU_SEARCH', {})}
+
+
+def words(text):
+    return WORD_RE.findall(text.lower())
+
+
+def trigrams(word):
+    padded = f'  {word} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def allowed_typos(word):
+    if len(word) < 3:
+        return 0
+    return 1 if len(word) < 6 else 2
+
+
+def edit_distance(a, b, limit):
+    """Levenshtein distance of a and b, or limit + 1 once it is over limit."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + (char_a != char_b)))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+def iter_bits(bits):
+    """Positions of the set bits of an int, lowest first."""
+    while bits:
+        lowest = bits & -bits
+        yield lowest.bit_length() - 1
+        bits ^= lowest
+
+
+class _FieldIndex:
+    """
+    The words of one text field of every item. Sets of items are bitsets
+    (Python ints, bit i = the item at position i), so combining matches is
+    a handful of integer operations instead of set building.
+    """
+
+    def __init__(self):
+        self.word_bits = {}
+        self.prefix_bits = {}
+        self.words_by_trigram = {}
+
+    def add(self, position, text):
+        bit = 1 << position
+        for word in set(words(text)):
+            if word not in self.word_bits:
+                self.word_bits[word] = 0
+                for trigram in trigrams(word):
+                    self.words_by_trigram.setdefault(trigram, set()).add(word)
+            self.word_bits[word] |= bit
+            for end in range(1, len(word) + 1):
+                self.prefix_bits[word[:end]] = self.prefix_bits.get(word[:end], 0) | bit
+
+    def prefix_matches(self, query_word):
+        return self.prefix_bits.get(query_word, 0)
+
+    def typo_matches(self, query_word):
+        """
+        Items with a word that is within the allowed typos of the query word,
+        or that starts with such a prefix (for words still being typed).
+        """
+        limit = allowed_typos(query_word)
+        if not limit:
+            return 0
+        candidates = set()
+        for trigram in trigrams(query_word):
+            candidates |= self.words_by_trigram.get(trigram, set())
+        bits = 0
+        for word in candidates:
+            if (edit_distance(query_word, word, limit) <= limit
+                    or edit_distance(query_word, word[:len(query_word)], limit) <= limit):
+                bits |= self.word_bits[word]
+        return bits
+
+
+class MenuSearchIndex:
+    """
+    Search over the available items of one restaurant: prefix and typo
+    tolerant matching of the name and description, food type and cuisine
+    filters, and ranking by score, then by how often the item was ordered.
+    """
+
+    def __init__(self, items, popularity):
+        self.item_ids = []
+        self.popularity = []
+        self.names = []
+        self.name_index = _FieldIndex()
+        self.description_index = _FieldIndex()
+        self.food_type_bits = {}
+        self.cuisine_bits = {}
+        for position, item in enumerate(items):
+            bit = 1 << position
+            self.item_ids.append(item['id'])
+            self.popularity.append(popularity.get(item['id'], 0))
+            self.names.append(item['name'].lower())
+            self.name_index.add(position, item['name'])
+            self.description_index.add(position, item['description'] or '')
+            for food_type_id in item['food_types']:
+                self.food_type_bits[food_type_id] = self.food_type_bits.get(food_type_id, 0) | bit
+            for cuisine_id in item['cuisines']:
+                self.cuisine_bits[cuisine_id] = self.cuisine_bits.get(cuisine_id, 0) | bit
+        self.all_bits = (1 << len(self.item_ids)) - 1
+        self._word_matches = OrderedDict()
+        self.built_at = time.monotonic()
+
+    @classmethod
+    def build(cls, restaurant_id):
+        config = get_menu_search_settings()
+        items = {}
+        rows = MenuItem.objects.filter(
+            restaurant_id=restaurant_id, is_available=True
+        ).order_by('id').values_list('id', 'name', 'description', 'food_types', 'cuisines')
+        # One row per food type x cuisine pair of an item
+        for item_id, name, description, food_type_id, cuisine_id in rows:
+            item = items.setdefault(item_id, {
+                'id': item_id, 'name': name, 'description': description, 'food_types': set(), 'cuisines': set()
+            })
+            if food_type_id is not None:
+                item['food_types'].add(food_type_id)
+            if cuisine_id is not None:
+                item['cuisines'].add(cuisine_id)
+        popularity = dict(OrderItem.objects.filter(
+            bill__restaurant_id=restaurant_id,
+            created_at__gte=timezone.now() - timedelta(days=config['POPULARITY_DAYS'])
+        ).values_list('variant__menu_item_id').annotate(ordered=Sum('quantity')).order_by())
+        return cls(items.values(), popularity)
+
+    def _facet_bits(self, bits_by_id, ids):
+        """Items having any of the given food types (or cuisines)."""
+        bits = 0
+        for facet_id in ids:
+            bits |= bits_by_id.get(facet_id, 0)
+        return bits
+
+    def _match_word(self, query_word):
+        """(bits, weight) pairs of the ways the query word matches items."""
+        matches = self._word_matches.get(query_word)
+        if matches is None:
+            matches = [
+                (self.name_index.prefix_matches(query_word), NAME_PREFIX),
+                (self.name_index.typo_matches(query_word), NAME_TYPO),
+                (self.description_index.prefix_matches(query_word), DESCRIPTION_PREFIX),
+                (self.description_index.typo_matches(query_word), DESCRIPTION_TYPO),
+            ]
+            matches = [(bits, weight) for bits, weight in matches if bits]
+            self._word_matches[query_word] = matches
+            # Queries are typed a letter at a time, so the same words repeat
+            if len(self._word_matches) > 2048:
+                self._word_matches.popitem(last=False)
+        return matches
+
+    def search(self, query='', food_types=(), cuisines=(), limit=20):
+        """
+        Item ids matching every word of `query` (and the filters), best
+        first. Without query words all items passing the filters match,
+        most popular first.
+        """
+        candidates = self.all_bits
+        if food_types:
+            candidates &= self._facet_bits(self.food_type_bits, food_types)
+        if cuisines:
+            candidates &= self._facet_bits(self.cuisine_bits, cuisines)
+
+        scores = None
+        for query_word in words(query):
+            matches = self._match_word(query_word)
+            word_bits = 0
+            for bits, _ in matches:
+                word_bits |= bits
+            candidates &= word_bits
+            if not candidates:
+                return []
+            word_scores = {}
+            for bits, weight in matches:
+                for position in iter_bits(bits & candidates):
+                    if word_scores.get(position, 0) < weight:
+                        word_scores[position] = weight
+            if scores is None:
+                scores = word_scores
+            else:
+                scores = {position: scores[position] + word_scores[position] for position in iter_bits(candidates)}
+
+        def rank(position):
+            score = scores[position] if scores is not None else 0
+            return (-score, -self.popularity[position], self.names[position])
+
+        best = heapq.nsmallest(limit, iter_bits(candidates), key=rank)
+        return [self.item_ids[position] for position in best]
+
+
+_indexes = {}
+_registry_lock = threading.Lock()
+
+
+def get_menu_search_index(restaurant_id):
+    """
+    The search index of a restaurant, built the first time it is needed in
+    this process and again whenever the restaurant's menu version changes
+    (or the index is older than MAX_AGE_SECONDS).
+    """
+    version = menu_version(restaurant_id)
+    max_age = get_menu_search_settings()['MAX_AGE_SECONDS']
+    entry = _indexes.get(restaurant_id)
+    if entry is None or entry[0] != version or time.monotonic() - entry[1].built_at > max_age:
+        entry = (version, MenuSearchIndex.build(restaurant_id))
+        with _registry_lock:
+            _indexes[restaurant_id] = entry
+    return entry[1]
+
+
+def reset_menu_search_indexes():
+    with _registry_lock:
+        _indexes.clear()
@@ -1,7 +1,7 @@
 # menu/serializers.py
 
 from rest_framework import serializers
-from .models import Category, MenuItem, MenuItemVariant, Bill, OrderItem , FoodType, Cuisine
+from .models import Category, MenuItem, MenuItemVariant, Bill, OrderItem , FoodType, Cuisine, Station
 
 # --- Read-Only Serializers (for displaying the menu) ---
 
@@ -47,12 +47,16 @@ class BillSerializer(serializers.ModelSerializer):
     def create(self, validated_data):
         order_items_data = validated_data.pop('order_items')
         bill = Bill.objects.create(**validated_data)
-        for item_data in order_items_data:
-            OrderItem.objects.create(
+        stations = OrderItem.stations_of([item_data['variant_id'] for item_data in order_items_data])
+        OrderItem.objects.bulk_create([
+            OrderItem(
                 bill=bill,
                 variant_id=item_data['variant_id'],
-                quantity=item_data['quantity']
+                quantity=item_data['quantity'],
+                station_id=stations.get(item_data['variant_id'])
             )
+            for item_data in order_items_data
+        ])
         return bill
 
 # --- Cashier Serializers ---
@@ -76,6 +80,10 @@ class CashierBillSerializer(serializers.ModelSerializer):
         fields = ['id', 'customer_name', 'table_number', 'payment_status', 'created_at', 'order_items', 'total_price']
 
     def get_total_price(self, bill):
+        # Use the total annotated by the queryset when there is one
+        total_amount = getattr(bill, 'total_amount', None)
+        if total_amount is not None:
+            return total_amount
         # This method calculates the total price by summing up all items
         return sum(item.variant.price * item.quantity for item in bill.order_items.all())
 
@@ -166,7 +174,19 @@ class MenuItemManageSerializer(serializers.ModelSerializer):
 class CategoryManageSerializer(serializers.ModelSerializer):
     class Meta:
         model = Category
-        fields = ['id', 'name']
+        fields = ['id', 'name', 'station']
+
+    def validate_station(self, station):
+        # A category can only be routed to a station of the same restaurant
+        request = self.context.get('request')
+        if station and request and station.restaurant_id != getattr(request.user, 'restaurant_id', None):
+            raise serializers.ValidationError("Unknown station.")
+        return station
+
+class StationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Station
+        fields = ['id', 'name', 'slug']
 
 class FoodTypeSerializer(serializers.ModelSerializer):
     class Meta:
@@ -248,4 +268,32 @@ class KitchenOrderSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Bill
-        fields = ['id', 'table_number', 'customer_name', 'created_at', 'order_items']
\ No newline at end of file
+        fields = ['id', 'table_number', 'customer_name', 'created_at', 'order_items']
+
+# --- Cashier Settlement Serializers ---
+
+class BillSettlementSerializer(serializers.Serializer):
+    """
+    Validates one (bill_id, payment_method) pair of a batch settlement.
+    """
+    bill_id = serializers.IntegerField()
+    payment_method = serializers.ChoiceField(choices=Bill.PaymentMethod.choices)
+
+class BatchSettlementSerializer(serializers.Serializer):
+    bills = BillSettlementSerializer(many=True, allow_empty=False)
+
+class BulkAvailabilitySerializer(serializers.Serializer):
+    """
+    Selects menu items by id, by category or by cuisine (exactly one of
+    them) and the availability to set on all of them.
+    """
+    is_available = serializers.BooleanField()
+    item_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, required=False)
+    category = serializers.IntegerField(required=False)
+    cuisine = serializers.IntegerField(required=False)
+
+    def validate(self, data):
+        selectors = [name for name in ('item_ids', 'category', 'cuisine') if name in data]
+        if len(selectors) != 1:
+            raise serializers.ValidationError("Give exactly one of 'item_ids', 'category' or 'cuisine'.")
+        return data
@@ -0,0 +1,66 @@
+# menu/settlement.py
+
+from django.db import transaction
+from django.utils import timezone
+
+from .kitchen_queue import record_bills_closed
+from .kitchen_load import remove_bills
+from .models import Bill
+from .outbox import record_bills_paid
+
+
+def settle_bills(restaurant, settlements):
+    """
+    Marks many bills of one restaurant as PAID.
+
+    `settlements` is a list of (bill_id, payment_method) pairs. Bills are
+    grouped by payment method and each group is closed with one conditional
+    UPDATE that only touches PENDING bills of this restaurant, so a bill
+    that was already settled (or belongs to someone else) is never changed.
+    Returns one result dict per requested pair, in request order.
+    """
+    ids_by_method = {}
+    seen = set()
+    for bill_id, payment_method in settlements:
+        if bill_id in seen:
+            continue
+        seen.add(bill_id)
+        ids_by_method.setdefault(payment_method, []).append(bill_id)
+
+    paid = {}
+    with transaction.atomic():
+        now = timezone.now()
+        for payment_method, bill_ids in ids_by_method.items():
+            pending = Bill.objects.filter(
+                id__in=bill_ids,
+                restaurant=restaurant,
+                payment_status=Bill.PaymentStatus.PENDING
+            )
+            locked_ids = list(pending.select_for_update().values_list('id', flat=True))
+            if not locked_ids:
+                continue
+            pending.filter(id__in=locked_ids).update(
+                payment_status=Bill.PaymentStatus.PAID,
+                payment_method=payment_method,
+                updated_at=now
+            )
+            for bill_id in locked_ids:
+                paid[bill_id] = payment_method
+        # Downstream consumers are fed once for the whole batch; the order
+        # event is published after commit (menu.outbox)
+        remove_bills(restaurant.id, list(paid))
+        record_bills_paid(restaurant.id, list(paid))
+    record_bills_closed(restaurant.id, list(paid))
+
+    results = []
+    reported = set()
+    for bill_id, payment_method in settlements:
+        if bill_id in reported:
+            results.append({'bill_id': bill_id, 'status': 'DUPLICATE'})
+            continue
+        reported.add(bill_id)
+        if bill_id in paid:
+            results.append({'bill_id': bill_id, 'status': Bill.PaymentStatus.PAID, 'payment_method': paid[bill_id]})
+        else:
+            results.append({'bill_id': bill_id, 'status': 'NOT_FOUND'})
+    return results
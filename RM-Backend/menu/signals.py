@@ -0,0 +1,49 @@
+# menu/signals.py
+
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from .menu_cache import bump_menu_version
+from .models import Category, Cuisine, FoodType, MenuItem, MenuItemVariant, Station
+
+# Versions are bumped after commit, so a request that reads the new version
+# can never cache the old rows. QuerySet.update() sends no signals; code
+# that changes menu items that way calls bump_menu_version() itself.
+
+
+def _bump_after_commit(restaurant_id=None):
+    transaction.on_commit(lambda: bump_menu_version(restaurant_id))
+
+
+@receiver([post_save, post_delete], sender=MenuItem)
+def menu_item_changed(sender, instance, **kwargs):
+    _bump_after_commit(instance.restaurant_id)
+
+
+@receiver([post_save, post_delete], sender=MenuItemVariant)
+def variant_changed(sender, instance, **kwargs):
+    restaurant_id = MenuItem.objects.filter(id=instance.menu_item_id).values_list('restaurant_id', flat=True).first()
+    if restaurant_id is not None:
+        _bump_after_commit(restaurant_id)
+
+
+# The variant cache keeps the station of each item's category
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Station)
+def station_routing_changed(sender, instance, **kwargs):
+    _bump_after_commit(instance.restaurant_id)
+
+
+@receiver([post_save, post_delete], sender=FoodType)
+@receiver([post_save, post_delete], sender=Cuisine)
+def label_changed(sender, instance, **kwargs):
+    _bump_after_commit()
+
+
+@receiver(m2m_changed, sender=MenuItem.food_types.through)
+@receiver(m2m_changed, sender=MenuItem.cuisines.through)
+def menu_item_labels_changed(sender, instance, action, reverse, **kwargs):
+    if not action.startswith('post_'):
+        return
+    _bump_after_commit(None if reverse else instance.restaurant_id)
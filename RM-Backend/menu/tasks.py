@@ -0,0 +1,15 @@
+# menu/tasks.py
+
+from tasks.runner import task
+
+from .outbox import publish_pending
+
+
+@task(max_attempts=10)
+def publish_order_events(restaurant_id):
+    """
+    Relays the unpublished order events of a restaurant (menu.outbox) to
+    the WebSocket groups. Queued by every event; a run that finds nothing
+    left to publish (an earlier run took it) is a cheap no-op.
+    """
+    publish_pending(restaurant_id)
@@ -1,10 +1,58 @@
-from rest_framework.test import APITestCase
+from rest_framework.test import APITestCase, APITransactionTestCase
 from rest_framework import status
 from django.urls import reverse
 from restaurants.models import Restaurant
 from .models import Category, MenuItem, MenuItemVariant
 from .models import Category, MenuItem, MenuItemVariant, Bill, OrderItem # Add Bill and OrderItem
+from django.conf import settings
 from django.test import override_settings # <-- ADD THIS IMPORT
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import get_channel_layer
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from users.models import StaffUser
+from users.serializers import CustomTokenObtainPairSerializer
+from .broadcasts import cashier_group_name, chef_group_name, customer_group_name, pending_bills_queryset, pending_bills_snapshot
+from .broadcasts import menu_group_name
+from .models import Station
+from .throttling import PublicTokenBucketThrottle
+from .routing import websocket_urlpatterns
+from .presence import current_window, groups_with_listeners, mark_present
+from .outbound import get_outbound_stats
+from . import fast_serializers
+from .serializers import CashierBillSerializer, KitchenOrderSerializer, PublicMenuItemSerializer, RestaurantOrderListSerializer
+from .models import FoodType
+from .models import Cuisine
+from .search import MenuSearchIndex, reset_menu_search_indexes
+from .platform_analytics import period_days
+from tasks.models import Task
+from .models import OrderEvent
+from .outbox import PUBLISHERS, publish_pending
+from unittest import mock
+from tasks.runner import claim_tasks, execute, get_task_settings
+from .models import ArchivedBill, ArchivedOrderItem
+from .archive import archive_batch, archive_paid_bills
+from django.utils import timezone
+from datetime import timedelta
+from rest_framework.renderers import JSONRenderer
+from django.db.models import Prefetch
+from .kitchen_queue import KitchenQueue, get_kitchen_queue, record_new_items, record_status_change, reset_kitchen_queues
+from .variant_cache import reset_variant_cache, resolve_variants
+from . import kitchen_load
+from django.core.cache import cache
+from django.db import IntegrityError, connection, transaction
+from django.test.utils import CaptureQueriesContext
+import asyncio
+import json
+import random
+import time
+
+import msgpack
+
+# Tests use a per-process cache instead of the Redis one from settings
+LOCMEM_CACHES = {"default": {"BACKEND": "django.core.cache.backends.locmem.LocMemCache"}}
+# WebSocket side effects run inline, as there is no task worker in the tests
+EAGER_TASKS = {"EAGER": True}
 
 
 class MenuAPITests(APITestCase):
@@ -86,7 +134,7 @@ class MenuAPITests(APITestCase):
     "default": {
         "BACKEND": "channels.layers.InMemoryChannelLayer"
     }
-})
+}, TASKS=EAGER_TASKS)
 class OrderAPITests(APITestCase):
     def setUp(self):
         """Set up a restaurant with a specific location for geofence testing."""
@@ -147,4 +195,1470 @@ class OrderAPITests(APITestCase):
         # Assert that the request was forbidden
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         # Assert that NO Bill was created in the database
-        self.assertEqual(Bill.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Bill.objects.count(), 0)
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, TASKS=EAGER_TASKS)
+class CashierFeedTests(APITestCase):
+    def setUp(self):
+        """Two restaurants, each with one pending bill, and a cashier for the first."""
+        self.restaurant = Restaurant.objects.create(
+            name="Cashier Cafe", slug="cashier-cafe", latitude=10.0, longitude=10.0
+        )
+        other = Restaurant.objects.create(
+            name="Other Cafe", slug="other-cafe", latitude=11.0, longitude=11.0
+        )
+        for restaurant in (self.restaurant, other):
+            category = Category.objects.create(restaurant=restaurant, name="Mains")
+            menu_item = MenuItem.objects.create(restaurant=restaurant, category=category, name="Thali")
+            variant = MenuItemVariant.objects.create(menu_item=menu_item, variant_name="Full", price=120.00)
+            bill = Bill.objects.create(restaurant=restaurant, customer_name="Guest", table_number="1")
+            OrderItem.objects.create(bill=bill, variant=variant, quantity=2)
+        self.bill = Bill.objects.get(restaurant=self.restaurant)
+        self.cashier = StaffUser.objects.create_user(
+            username="cashier1", password="pass12345", role="CASHIER", restaurant=self.restaurant
+        )
+
+    def test_pending_bills_are_scoped_to_the_cashiers_restaurant(self):
+        self.client.force_authenticate(self.cashier)
+        response = self.client.get(reverse('cashier-bill-list'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([bill['id'] for bill in response.data], [self.bill.id])
+        self.assertEqual(float(response.data[0]['total_price']), 240.0)
+
+    def test_cashier_socket_requires_the_restaurants_cashier(self):
+        chef = StaffUser.objects.create_user(
+            username="feed-chef", password="pass12345", role="CHEF", restaurant=self.restaurant
+        )
+
+        def token(user):
+            return CustomTokenObtainPairSerializer.get_token(user).access_token
+
+        async def connect(slug, query=''):
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/cashier/{slug}/{query}')
+            connected, _ = await communicator.connect()
+            snapshot = await communicator.receive_json_from() if connected else None
+            await communicator.disconnect()
+            return connected, snapshot
+
+        self.assertEqual(async_to_sync(connect)(self.restaurant.slug), (False, None))
+        self.assertEqual(async_to_sync(connect)(self.restaurant.slug, '?token=not-a-jwt'), (False, None))
+        self.assertEqual(async_to_sync(connect)(self.restaurant.slug, f'?token={token(chef)}'), (False, None))
+        self.assertEqual(async_to_sync(connect)('other-cafe', f'?token={token(self.cashier)}'), (False, None))
+
+        connected, snapshot = async_to_sync(connect)(self.restaurant.slug, f'?token={token(self.cashier)}')
+        self.assertTrue(connected)
+        self.assertEqual([bill['id'] for bill in snapshot['bills']], [self.bill.id])
+
+    def test_snapshot_and_paid_delta(self):
+        snapshot = pending_bills_snapshot(self.restaurant.slug)
+        self.assertEqual(snapshot['type'], 'pending_bills_snapshot')
+        self.assertEqual(snapshot['bills'][0]['id'], self.bill.id)
+        self.assertEqual(snapshot['bills'][0]['total_price'], 240.0)
+        self.assertEqual(snapshot['bills'][0]['item_count'], 2)
+
+        channel_layer = get_channel_layer()
+        channel_name = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(cashier_group_name(self.restaurant.slug), channel_name)
+        mark_present([cashier_group_name(self.restaurant.slug)], current_window())
+
+        self.client.force_authenticate(self.cashier)
+        url = reverse('cashier-mark-as-paid', kwargs={'bill_id': self.bill.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {'payment_method': 'ONLINE'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # A missing message fails the test instead of hanging it
+        message = async_to_sync(asyncio.wait_for)(channel_layer.receive(channel_name), 2)
+        sequence = OrderEvent.objects.get(event_type=OrderEvent.EventType.BILLS_PAID).sequence
+        self.assertEqual(message['data'], {'type': 'bill_paid', 'bill_ids': [self.bill.id], 'sequence': sequence})
+        self.assertEqual(pending_bills_snapshot(self.restaurant.slug)['bills'], [])
+
+    def test_batch_settlement_only_touches_own_pending_bills(self):
+        other_bill = Bill.objects.exclude(restaurant=self.restaurant).get()
+        second_bill = Bill.objects.create(restaurant=self.restaurant, customer_name="Guest 2", table_number="2")
+        self.client.force_authenticate(self.cashier)
+        response = self.client.post(reverse('cashier-batch-settle'), {'bills': [
+            {'bill_id': self.bill.id, 'payment_method': 'ONLINE'},
+            {'bill_id': second_bill.id, 'payment_method': 'OFFLINE'},
+            {'bill_id': other_bill.id, 'payment_method': 'OFFLINE'},
+        ]}, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['paid_count'], 2)
+        self.assertEqual([result['status'] for result in response.data['results']], ['PAID', 'PAID', 'NOT_FOUND'])
+        self.bill.refresh_from_db()
+        second_bill.refresh_from_db()
+        other_bill.refresh_from_db()
+        self.assertEqual((self.bill.payment_status, self.bill.payment_method), ('PAID', 'ONLINE'))
+        self.assertEqual(second_bill.payment_method, 'OFFLINE')
+        self.assertEqual(other_bill.payment_status, 'PENDING')
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, TASKS=EAGER_TASKS)
+class IdempotentOrderTests(APITestCase):
+    def setUp(self):
+        reset_variant_cache()
+        self.restaurant = Restaurant.objects.create(
+            name="Retry Diner", slug="retry-diner", latitude=10.0, longitude=10.0
+        )
+        category = Category.objects.create(restaurant=self.restaurant, name="Mains")
+        self.menu_item = MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Dosa")
+        MenuItemVariant.objects.create(menu_item=self.menu_item, variant_name="Plain", price=80.00)
+        self.url = reverse('frontend-order-create', kwargs={'restaurant_slug': self.restaurant.slug})
+        self.data = {
+            "customer_name": "Guest", "table_number": "3",
+            "items": [{"menu_item_id": self.menu_item.id, "variant_name": "Plain", "quantity": 2}]
+        }
+
+    def test_retried_order_is_replayed_not_duplicated(self):
+        first = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-1')
+        second = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Bill.objects.count(), 1)
+        self.assertEqual(OrderItem.objects.count(), 1)
+
+    def test_reused_key_with_different_body_is_rejected(self):
+        self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-2')
+        self.data['table_number'] = "4"
+        response = self.client.post(self.url, self.data, format='json', HTTP_IDEMPOTENCY_KEY='abc-2')
+
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Bill.objects.count(), 1)
+
+    def test_keys_of_different_restaurants_do_not_collide(self):
+        bills = []
+        for slug in ("retry-one", "retry-two"):
+            restaurant = Restaurant.objects.create(name=slug, slug=slug, latitude=10.0, longitude=10.0)
+            category = Category.objects.create(restaurant=restaurant, name="Mains")
+            menu_item = MenuItem.objects.create(restaurant=restaurant, category=category, name="Idli")
+            variant = MenuItemVariant.objects.create(menu_item=menu_item, variant_name="Plate", price=40)
+            captain = StaffUser.objects.create_user(
+                username=f"captain-{slug}", password="pass12345", role="CAPTAIN", restaurant=restaurant
+            )
+            self.client.force_authenticate(captain)
+            # Both captains happen to send the same key
+            response = self.client.post(reverse('captain-order-create'), {
+                "customer_name": "Guest", "table_number": "1",
+                "order_items": [{"variant_id": variant.id, "quantity": 1}],
+            }, format='json', HTTP_IDEMPOTENCY_KEY='shared-key')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            self.assertNotIn('Idempotent-Replayed', response)
+            bills.append(Bill.objects.get(id=response.data['bill_id']).restaurant_id)
+        self.assertEqual(len(set(bills)), 2)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, REST_FRAMEWORK={
+    **settings.REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {'public_menu': '10/min', 'public_order_status': '10/min'},
+})
+class PublicThrottleTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(
+            name="Busy Bistro", slug="busy-bistro", latitude=10.0, longitude=10.0
+        )
+        self.menu_url = reverse('public-menu-list', kwargs={'restaurant_slug': self.restaurant.slug})
+
+    def test_burst_is_cut_at_bucket_capacity(self):
+        """A burst of 30 requests against a 10-request bucket: 20 are rejected."""
+        responses = [self.client.get(self.menu_url) for _ in range(30)]
+        rejected = [r for r in responses if r.status_code == status.HTTP_429_TOO_MANY_REQUESTS]
+
+        self.assertEqual(len(rejected) / len(responses), 20 / 30)
+        self.assertTrue(all(r.status_code == status.HTTP_200_OK for r in responses[:10]))
+        self.assertTrue(all(int(r['Retry-After']) >= 1 for r in rejected))
+
+    def test_buckets_are_separate_per_bill(self):
+        for _ in range(10):
+            self.client.get(reverse('order-detail', kwargs={'order_id': 1}))
+        self.assertEqual(self.client.get(reverse('order-detail', kwargs={'order_id': 1})).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.get(reverse('order-detail', kwargs={'order_id': 2})).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+    def test_bucket_refills_over_time(self):
+        throttle = PublicTokenBucketThrottle()
+        now = [1000.0]
+        throttle.timer = lambda: now[0]
+        view = type('View', (), {'throttle_scope': 'public_menu', 'kwargs': {'restaurant_slug': 'busy-bistro'}})()
+        request = self.client.get(self.menu_url).wsgi_request
+        cache.clear()
+
+        self.assertEqual(sum(throttle.allow_request(request, view) for _ in range(15)), 10)
+        self.assertAlmostEqual(throttle.wait(), 6.0)
+        now[0] += 6.0  # one token every six seconds
+        self.assertTrue(throttle.allow_request(request, view))
+        self.assertFalse(throttle.allow_request(request, view))
+
+    def test_a_bucket_kept_empty_is_not_refilled_by_expiry(self):
+        throttle = PublicTokenBucketThrottle()
+        now = [time.time()]
+        throttle.timer = lambda: now[0]
+        view = type('View', (), {'throttle_scope': 'public_menu', 'kwargs': {'restaurant_slug': 'busy-bistro'}})()
+        request = self.client.get(self.menu_url).wsgi_request
+        cache.clear()
+
+        # The cache expires keys by the same clock as the throttle
+        with mock.patch('time.time', lambda: now[0]):
+            self.assertEqual(sum(throttle.allow_request(request, view) for _ in range(10)), 10)
+            # One request per refilled token, for twice the 61 s key timeout
+            for _ in range(20):
+                now[0] += 6.0
+                self.assertTrue(throttle.allow_request(request, view))
+            self.assertFalse(throttle.allow_request(request, view))
+
+    def test_forwarded_for_header_does_not_give_a_fresh_bucket(self):
+        throttle = PublicTokenBucketThrottle()
+        view = type('View', (), {'throttle_scope': 'public_menu', 'kwargs': {'restaurant_slug': 'busy-bistro'}})()
+        keys = {
+            throttle.get_cache_key(self.client.get(self.menu_url, HTTP_X_FORWARDED_FOR=f'10.0.0.{n}').wsgi_request, view)
+            for n in range(3)
+        }
+        self.assertEqual(len(keys), 1)
+
+        # Behind one proxy, the address it appended is the client
+        with override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1}):
+            request = self.client.get(self.menu_url, HTTP_X_FORWARDED_FOR='1.2.3.4, 203.0.113.9').wsgi_request
+            self.assertTrue(throttle.get_cache_key(request, view).endswith('_203.0.113.9'))
+
+    def test_cache_errors_let_requests_through(self):
+        throttle = PublicTokenBucketThrottle()
+        throttle.cache = mock.Mock(get=mock.Mock(side_effect=ConnectionError("cache is down")))
+        view = type('View', (), {'throttle_scope': 'public_menu', 'kwargs': {'restaurant_slug': 'busy-bistro'}})()
+        request = self.client.get(self.menu_url).wsgi_request
+        with self.assertLogs('menu.throttling', 'WARNING'):
+            self.assertTrue(throttle.allow_request(request, view))
+
+    def test_overhead_per_request(self):
+        throttle = PublicTokenBucketThrottle()
+        view = type('View', (), {'throttle_scope': 'public_menu', 'kwargs': {'restaurant_slug': 'busy-bistro'}})()
+        request = self.client.get(self.menu_url).wsgi_request
+        rounds = 2000
+        started = time.perf_counter()
+        for _ in range(rounds):
+            throttle.allow_request(request, view)
+        per_request = (time.perf_counter() - started) / rounds
+        self.assertLess(per_request, 0.001)
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, KITCHEN_QUEUE={'PARALLEL_COOKS': 1}, TASKS=EAGER_TASKS)
+class KitchenQueueTests(APITestCase):
+    def setUp(self):
+        reset_kitchen_queues()
+        reset_variant_cache()
+        self.restaurant = Restaurant.objects.create(
+            name="Queue Kitchen", slug="queue-kitchen", latitude=10.0, longitude=10.0
+        )
+        category = Category.objects.create(restaurant=self.restaurant, name="Mains")
+        self.menu_item = MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Biryani")
+        MenuItemVariant.objects.create(menu_item=self.menu_item, variant_name="Half", price=150.00, preparation_time=20)
+        self.chef = StaffUser.objects.create_user(
+            username="chef1", password="pass12345", role="CHEF", restaurant=self.restaurant
+        )
+
+    def place_order(self, table_number, quantity=1):
+        url = reverse('frontend-order-create', kwargs={'restaurant_slug': self.restaurant.slug})
+        data = {"customer_name": "Guest", "table_number": table_number,
+                "items": [{"menu_item_id": self.menu_item.id, "variant_name": "Half", "quantity": quantity}]}
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, data, format='json').data['order_id']
+
+    def test_order_detail_reports_live_queue_position(self):
+        first_bill = self.place_order("1")
+        second_bill = self.place_order("2")
+
+        detail = self.client.get(reverse('order-detail', kwargs={'order_id': second_bill})).data
+        self.assertEqual((detail['queue_position'], detail['items_ahead']), (2, 1))
+        self.assertEqual(detail['estimated_wait_minutes'], 40)
+
+        self.client.force_authenticate(self.chef)
+        first_item = OrderItem.objects.get(bill_id=first_bill)
+        url = reverse('update-order-item-status', kwargs={'item_id': first_item.id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'status': 'COMPLETED'}, format='json')
+        self.client.force_authenticate(None)
+
+        detail = self.client.get(reverse('order-detail', kwargs={'order_id': second_bill})).data
+        self.assertEqual((detail['queue_position'], detail['estimated_wait_minutes']), (1, 20))
+        done = self.client.get(reverse('order-detail', kwargs={'order_id': first_bill})).data
+        self.assertIsNone(done['queue_position'])
+
+    def test_waits_count_every_portion_of_a_line(self):
+        self.place_order("1", quantity=4)
+        second_bill = self.place_order("2")
+        detail = self.client.get(reverse('order-detail', kwargs={'order_id': second_bill})).data
+        self.assertEqual(detail['estimated_wait_minutes'], 100)
+
+        # The queue rebuilt from the database agrees
+        reset_kitchen_queues()
+        detail = self.client.get(reverse('order-detail', kwargs={'order_id': second_bill})).data
+        self.assertEqual(detail['estimated_wait_minutes'], 100)
+
+    def test_items_of_a_rolled_back_order_are_not_queued(self):
+        get_kitchen_queue(self.restaurant.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    bill = Bill.objects.create(restaurant=self.restaurant, customer_name="Guest", table_number="1")
+                    item = OrderItem.objects.create(bill=bill, variant=self.menu_item.variants.get(), quantity=1)
+                    record_new_items(self.restaurant.id, [item])
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(get_kitchen_queue(self.restaurant.id).outstanding_items, 0)
+
+    def test_status_changes_that_roll_back_leave_the_queue_alone(self):
+        bill_id = self.place_order("1")
+        item = OrderItem.objects.select_related('variant').get(bill_id=bill_id)
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    item.status = OrderItem.OrderStatus.COMPLETED
+                    item.save()
+                    eta = record_status_change(self.restaurant.id, item)
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertIsNone(eta['queue_position'])
+        self.assertEqual(get_kitchen_queue(self.restaurant.id).outstanding_items, 1)
+
+    def test_previewed_eta_matches_the_queue_after_the_change(self):
+        rng = random.Random(7)
+        queue = KitchenQueue(parallel_cooks=2, size=4)
+        for order_item_id in range(1, 400):
+            bill_id = rng.randrange(30)
+            if rng.random() < 0.4 and queue.outstanding_items:
+                order_item_id = rng.choice(list(queue._items))
+                bill_id = queue._items[order_item_id][1]
+                minutes = None
+            else:
+                minutes = rng.randrange(1, 40)
+            expected = queue.bill_eta_after(order_item_id, bill_id, minutes)
+            if minutes is None:
+                queue.remove(order_item_id)
+            else:
+                queue.add(order_item_id, bill_id, minutes)
+            self.assertEqual(expected, queue.bill_eta(bill_id))
+
+    def test_queue_keeps_positions_across_compaction(self):
+        queue = KitchenQueue(parallel_cooks=2, size=4)
+        for item_id in range(1, 301):
+            queue.add(item_id, bill_id=item_id // 3, minutes=10)
+            if item_id % 2:
+                queue.remove(item_id)
+        self.assertEqual(queue.outstanding_items, 150)
+        eta = queue.bill_eta(100)
+        # Item 300 (bill 100) is the last of 150 outstanding items
+        self.assertEqual(eta['items_ahead'], 149)
+        self.assertEqual(eta['estimated_wait_minutes'], 750)
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, KITCHEN_QUEUE={'PARALLEL_COOKS': 1}, TASKS=EAGER_TASKS)
+class KitchenCapacityTests(APITestCase):
+    def setUp(self):
+        reset_kitchen_queues()
+        reset_variant_cache()
+        self.restaurant = Restaurant.objects.create(
+            name="Full Kitchen", slug="full-kitchen", latitude=10.0, longitude=10.0,
+            kitchen_capacity=30, kitchen_capacity_unit=Restaurant.CapacityUnit.MINUTES
+        )
+        category = Category.objects.create(restaurant=self.restaurant, name="Mains")
+        self.menu_item = MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Curry")
+        self.variant = MenuItemVariant.objects.create(
+            menu_item=self.menu_item, variant_name="Bowl", price=150.00, preparation_time=20
+        )
+        self.url = reverse('frontend-order-create', kwargs={'restaurant_slug': self.restaurant.slug})
+        self.data = {"customer_name": "Guest", "table_number": "1",
+                     "items": [{"menu_item_id": self.menu_item.id, "variant_name": "Bowl", "quantity": 1}]}
+
+    def test_orders_over_capacity_get_a_quoted_wait(self):
+        self.assertEqual(self.client.post(self.url, self.data, format='json').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post(self.url, self.data, format='json').status_code, status.HTTP_201_CREATED)
+
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data['quoted_wait_minutes'], 40)
+        self.assertEqual(Bill.objects.count(), 2)
+
+        self.data['accept_wait'] = True
+        self.assertEqual(self.client.post(self.url, self.data, format='json').status_code, status.HTTP_201_CREATED)
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (3, 60))
+
+    def test_reject_policy_and_captain_override(self):
+        self.restaurant.kitchen_capacity = 1
+        self.restaurant.kitchen_capacity_unit = Restaurant.CapacityUnit.ITEMS
+        self.restaurant.kitchen_overload_policy = Restaurant.OverloadPolicy.REJECT
+        self.restaurant.save()
+        self.client.post(self.url, self.data, format='json')
+
+        response = self.client.post(self.url, self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertIn('Retry-After', response)
+
+        captain = StaffUser.objects.create_user(
+            username="captain1", password="pass12345", role="CAPTAIN", restaurant=self.restaurant
+        )
+        self.client.force_authenticate(captain)
+        captain_order = {"customer_name": "VIP", "table_number": "9",
+                         "order_items": [{"variant_id": self.variant.id, "quantity": 1}]}
+        url = reverse('captain-order-create')
+        self.assertEqual(self.client.post(url, captain_order, format='json').status_code,
+                         status.HTTP_503_SERVICE_UNAVAILABLE)
+        captain_order['override_capacity'] = True
+        self.assertEqual(self.client.post(url, captain_order, format='json').status_code,
+                         status.HTTP_201_CREATED)
+
+    def test_counters_follow_status_transitions_and_payment(self):
+        bill_id = self.client.post(self.url, self.data, format='json').data['order_id']
+        item = OrderItem.objects.get(bill_id=bill_id)
+        admin = StaffUser.objects.create_user(
+            username="owner1", password="pass12345", role="ADMIN", restaurant=self.restaurant
+        )
+        self.client.force_authenticate(admin)
+        update_url = reverse('update-order-item-status', kwargs={'item_id': item.id})
+
+        self.client.post(update_url, {'status': 'ACCEPTED'}, format='json')
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (1, 20))
+        self.client.post(update_url, {'status': 'DECLINED'}, format='json')
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (0, 0))
+        self.client.post(update_url, {'status': 'PENDING'}, format='json')
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (1, 20))
+
+        self.client.post(reverse('cashier-mark-as-paid', kwargs={'bill_id': bill_id}),
+                         {'payment_method': 'OFFLINE'}, format='json')
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (0, 0))
+        self.assertEqual(kitchen_load.rebuild_kitchen_load(self.restaurant.id), (0, 0))
+
+    def test_counters_count_every_portion_of_a_line(self):
+        self.data['items'][0]['quantity'] = 2
+        bill_id = self.client.post(self.url, self.data, format='json').data['order_id']
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (2, 40))
+        self.assertEqual(kitchen_load.rebuild_kitchen_load(self.restaurant.id), (2, 40))
+
+        item = OrderItem.objects.get(bill_id=bill_id)
+        chef = StaffUser.objects.create_user(
+            username="chef-portions", password="pass12345", role="CHEF", restaurant=self.restaurant
+        )
+        self.client.force_authenticate(chef)
+        self.client.post(reverse('update-order-item-status', kwargs={'item_id': item.id}),
+                         {'status': 'DECLINED'}, format='json')
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (0, 0))
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, TASKS=EAGER_TASKS)
+class StationRoutingTests(APITestCase):
+    def setUp(self):
+        reset_kitchen_queues()
+        reset_variant_cache()
+        self.restaurant = Restaurant.objects.create(
+            name="Station House", slug="station-house", latitude=10.0, longitude=10.0
+        )
+        self.tandoor = Station.objects.create(restaurant=self.restaurant, name="Tandoor", slug="tandoor")
+        self.bar = Station.objects.create(restaurant=self.restaurant, name="Bar", slug="bar")
+        starters = Category.objects.create(restaurant=self.restaurant, name="Starters", station=self.tandoor)
+        drinks = Category.objects.create(restaurant=self.restaurant, name="Drinks", station=self.bar)
+        self.kebab = MenuItem.objects.create(restaurant=self.restaurant, category=starters, name="Kebab")
+        self.lassi = MenuItem.objects.create(restaurant=self.restaurant, category=drinks, name="Lassi")
+        MenuItemVariant.objects.create(menu_item=self.kebab, variant_name="Plate", price=200.00)
+        MenuItemVariant.objects.create(menu_item=self.lassi, variant_name="Glass", price=60.00)
+        self.chef = StaffUser.objects.create_user(
+            username="chef2", password="pass12345", role="CHEF", restaurant=self.restaurant
+        )
+
+    def test_each_station_only_receives_its_own_items(self):
+        channel_layer = get_channel_layer()
+        channels = {}
+        for station_slug in (None, 'tandoor', 'bar'):
+            channels[station_slug] = async_to_sync(channel_layer.new_channel)()
+            group_name = chef_group_name(self.restaurant.slug, station_slug)
+            async_to_sync(channel_layer.group_add)(group_name, channels[station_slug])
+            mark_present([group_name], current_window())
+
+        url = reverse('frontend-order-create', kwargs={'restaurant_slug': self.restaurant.slug})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {"customer_name": "Guest", "table_number": "4", "items": [
+                {"menu_item_id": self.kebab.id, "variant_name": "Plate", "quantity": 1},
+                {"menu_item_id": self.lassi.id, "variant_name": "Glass", "quantity": 2},
+            ]}, format='json')
+
+        def item_names(station_slug):
+            message = async_to_sync(channel_layer.receive)(channels[station_slug])
+            return [item['name'] for item in message['data']['items']]
+
+        self.assertEqual(item_names(None), ['Kebab', 'Lassi'])
+        self.assertEqual(item_names('tandoor'), ['Kebab'])
+        self.assertEqual(item_names('bar'), ['Lassi'])
+
+    def test_captain_orders_resolve_stations_in_one_query(self):
+        captain = StaffUser.objects.create_user(
+            username="station-captain", password="pass12345", role="CAPTAIN", restaurant=self.restaurant
+        )
+        self.client.force_authenticate(captain)
+        kebab, lassi = (MenuItemVariant.objects.get(menu_item=item) for item in (self.kebab, self.lassi))
+
+        def order(variants):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('captain-order-create'), {
+                    "customer_name": "Guest", "table_number": "6",
+                    "order_items": [{"variant_id": variant.id, "quantity": 1} for variant in variants],
+                }, format='json')
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return response.data['bill_id'], len(queries)
+
+        order([kebab])  # warms the per-process caches
+        _, one_line = order([kebab])
+        bill_id, three_lines = order([kebab, lassi, lassi])
+        self.assertEqual(three_lines, one_line)
+        self.assertEqual(list(OrderItem.objects.filter(bill_id=bill_id).order_by('id').values_list('station_id', flat=True)),
+                         [self.tandoor.id, self.bar.id, self.bar.id])
+
+    @override_settings(TASKS={'EAGER': False})
+    def test_tickets_are_sent_by_a_queued_task(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(chef_group_name(self.restaurant.slug, 'bar'), channel)
+        mark_present([chef_group_name(self.restaurant.slug, 'bar')], current_window())
+
+        url = reverse('frontend-order-create', kwargs={'restaurant_slug': self.restaurant.slug})
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(url, {"customer_name": "Guest", "table_number": "4", "items": [
+                {"menu_item_id": self.lassi.id, "variant_name": "Glass", "quantity": 2},
+            ]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        queued = Task.objects.get()
+        self.assertEqual((queued.name, queued.args), ('menu.tasks.publish_order_events', [self.restaurant.id]))
+
+        config = get_task_settings()
+        for task_row in claim_tasks('test-worker', 1, config):
+            self.assertTrue(execute(task_row, config))
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual([item['name'] for item in message['data']['items']], ['Lassi'])
+        self.assertEqual(message['data']['sequence'], 1)
+
+    def test_kitchen_list_station_filter(self):
+        bill = Bill.objects.create(restaurant=self.restaurant, customer_name="Guest", table_number="2")
+        OrderItem.objects.create(bill=bill, variant=self.lassi.variants.get(), quantity=1)
+        OrderItem.objects.create(bill=bill, variant=self.kebab.variants.get(), quantity=1)
+        Bill.objects.create(restaurant=self.restaurant, customer_name="Tandoor only", table_number="3")
+        self.client.force_authenticate(self.chef)
+
+        response = self.client.get(reverse('kitchen-order-list'), {'station': 'bar'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 1)
+        self.assertEqual([item['name'] for item in response.data[0]['order_items']], ['Lassi'])
+        self.assertEqual(self.client.get(reverse('kitchen-order-list'), {'station': 'nope'}).status_code,
+                         status.HTTP_404_NOT_FOUND)
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+})
+class WebSocketFramingTests(APITestCase):
+    def connect_chef(self, subprotocols=None):
+        return WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/chef/framing/', subprotocols=subprotocols)
+
+    def receive_order(self, subprotocols=None):
+        async def scenario():
+            communicator = self.connect_chef(subprotocols)
+            connected, subprotocol = await communicator.connect()
+            self.assertTrue(connected)
+            await get_channel_layer().group_send(chef_group_name('framing'), {
+                'type': 'send.new.order',
+                'data': {'bill_id': 7, 'table_number': '3',
+                         'items': [{'order_item_id': 1, 'name': 'Naan', 'quantity': 2}]}
+            })
+            frame = await communicator.receive_output()
+            await communicator.disconnect()
+            return subprotocol, frame
+        return async_to_sync(scenario)()
+
+    def test_json_text_frames_by_default(self):
+        subprotocol, frame = self.receive_order()
+        self.assertIsNone(subprotocol)
+        self.assertEqual(json.loads(frame['text'])['items'][0]['name'], 'Naan')
+
+    def test_msgpack_subprotocol_sends_compact_binary_frames(self):
+        subprotocol, frame = self.receive_order(['msgpack'])
+        self.assertEqual(subprotocol, 'msgpack')
+        self.assertEqual(msgpack.unpackb(frame['bytes']), {
+            'b': 7, 'tn': '3', 'it': [{'oi': 1, 'n': 'Naan', 'q': 2}], 'seq': 1
+        })
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, TASKS=EAGER_TASKS)
+class PresenceTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_kitchen_queues()
+        self.restaurant = Restaurant.objects.create(
+            name="Presence Cafe", slug="presence-cafe", latitude=10.0, longitude=10.0
+        )
+        category = Category.objects.create(restaurant=self.restaurant, name="Mains")
+        menu_item = MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Thali")
+        variant = MenuItemVariant.objects.create(menu_item=menu_item, variant_name="Full", price=150.00)
+        self.bill = Bill.objects.create(restaurant=self.restaurant, customer_name="Guest", table_number="1")
+        self.order_item = OrderItem.objects.create(bill=self.bill, variant=variant, quantity=1)
+        self.admin = StaffUser.objects.create_user(
+            username="presence-admin", password="pass12345", role="ADMIN", restaurant=self.restaurant
+        )
+        self.chef = StaffUser.objects.create_user(
+            username="presence-chef", password="pass12345", role="CHEF", restaurant=self.restaurant
+        )
+
+    def connected_screens(self):
+        self.client.force_authenticate(self.admin)
+        response = self.client.get(reverse('connected-screens'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_connections_are_counted_until_they_disconnect(self):
+        async def scenario():
+            communicators = [
+                WebsocketCommunicator(URLRouter(websocket_urlpatterns), path)
+                for path in ('/ws/chef/presence-cafe/', '/ws/chef/presence-cafe/',
+                             f'/ws/customer/{self.bill.id}/')
+            ]
+            for communicator in communicators:
+                await communicator.connect()
+            await communicators[-1].receive_json_from()  # the customer is tracked once it got its queue_update
+            counts = await sync_to_async(self.connected_screens)()
+            for communicator in communicators:
+                await communicator.disconnect()
+            return counts
+
+        counts = async_to_sync(scenario)()
+        self.assertEqual(counts['chef'], 2)
+        self.assertEqual(counts['customers'], 1)
+        self.assertEqual(counts['bills_watched'], 1)
+        self.assertEqual(counts['cashier'], 0)
+
+        counts = self.connected_screens()
+        self.assertEqual((counts['chef'], counts['customers']), (0, 0))
+
+    def test_status_update_skips_bills_nobody_is_watching(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(customer_group_name(self.bill.id), channel)
+        url = reverse('update-order-item-status', kwargs={'item_id': self.order_item.id})
+        self.client.force_authenticate(self.chef)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'status': 'ACCEPTED'}, format='json')
+        self.assertEqual(channel_layer.channels.get(channel, []), [])
+
+        mark_present([customer_group_name(self.bill.id)], current_window())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url, {'status': 'COMPLETED'}, format='json')
+        message = async_to_sync(channel_layer.receive)(channel)
+        self.assertEqual(message['status'], 'COMPLETED')
+
+    def test_counts_survive_one_window_and_then_expire(self):
+        group_name = customer_group_name(self.bill.id)
+        window = current_window()
+        mark_present([group_name], window - 1)
+        self.assertEqual(groups_with_listeners([group_name]), {group_name})
+        cache.clear()
+        mark_present([group_name], window - 2)
+        self.assertEqual(groups_with_listeners([group_name]), set())
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, WS_OUTBOUND={'ACK_WINDOW': 1, 'HIGH_WATER': 2, 'STALL_SECONDS': 30, 'MAX_QUEUE': 3}, TASKS=EAGER_TASKS)
+class OutboundQueueTests(APITestCase):
+    def setUp(self):
+        restaurant = Restaurant.objects.create(name="Slow Wifi", slug="slow-wifi", latitude=10.0, longitude=10.0)
+        self.bill = Bill.objects.create(restaurant=restaurant, customer_name="Guest", table_number="8")
+
+    async def connect_acking_customer(self):
+        communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/customer/{self.bill.id}/')
+        await communicator.connect()
+        queue_update = await communicator.receive_json_from()
+        await communicator.send_json_to({'type': 'ack', 'seq': queue_update['seq']})
+        return communicator
+
+    def status_update(self, order_item_id, item_status):
+        return {'type': 'order_status_update', 'order_item_id': order_item_id, 'status': item_status}
+
+    def test_lagging_client_gets_merged_status_updates(self):
+        async def scenario():
+            communicator = await self.connect_acking_customer()
+            channel_layer = get_channel_layer()
+            for item_status in ('PENDING', 'ACCEPTED', 'COMPLETED'):
+                await channel_layer.group_send(customer_group_name(self.bill.id), self.status_update(1, item_status))
+            first = await communicator.receive_json_from()
+            self.assertTrue(await communicator.receive_nothing())
+            self.assertEqual(get_outbound_stats()['queued_events'], 1)
+            await communicator.send_json_to({'type': 'ack', 'seq': first['seq']})
+            second = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return first, second
+
+        first, second = async_to_sync(scenario)()
+        self.assertEqual((first['status'], first['seq']), ('PENDING', 2))
+        self.assertEqual((second['status'], second['seq']), ('COMPLETED', 3))
+
+    def test_client_that_falls_too_far_behind_is_told_to_resync(self):
+        async def scenario():
+            communicator = await self.connect_acking_customer()
+            channel_layer = get_channel_layer()
+            for order_item_id in range(1, 6):
+                await channel_layer.group_send(customer_group_name(self.bill.id), self.status_update(order_item_id, 'ACCEPTED'))
+            messages = [await communicator.receive_json_from(), await communicator.receive_json_from()]
+            closed = await communicator.receive_output()
+            return messages, closed
+
+        messages, closed = async_to_sync(scenario)()
+        self.assertEqual(messages[1]['type'], 'resync_required')
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4008})
+
+    def test_client_that_never_acks_is_not_sent_everything(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/customer/{self.bill.id}/')
+            await communicator.connect()
+            queue_update = await communicator.receive_json_from()
+            channel_layer = get_channel_layer()
+            for order_item_id in range(1, 6):
+                await channel_layer.group_send(customer_group_name(self.bill.id), self.status_update(order_item_id, 'ACCEPTED'))
+            resync = await communicator.receive_json_from()
+            closed = await communicator.receive_output()
+            return queue_update, resync, closed
+
+        queue_update, resync, closed = async_to_sync(scenario)()
+        self.assertEqual(queue_update['type'], 'queue_update')
+        self.assertEqual(resync['type'], 'resync_required')
+        self.assertEqual(closed, {'type': 'websocket.close', 'code': 4008})
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, TASKS=EAGER_TASKS)
+class BillClosureTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_kitchen_queues()
+        self.restaurant = Restaurant.objects.create(
+            name="Closing Time", slug="closing-time", latitude=10.0, longitude=10.0
+        )
+        self.bill = Bill.objects.create(restaurant=self.restaurant, customer_name="Guest", table_number="5")
+        self.cashier = StaffUser.objects.create_user(
+            username="closing-cashier", password="pass12345", role="CASHIER", restaurant=self.restaurant
+        )
+
+    def customer(self):
+        return WebsocketCommunicator(URLRouter(websocket_urlpatterns), f'/ws/customer/{self.bill.id}/')
+
+    def test_paying_the_bill_closes_customer_connections(self):
+        async def scenario():
+            communicator = self.customer()
+            await communicator.connect()
+            await communicator.receive_json_from()  # queue_update
+            await sync_to_async(self.pay_bill)()
+            closed_event = await communicator.receive_json_from()
+            close = await communicator.receive_output()
+            return closed_event, close
+
+        closed_event, close = async_to_sync(scenario)()
+        self.assertEqual(closed_event, {'type': 'bill_closed', 'bill_id': self.bill.id})
+        self.assertEqual(close, {'type': 'websocket.close', 'code': 1000})
+
+    def pay_bill(self):
+        self.client.force_authenticate(self.cashier)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                reverse('cashier-mark-as-paid', kwargs={'bill_id': self.bill.id}), {'payment_method': 'OFFLINE'}, format='json'
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_connecting_to_a_paid_bill_closes_at_once(self):
+        Bill.objects.filter(id=self.bill.id).update(payment_status=Bill.PaymentStatus.PAID)
+
+        async def scenario():
+            communicator = self.customer()
+            await communicator.connect()
+            return await communicator.receive_json_from(), await communicator.receive_output()
+
+        closed_event, close = async_to_sync(scenario)()
+        self.assertEqual(closed_event['type'], 'bill_closed')
+        self.assertEqual(close['code'], 1000)
+
+    @override_settings(WS_CUSTOMER_IDLE_SECONDS=0.2)
+    def test_idle_customer_connections_are_reaped(self):
+        async def scenario():
+            communicator = self.customer()
+            await communicator.connect()
+            await communicator.receive_json_from()  # queue_update
+            return await communicator.receive_json_from(timeout=2), await communicator.receive_output()
+
+        idle_event, close = async_to_sync(scenario)()
+        self.assertEqual(idle_event, {'type': 'idle_timeout'})
+        self.assertEqual(close['code'], 4009)
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES)
+class FastSerializerTests(APITestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name="Fast Lane", slug="fast-lane", latitude=10.0, longitude=10.0
+        )
+        grill = Station.objects.create(restaurant=self.restaurant, name="Grill", slug="grill")
+        mains = Category.objects.create(restaurant=self.restaurant, name="Mains", station=grill)
+        drinks = Category.objects.create(restaurant=self.restaurant, name="Drinks")
+        burger = MenuItem.objects.create(restaurant=self.restaurant, category=mains, name="Burger")
+        soda = MenuItem.objects.create(restaurant=self.restaurant, category=drinks, name="Soda")
+        burger_variant = MenuItemVariant.objects.create(menu_item=burger, variant_name="Double", price=249.50)
+        soda_variant = MenuItemVariant.objects.create(menu_item=soda, variant_name="Can", price=40)
+        for n in range(3):
+            bill = Bill.objects.create(restaurant=self.restaurant, customer_name=f"Guest {n}", table_number=str(n))
+            OrderItem.objects.create(bill=bill, variant=burger_variant, quantity=n + 1)
+            OrderItem.objects.create(bill=bill, variant=soda_variant, quantity=2)
+        Bill.objects.create(
+            restaurant=self.restaurant, customer_name="Paid", table_number="9",
+            payment_status=Bill.PaymentStatus.PAID, payment_method=Bill.PaymentMethod.ONLINE
+        )
+        self.admin = StaffUser.objects.create_user(
+            username="fast-admin", password="pass12345", role="ADMIN", restaurant=self.restaurant
+        )
+
+    def assertSameJSON(self, fast_data, serializer_data):
+        self.assertEqual(JSONRenderer().render(fast_data), JSONRenderer().render(serializer_data))
+
+    def test_fast_payloads_match_the_serializers(self):
+        bills = Bill.objects.filter(restaurant=self.restaurant).order_by('-created_at')
+        prefetched = bills.prefetch_related('order_items__variant__menu_item')
+        self.assertSameJSON(fast_serializers.kitchen_orders(bills), KitchenOrderSerializer(prefetched, many=True).data)
+        self.assertSameJSON(fast_serializers.cashier_bills(bills), CashierBillSerializer(prefetched, many=True).data)
+        self.assertSameJSON(
+            fast_serializers.restaurant_orders(bills), RestaurantOrderListSerializer(prefetched, many=True).data
+        )
+
+    def test_list_views_return_the_serializer_output(self):
+        self.client.force_authenticate(self.admin)
+        pending = pending_bills_queryset(self.restaurant).prefetch_related('order_items__variant__menu_item')
+        response = self.client.get(reverse('cashier-bill-list'))
+        self.assertEqual(response.content, JSONRenderer().render(CashierBillSerializer(pending, many=True).data))
+
+        grill_items = Prefetch(
+            'order_items', queryset=OrderItem.objects.filter(station__slug='grill').select_related('variant__menu_item')
+        )
+        kitchen = Bill.objects.filter(payment_status=Bill.PaymentStatus.PENDING).order_by('created_at')
+        response = self.client.get(reverse('kitchen-order-list'), {'station': 'grill'})
+        self.assertEqual(
+            response.content,
+            JSONRenderer().render(KitchenOrderSerializer(kitchen.prefetch_related(grill_items), many=True).data)
+        )
+        self.assertEqual([len(bill['order_items']) for bill in response.data], [1, 1, 1])
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class PublicMenuCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(
+            name="Fragment Cafe", slug="fragment-cafe", latitude=10.0, longitude=10.0
+        )
+        category = Category.objects.create(restaurant=self.restaurant, name="Mains")
+        veg = FoodType.objects.create(name="Veg")
+        for name in ("Dosa", "Idli", "Vada"):
+            menu_item = MenuItem.objects.create(restaurant=self.restaurant, category=category, name=name)
+            menu_item.food_types.set([veg])
+            MenuItemVariant.objects.create(menu_item=menu_item, variant_name="Plate", price=80.50)
+        MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Off menu", is_available=False)
+        self.url = reverse('public-menu-list', kwargs={'restaurant_slug': self.restaurant.slug})
+
+    def serializer_output(self):
+        items = MenuItem.objects.filter(
+            restaurant=self.restaurant, is_available=True
+        ).prefetch_related('variants', 'food_types', 'cuisines')
+        return JSONRenderer().render(PublicMenuItemSerializer(items, many=True).data)
+
+    def test_cached_menu_matches_the_serializer(self):
+        first = self.client.get(self.url)
+        self.assertEqual(first.content, self.serializer_output())
+        with self.assertNumQueries(2):
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+
+    def test_menu_is_served_from_the_database_when_the_cache_is_down(self):
+        broken = mock.Mock(**{f'{name}.side_effect': ConnectionError("cache is down")
+                              for name in ('get', 'get_many', 'add', 'set_many')})
+        with mock.patch('menu.menu_cache.cache', broken), self.assertLogs('menu.menu_cache', 'WARNING'):
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.content, self.serializer_output())
+
+    def test_menu_writes_succeed_when_the_cache_is_down(self):
+        broken = mock.Mock(**{f'{name}.side_effect': ConnectionError("cache is down") for name in ('incr', 'add')})
+        with mock.patch('menu.menu_cache.cache', broken), self.assertLogs('menu.menu_cache', 'WARNING'):
+            with self.captureOnCommitCallbacks(execute=True):
+                Category.objects.create(restaurant=self.restaurant, name="Desserts")
+        self.assertTrue(Category.objects.filter(name="Desserts").exists())
+
+    def test_menu_changes_invalidate_the_cached_items(self):
+        self.client.get(self.url)
+        variant = MenuItemVariant.objects.get(menu_item__name="Idli")
+        with self.captureOnCommitCallbacks(execute=True):
+            variant.price = 95
+            variant.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.content, self.serializer_output())
+        self.assertContains(response, '"95.00"')
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class AdminQueryCountTests(APITestCase):
+    """Admin pages run the same number of queries for one row as for many."""
+
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name="Admin Diner", slug="admin-diner", latitude=10.0, longitude=10.0
+        )
+        self.station = Station.objects.create(restaurant=self.restaurant, name="Grill", slug="grill")
+        self.category = Category.objects.create(restaurant=self.restaurant, name="Mains", station=self.station)
+        self.variant = MenuItemVariant.objects.create(
+            menu_item=MenuItem.objects.create(restaurant=self.restaurant, category=self.category, name="Burger"),
+            variant_name="Single", price=150
+        )
+        self.bill = Bill.objects.create(restaurant=self.restaurant, customer_name="Guest", table_number="1")
+        OrderItem.objects.create(bill=self.bill, variant=self.variant)
+        superuser = StaffUser.objects.create_superuser(username="root", password="pass12345", email="")
+        self.client.force_login(superuser)
+
+    def count_queries(self, url):
+        # Warm the per-process caches (content types) first
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def add_rows(self, n):
+        for i in range(n):
+            restaurant = Restaurant.objects.create(
+                name=f"Diner {i}", slug=f"diner-{i}", latitude=10.0, longitude=10.0
+            )
+            station = Station.objects.create(restaurant=restaurant, name="Fryer", slug="fryer")
+            category = Category.objects.create(restaurant=restaurant, name=f"Sides {i}", station=station)
+            menu_item = MenuItem.objects.create(restaurant=restaurant, category=category, name=f"Fries {i}")
+            MenuItemVariant.objects.create(menu_item=menu_item, variant_name="Large", price=90)
+            Bill.objects.create(restaurant=restaurant, customer_name=f"Guest {i}", table_number=str(i))
+            OrderItem.objects.create(bill=self.bill, variant=self.variant, quantity=i + 1)
+
+    def test_changelists_do_not_query_per_row(self):
+        urls = [reverse(f'admin:menu_{model}_changelist') for model in ('bill', 'menuitem', 'category')]
+        single = [self.count_queries(url) for url in urls]
+        self.add_rows(5)
+        self.assertEqual([self.count_queries(url) for url in urls], single)
+
+    def test_bill_change_page_does_not_query_per_order_item(self):
+        url = reverse('admin:menu_bill_change', args=[self.bill.id])
+        single = self.count_queries(url)
+        self.add_rows(5)
+        self.assertEqual(self.count_queries(url), single)
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class BillArchiveTests(APITestCase):
+    def setUp(self):
+        self.restaurant = Restaurant.objects.create(
+            name="Old Town", slug="old-town", latitude=10.0, longitude=10.0
+        )
+        category = Category.objects.create(restaurant=self.restaurant, name="Mains")
+        thali = MenuItemVariant.objects.create(
+            menu_item=MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Thali"),
+            variant_name="Full", price=220
+        )
+        lassi = MenuItemVariant.objects.create(
+            menu_item=MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Lassi"),
+            variant_name="Sweet", price=60
+        )
+        self.bills = {}
+        for name, days_ago, payment_status in [
+            ("old paid", 100, Bill.PaymentStatus.PAID),
+            ("old pending", 100, Bill.PaymentStatus.PENDING),
+            ("today paid", 0, Bill.PaymentStatus.PAID),
+        ]:
+            bill = Bill.objects.create(
+                restaurant=self.restaurant, customer_name=name, table_number="4", payment_status=payment_status
+            )
+            OrderItem.objects.create(bill=bill, variant=thali, quantity=2)
+            OrderItem.objects.create(bill=bill, variant=lassi, quantity=3)
+            created_at = timezone.now() - timedelta(days=days_ago)
+            Bill.objects.filter(id=bill.id).update(created_at=created_at)
+            OrderItem.objects.filter(bill=bill).update(created_at=created_at)
+            self.bills[name] = bill
+        self.admin = StaffUser.objects.create_user(
+            username="archive-admin", password="pass12345", role="ADMIN", restaurant=self.restaurant
+        )
+        self.client.force_authenticate(self.admin)
+
+    def test_only_old_paid_bills_are_moved(self):
+        old_paid = Bill.objects.get(id=self.bills["old paid"].id)
+        self.assertEqual(list(archive_paid_bills(90, batch_size=1)), [1])
+        self.assertFalse(Bill.objects.filter(id=old_paid.id).exists())
+        self.assertFalse(OrderItem.objects.filter(bill_id=old_paid.id).exists())
+
+        archived = ArchivedBill.objects.get(id=old_paid.id)
+        self.assertEqual(archived.customer_name, "old paid")
+        self.assertEqual(archived.created_at, old_paid.created_at)
+        self.assertEqual(ArchivedOrderItem.objects.filter(bill=archived).count(), 2)
+        self.assertEqual(Bill.objects.count(), 2)
+        # Nothing left to do on a second run
+        self.assertEqual(list(archive_paid_bills(90)), [])
+
+    def test_reports_and_analytics_read_the_archive(self):
+        urls = [
+            reverse('restaurant-order-list'),
+            reverse('restaurant-order-detail', args=[self.bills["today paid"].id]),
+            reverse('admin-order-report') + '?period=all',
+            reverse('restaurant-analytics'),
+        ]
+        before = [self.client.get(url).content for url in urls]
+        self.assertIn(b'"sales_today":"620.00"', before[3])
+
+        # Archive everything that is paid, including today's bill
+        self.assertEqual(archive_batch(timezone.now() + timedelta(seconds=1), batch_size=10), 2)
+        self.assertEqual(Bill.objects.count(), 1)
+        self.assertEqual([self.client.get(url).content for url in urls], before)
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES)
+class MenuAvailabilityTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.restaurant = Restaurant.objects.create(
+            name="Dosa Corner", slug="dosa-corner", latitude=10.0, longitude=10.0
+        )
+        self.tiffin = Category.objects.create(restaurant=self.restaurant, name="Tiffin")
+        drinks = Category.objects.create(restaurant=self.restaurant, name="Drinks")
+        self.items = {}
+        for name, category in (("Dosa", self.tiffin), ("Idli", self.tiffin), ("Coffee", drinks)):
+            self.items[name] = MenuItem.objects.create(restaurant=self.restaurant, category=category, name=name)
+            MenuItemVariant.objects.create(menu_item=self.items[name], variant_name="Plate", price=60)
+        self.admin = StaffUser.objects.create_user(
+            username="dosa-admin", password="pass12345", role="ADMIN", restaurant=self.restaurant
+        )
+        self.client.force_authenticate(self.admin)
+        self.menu_url = reverse('public-menu-list', kwargs={'restaurant_slug': self.restaurant.slug})
+
+        self.channel_layer = get_channel_layer()
+        self.channel = async_to_sync(self.channel_layer.new_channel)()
+        async_to_sync(self.channel_layer.group_add)(menu_group_name(self.restaurant.slug), self.channel)
+        mark_present([menu_group_name(self.restaurant.slug)], current_window())
+
+    def set_availability(self, data):
+        with self.captureOnCommitCallbacks(execute=True):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post(reverse('menuitem-manage-bulk-availability'), data, format='json')
+        updates = [query for query in queries if query['sql'].startswith('UPDATE')]
+        self.assertEqual(len(updates), 1)
+        return response
+
+    def menu_names(self):
+        return [item['name'] for item in json.loads(self.client.get(self.menu_url).content)]
+
+    def test_category_is_taken_off_and_put_back(self):
+        self.assertEqual(self.menu_names(), ["Dosa", "Idli", "Coffee"])
+        tiffin_ids = [self.items["Dosa"].id, self.items["Idli"].id]
+
+        response = self.set_availability({'is_available': False, 'category': self.tiffin.id})
+        self.assertEqual(response.data['updated_ids'], tiffin_ids)
+        message = async_to_sync(self.channel_layer.receive)(self.channel)
+        self.assertEqual(message['data'], {'type': 'menu_availability', 'unavailable_ids': tiffin_ids})
+        self.assertEqual(self.menu_names(), ["Coffee"])
+
+        response = self.set_availability({'is_available': True, 'item_ids': [self.items["Idli"].id]})
+        self.assertEqual(response.data['updated_ids'], [self.items["Idli"].id])
+        message = async_to_sync(self.channel_layer.receive)(self.channel)
+        self.assertEqual([item['name'] for item in message['data']['available_items']], ["Idli"])
+        self.assertEqual(message['data']['available_items'][0]['variants'][0]['price'], "60.00")
+        self.assertEqual(self.menu_names(), ["Idli", "Coffee"])
+
+    def test_selector_is_required_and_unique(self):
+        url = reverse('menuitem-manage-bulk-availability')
+        for data in ({'is_available': False}, {'is_available': False, 'category': self.tiffin.id, 'item_ids': [1]}):
+            self.assertEqual(self.client.post(url, data, format='json').status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_single_item_update_is_pushed(self):
+        url = reverse('menuitem-manage-detail', args=[self.items["Coffee"].id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(url, {'is_available': False}, format='json')
+        message = async_to_sync(self.channel_layer.receive)(self.channel)
+        self.assertEqual(message['data']['unavailable_ids'], [self.items["Coffee"].id])
+
+    def test_menu_consumer_relays_changes(self):
+        async def scenario():
+            communicator = WebsocketCommunicator(URLRouter(websocket_urlpatterns), '/ws/menu/dosa-corner/')
+            connected, _ = await communicator.connect()
+            await self.channel_layer.group_send(menu_group_name('dosa-corner'), {
+                'type': 'menu.availability', 'data': {'type': 'menu_availability', 'unavailable_ids': [7]}
+            })
+            event = await communicator.receive_json_from()
+            await communicator.disconnect()
+            return connected, event
+
+        connected, event = async_to_sync(scenario)()
+        self.assertTrue(connected)
+        self.assertEqual((event['type'], event['unavailable_ids']), ('menu_availability', [7]))
+
+
+@override_settings(CACHES=LOCMEM_CACHES)
+class MenuSearchTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        reset_menu_search_indexes()
+        self.restaurant = Restaurant.objects.create(
+            name="Search Dhaba", slug="search-dhaba", latitude=10.0, longitude=10.0
+        )
+        self.category = Category.objects.create(restaurant=self.restaurant, name="Mains")
+        self.veg = FoodType.objects.create(name="Veg")
+        non_veg = FoodType.objects.create(name="Non-Veg")
+        south_indian = Cuisine.objects.create(name="South Indian")
+        self.items = {}
+        for name, description, food_type, orders in [
+            ("Paneer Tikka", "Cottage cheese from the tandoor", self.veg, 1),
+            ("Chicken Tikka", "Boneless chicken from the tandoor", non_veg, 5),
+            ("Paneer Butter Masala", "Cottage cheese in tomato gravy", self.veg, 0),
+            ("Masala Dosa", "Crispy rice crepe with potato", self.veg, 2),
+        ]:
+            menu_item = MenuItem.objects.create(
+                restaurant=self.restaurant, category=self.category, name=name, description=description
+            )
+            menu_item.food_types.set([food_type])
+            variant = MenuItemVariant.objects.create(menu_item=menu_item, variant_name="Full", price=200)
+            if orders:
+                bill = Bill.objects.create(restaurant=self.restaurant, customer_name="Guest", table_number="1")
+                OrderItem.objects.create(bill=bill, variant=variant, quantity=orders)
+            self.items[name] = menu_item
+        self.items["Masala Dosa"].cuisines.set([south_indian])
+        self.south_indian = south_indian
+
+    def search(self, **params):
+        response = self.client.get(
+            reverse('public-menu-search', kwargs={'restaurant_slug': self.restaurant.slug}), params
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['name'] for item in json.loads(response.content)]
+
+    def test_prefix_and_typo_matches_rank_by_score_then_popularity(self):
+        self.assertEqual(self.search(q="tik"), ["Chicken Tikka", "Paneer Tikka"])
+        self.assertEqual(self.search(q="panner"), ["Paneer Tikka", "Paneer Butter Masala"])
+        self.assertEqual(self.search(q="panee tika"), ["Paneer Tikka"])
+        # Name matches come before description matches
+        self.assertEqual(self.search(q="masala"), ["Masala Dosa", "Paneer Butter Masala"])
+        self.assertEqual(self.search(q="crispy"), ["Masala Dosa"])
+        self.assertEqual(self.search(q="pizza"), [])
+
+    def test_filters_use_food_types_and_cuisines(self):
+        self.assertEqual(self.search(q="tikka", food_type=self.veg.id), ["Paneer Tikka"])
+        self.assertEqual(self.search(food_type=self.veg.id), ["Masala Dosa", "Paneer Tikka", "Paneer Butter Masala"])
+        self.assertEqual(self.search(cuisine=self.south_indian.id), ["Masala Dosa"])
+        response = self.client.get(
+            reverse('public-menu-search', kwargs={'restaurant_slug': self.restaurant.slug}), {'food_type': 'veg'}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_results_have_the_public_menu_shape(self):
+        response = self.client.get(
+            reverse('public-menu-search', kwargs={'restaurant_slug': self.restaurant.slug}), {'q': 'dosa'}
+        )
+        dosa = MenuItem.objects.prefetch_related('variants', 'food_types', 'cuisines').get(name="Masala Dosa")
+        self.assertEqual(json.loads(response.content), [json.loads(JSONRenderer().render(PublicMenuItemSerializer(dosa).data))])
+
+    def test_index_is_rebuilt_when_the_menu_changes(self):
+        self.assertEqual(self.search(q="naan"), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            MenuItem.objects.create(restaurant=self.restaurant, category=self.category, name="Garlic Naan")
+        self.assertEqual(self.search(q="naan"), ["Garlic Naan"])
+
+    def test_index_matches_all_words(self):
+        index = MenuSearchIndex([
+            {'id': 1, 'name': "Dal Makhani", 'description': "", 'food_types': [], 'cuisines': []},
+            {'id': 2, 'name': "Dal Tadka", 'description': "Yellow lentils", 'food_types': [], 'cuisines': []},
+        ], popularity={})
+        self.assertEqual(index.search("dal"), [1, 2])
+        self.assertEqual(index.search("dal lentil"), [2])
+        self.assertEqual(index.search("dal makhni"), [1])
+        self.assertEqual(index.search("dal", limit=1), [1])
+
+
+# Transaction test case: the worker threads use their own connections, so
+# they only see committed rows
+@override_settings(CACHES=LOCMEM_CACHES, PLATFORM_ANALYTICS={'MAX_WORKERS': 3})
+class PlatformAnalyticsTests(APITransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        for n, (name, dishes) in enumerate([
+            ("Tandoor House", [("Naan", 40, 5), ("Kebab", 300, 2)]),
+            ("Dosa Point", [("Dosa", 90, 3)]),
+            ("Chai Stop", []),
+        ]):
+            restaurant = Restaurant.objects.create(name=name, slug=f"platform-{n}", latitude=10.0, longitude=10.0)
+            category = Category.objects.create(restaurant=restaurant, name="Mains")
+            for dish, price, quantity in dishes:
+                variant = MenuItemVariant.objects.create(
+                    menu_item=MenuItem.objects.create(restaurant=restaurant, category=category, name=dish),
+                    variant_name="Full", price=price
+                )
+                paid = Bill.objects.create(
+                    restaurant=restaurant, customer_name="Guest", table_number="1", payment_status=Bill.PaymentStatus.PAID
+                )
+                OrderItem.objects.create(bill=paid, variant=variant, quantity=quantity)
+                # Not paid yet: counted as an order, not as sales
+                pending = Bill.objects.create(restaurant=restaurant, customer_name="Guest", table_number="2")
+                OrderItem.objects.create(bill=pending, variant=variant, quantity=1)
+        self.tandoor = Restaurant.objects.get(name="Tandoor House")
+        self.client.force_authenticate(
+            StaffUser.objects.create_superuser(username="platform", password="pass12345", email="")
+        )
+
+    def test_per_restaurant_breakdown_and_totals(self):
+        # Part of the history is archived
+        archive_batch(timezone.now() + timedelta(seconds=1), batch_size=1)
+
+        response = self.client.get(reverse('platform-analytics'), {'period': 'today'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['total_sales'], "1070.00")
+        self.assertEqual(response.data['total_orders'], 6)
+        self.assertEqual(
+            [(row['name'], row['sales'], row['orders']) for row in response.data['restaurants']],
+            [("Tandoor House", "800.00", 4), ("Dosa Point", "270.00", 2), ("Chai Stop", "0.00", 0)]
+        )
+        self.assertEqual(response.data['restaurants'][0]['top_dishes'], [
+            {'name': "Naan (Full)", 'quantity': 5}, {'name': "Kebab (Full)", 'quantity': 2}
+        ])
+
+    def test_restaurant_results_are_cached(self):
+        first = self.client.get(reverse('platform-analytics')).data
+        variant = MenuItemVariant.objects.filter(menu_item__restaurant=self.tandoor).first()
+        bill = Bill.objects.create(
+            restaurant=self.tandoor, customer_name="Late", table_number="3", payment_status=Bill.PaymentStatus.PAID
+        )
+        OrderItem.objects.create(bill=bill, variant=variant, quantity=1)
+        self.assertEqual(self.client.get(reverse('platform-analytics')).data, first)
+
+        cache.delete(f"platform_analytics:{self.tandoor.id}:{':'.join(d.isoformat() for d in period_days('month'))}")
+        self.assertEqual(self.client.get(reverse('platform-analytics')).data['restaurants'][0]['orders'], 5)
+
+    def test_period_validation_and_permissions(self):
+        self.assertEqual(self.client.get(reverse('platform-analytics'), {'period': 'decade'}).status_code, 400)
+        self.assertEqual(
+            self.client.get(reverse('platform-analytics'), {'start': '2025-02-01', 'end': '2025-01-01'}).status_code, 400
+        )
+        response = self.client.get(reverse('platform-analytics'), {'start': '2020-01-01', 'end': '2020-01-31'})
+        self.assertEqual(response.data['total_orders'], 0)
+
+        admin = StaffUser.objects.create_user(
+            username="tandoor-admin", password="pass12345", role="ADMIN", restaurant=self.tandoor
+        )
+        self.client.force_authenticate(admin)
+        self.assertEqual(self.client.get(reverse('platform-analytics')).status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, TASKS={'EAGER': False})
+class OrderOutboxTests(APITestCase):
+    def setUp(self):
+        reset_kitchen_queues()
+        reset_variant_cache()
+        self.restaurant = Restaurant.objects.create(
+            name="Outbox Cafe", slug="outbox-cafe", latitude=10.0, longitude=10.0
+        )
+        self.other = Restaurant.objects.create(name="Elsewhere", slug="elsewhere", latitude=10.0, longitude=10.0)
+        self.items = {}
+        for restaurant in (self.restaurant, self.other):
+            category = Category.objects.create(restaurant=restaurant, name="Mains")
+            menu_item = MenuItem.objects.create(restaurant=restaurant, category=category, name="Poha")
+            MenuItemVariant.objects.create(menu_item=menu_item, variant_name="Plate", price=50)
+            self.items[restaurant.slug] = menu_item
+
+    def order(self, restaurant, menu_item_id=None):
+        url = reverse('frontend-order-create', kwargs={'restaurant_slug': restaurant.slug})
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post(url, {"customer_name": "Guest", "table_number": "1", "items": [
+                {"menu_item_id": menu_item_id or self.items[restaurant.slug].id, "variant_name": "Plate", "quantity": 1},
+            ]}, format='json')
+
+    def test_events_are_numbered_per_restaurant_and_roll_back_with_the_change(self):
+        self.assertEqual(self.order(self.restaurant, menu_item_id=self.items['elsewhere'].id).status_code, 400)
+        self.assertFalse(Bill.objects.exists())
+        self.assertFalse(OrderEvent.objects.exists())
+
+        bill_id = self.order(self.restaurant).data['order_id']
+        add_url = reverse('add-items-to-order', kwargs={'bill_id': bill_id})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(add_url, {"items": [
+                {"menu_item_id": self.items['outbox-cafe'].id, "variant_name": "Plate", "quantity": 2},
+            ]}, format='json')
+        self.order(self.other)
+
+        self.assertEqual(
+            list(OrderEvent.objects.order_by('id').values_list('restaurant__slug', 'sequence', 'data__cashier_event')),
+            [('outbox-cafe', 1, 'bill_added'), ('outbox-cafe', 2, 'bill_updated'), ('elsewhere', 1, 'bill_added')]
+        )
+        # One publish task per event
+        self.assertEqual(Task.objects.count(), 3)
+
+    def test_relay_publishes_in_order_and_resumes_after_a_failure(self):
+        for _ in range(3):
+            self.order(self.restaurant)
+        published = []
+
+        def publish(event, restaurant_slug):
+            published.append(event.sequence)
+            if event.sequence == 2 and published.count(2) == 1:
+                raise ConnectionError("channel layer is down")
+
+        with mock.patch.dict(PUBLISHERS, {OrderEvent.EventType.ITEMS_ADDED: publish}):
+            with self.assertRaises(ConnectionError):
+                publish_pending(self.restaurant.id)
+            self.assertEqual(publish_pending(self.restaurant.id), 2)
+            self.assertEqual(publish_pending(self.restaurant.id), 0)
+        # Event 2 is delivered again, never skipped
+        self.assertEqual(published, [1, 2, 2, 3])
+
+    def test_screens_resume_from_a_sequence(self):
+        for _ in range(3):
+            self.order(self.restaurant)
+        chef = StaffUser.objects.create_user(
+            username="outbox-chef", password="pass12345", role="CHEF", restaurant=self.restaurant
+        )
+        self.client.force_authenticate(chef)
+
+        response = self.client.get(reverse('order-events'), {'after': 1})
+        self.assertEqual([event['sequence'] for event in response.data['events']], [2, 3])
+        self.assertEqual((response.data['last_sequence'], response.data['reset']), (3, False))
+        self.assertEqual(response.data['events'][0]['data']['items'][0]['name'], "Poha")
+        self.assertEqual(self.client.get(reverse('order-events'), {'after': 3}).data['events'], [])
+
+        # Events the screen missed were pruned: it has to reload instead
+        OrderEvent.objects.filter(sequence__lte=2).delete()
+        self.assertTrue(self.client.get(reverse('order-events'), {'after': 0}).data['reset'])
+        self.assertFalse(self.client.get(reverse('order-events'), {'after': 2}).data['reset'])
+
+
+@override_settings(CHANNEL_LAYERS={
+    "default": {
+        "BACKEND": "channels.layers.InMemoryChannelLayer"
+    }
+}, CACHES=LOCMEM_CACHES, TASKS=EAGER_TASKS)
+class VariantCacheTests(APITestCase):
+    def setUp(self):
+        reset_kitchen_queues()
+        reset_variant_cache()
+        self.restaurant = Restaurant.objects.create(
+            name="Variant Grill", slug="variant-grill", latitude=10.0, longitude=10.0
+        )
+        self.grill = Station.objects.create(restaurant=self.restaurant, name="Grill", slug="grill")
+        category = Category.objects.create(restaurant=self.restaurant, name="Grills", station=self.grill)
+        self.menu_item = MenuItem.objects.create(restaurant=self.restaurant, category=category, name="Tikka")
+        self.half = MenuItemVariant.objects.create(
+            menu_item=self.menu_item, variant_name="Half", price=180, preparation_time=15
+        )
+        MenuItemVariant.objects.create(menu_item=self.menu_item, variant_name="Full", price=320, preparation_time=25)
+        self.url = reverse('frontend-order-create', kwargs={'restaurant_slug': self.restaurant.slug})
+
+    def test_a_warm_cart_resolves_without_queries(self):
+        cart = [(self.menu_item.id, "Full"), (self.menu_item.id, "Half")]
+        resolve_variants(self.restaurant.id, cart)
+        with self.assertNumQueries(0):
+            full, half = resolve_variants(self.restaurant.id, cart)
+        self.assertEqual((half.variant_id, half.price, half.preparation_time), (self.half.id, 180, 15))
+        self.assertEqual((full.item_name, full.station_id), ("Tikka", self.grill.id))
+
+        with self.assertRaises(MenuItemVariant.DoesNotExist):
+            resolve_variants(self.restaurant.id, [(self.menu_item.id, "Quarter")])
+        other = Restaurant.objects.create(name="Other", slug="other-grill", latitude=10.0, longitude=10.0)
+        with self.assertRaises(MenuItemVariant.DoesNotExist):
+            resolve_variants(other.id, cart)
+
+    def test_menu_changes_are_picked_up(self):
+        resolve_variants(self.restaurant.id, [(self.menu_item.id, "Half")])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.half.price = 200
+            self.half.save()
+        [half] = resolve_variants(self.restaurant.id, [(self.menu_item.id, "Half")])
+        self.assertEqual(half.price, 200)
+
+    def test_variants_are_read_from_the_database_while_the_cache_is_down(self):
+        resolve_variants(self.restaurant.id, [(self.menu_item.id, "Half")])
+        MenuItemVariant.objects.filter(id=self.half.id).update(price=200)
+        broken = mock.Mock(**{'get_many.side_effect': ConnectionError("cache is down")})
+        with mock.patch('menu.menu_cache.cache', broken), self.assertLogs('menu.menu_cache', 'WARNING'):
+            with self.assertNumQueries(1):
+                [half] = resolve_variants(self.restaurant.id, [(self.menu_item.id, "Half")])
+        self.assertEqual(half.price, 200)
+
+    @override_settings(VARIANT_CACHE={'MAX_RESTAURANTS': 1})
+    def test_least_recently_used_restaurant_is_dropped(self):
+        other = Restaurant.objects.create(name="Other", slug="other-grill", latitude=10.0, longitude=10.0)
+        resolve_variants(self.restaurant.id, [])
+        resolve_variants(other.id, [])
+        with self.assertNumQueries(1):
+            resolve_variants(self.restaurant.id, [(self.menu_item.id, "Half")])
+
+    def test_orders_are_created_from_the_cache(self):
+        data = {"customer_name": "Guest", "table_number": "2", "items": [
+            {"menu_item_id": self.menu_item.id, "variant_name": "Half", "quantity": 2},
+            {"menu_item_id": self.menu_item.id, "variant_name": "Full", "quantity": 1},
+        ]}
+        bill_id = self.client.post(self.url, data, format='json').data['order_id']
+        items = OrderItem.objects.filter(bill_id=bill_id).order_by('id')
+        self.assertEqual([(item.variant.variant_name, item.quantity, item.station_id) for item in items],
+                         [("Half", 2, self.grill.id), ("Full", 1, self.grill.id)])
+        self.assertEqual(kitchen_load.get_kitchen_load(self.restaurant.id), (3, 55))
+
+        # A cart with one unknown line is refused as a whole
+        data['items'].append({"menu_item_id": self.menu_item.id, "variant_name": "Quarter", "quantity": 1})
+        response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Bill.objects.count(), 1)
+
+    def test_variant_names_are_unique_per_item(self):
+        with self.assertRaises(IntegrityError):
+            MenuItemVariant.objects.create(menu_item=self.menu_item, variant_name="Half", price=1)
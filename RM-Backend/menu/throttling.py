@@ -0,0 +1,112 @@
+# menu/throttling.py
+
+import logging
+import time
+
+from django.core.cache import cache as default_cache
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'s': 1, 'm': 60, 'h': 60 * 60, 'd': 24 * 60 * 60}
+
+
+class PublicTokenBucketThrottle(BaseThrottle):
+    """
+    Token-bucket throttle for the anonymous customer endpoints.
+
+    The budget is taken from REST_FRAMEWORK['DEFAULT_THROTTLE_RATES'] using
+    the view's `throttle_scope`: a rate of '60/min' is a bucket holding 60
+    requests that refills at one request per second. Each client gets one
+    bucket per restaurant, keyed by the bill id when the URL has one and by
+    the client IP otherwise.
+
+    A bucket is two cache entries: the time it was last full and the number
+    of tokens taken since then. The hot path is one `get`, one atomic
+    `incr` and a `touch` of both keys, so the same code works on the
+    local-memory and Redis caches. When the cache is down the request is
+    let through rather than failed.
+    """
+    cache = default_cache
+    timer = time.time
+
+    def __init__(self):
+        self.capacity = None
+        self.refill_rate = None
+        self.wait_seconds = None
+
+    def parse_rate(self, rate):
+        num, period = rate.split('/')
+        capacity = int(num)
+        return capacity, capacity / PERIODS[period[0]]
+
+    def get_cache_key(self, request, view):
+        restaurant_slug = view.kwargs.get('restaurant_slug', '-')
+        bill_id = view.kwargs.get('bill_id') or view.kwargs.get('order_id')
+        client = f'bill-{bill_id}' if bill_id else self.get_ident(request)
+        return f'throttle_bucket_{view.throttle_scope}_{restaurant_slug}_{client}'
+
+    def allow_request(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if not scope:
+            return True
+        try:
+            rate = api_settings.DEFAULT_THROTTLE_RATES[scope]
+        except KeyError:
+            raise ImproperlyConfigured(f"No throttle rate set for the '{scope}' scope.")
+        if rate is None:
+            return True
+        self.capacity, self.refill_rate = self.parse_rate(rate)
+
+        key = self.get_cache_key(request, view)
+        try:
+            return self.take_token(key)
+        except Exception:
+            logger.warning("Throttle cache unavailable, letting the request through", exc_info=True)
+            return True
+
+    def take_token(self, key):
+        anchor_key, taken_key = f'{key}_anchor', f'{key}_taken'
+        # A bucket is full again at most this long after its last allowed
+        # request, so its keys can expire then
+        timeout = int(self.capacity / self.refill_rate) + 1
+        now = self.timer()
+
+        anchor = self.cache.get(anchor_key)
+        if anchor is None:
+            self.cache.set_many({anchor_key: now, taken_key: 1}, timeout)
+            return True
+
+        try:
+            taken = self.cache.incr(taken_key)
+        except ValueError:
+            # The counter expired between the two calls; start a full bucket
+            self.cache.set_many({anchor_key: now, taken_key: 1}, timeout)
+            return True
+
+        refilled = (now - anchor) * self.refill_rate
+        if taken - 1 < refilled:
+            # The bucket was full before this request: move the anchor so
+            # idle time never adds up to more than `capacity` tokens.
+            self.cache.set_many({anchor_key: now, taken_key: 1}, timeout)
+            return True
+        if taken <= self.capacity + refilled:
+            # Keep the keys as long as the bucket is in debt; otherwise a
+            # client that keeps it empty would get a new full bucket when
+            # they expire
+            self.cache.touch(anchor_key, timeout)
+            self.cache.touch(taken_key, timeout)
+            return True
+
+        # Rejected requests do not use up a token
+        try:
+            self.cache.decr(taken_key)
+        except ValueError:
+            pass
+        self.wait_seconds = (taken - self.capacity - refilled) / self.refill_rate
+        return False
+
+    def wait(self):
+        return self.wait_seconds
@@ -4,10 +4,11 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     PublicMenuListView, OrderCreateView, ChefOrderItemUpdateView, 
     CaptainOrderCreateView, CaptainReorderView, CashierBillListView, 
-    CashierMarkAsPaidView, AdminAnalyticsView,
+    CashierMarkAsPaidView, CashierBatchSettleView, OrderEventListView, AdminAnalyticsView, PlatformAnalyticsView,
     MenuItemManageViewSet, CategoryManageViewSet, FoodTypeViewSet, 
     CuisineViewSet , RestaurantOrderViewSet , RestaurantAnalyticsView,
-    FrontendOrderCreateView , KitchenOrderListView, AdminOrderReportView
+    FrontendOrderCreateView , KitchenOrderListView, AdminOrderReportView,
+    StationManageViewSet, ConnectedScreensView, PublicMenuSearchView
 )
 from .views import AddItemsToOrderView 
 from .views import OrderDetailView
@@ -16,6 +17,7 @@ from .views import OrderDetailView
 router = DefaultRouter()
 router.register(r'menu-items', MenuItemManageViewSet, basename='menuitem-manage')
 router.register(r'categories', CategoryManageViewSet, basename='category-manage')
+router.register(r'stations', StationManageViewSet, basename='station-manage')
 router.register(r'food-types', FoodTypeViewSet, basename='foodtype-manage')
 router.register(r'cuisines', CuisineViewSet, basename='cuisine-manage')
 router.register(r'orders', RestaurantOrderViewSet, basename='restaurant-order')
@@ -23,6 +25,7 @@ router.register(r'orders', RestaurantOrderViewSet, basename='restaurant-order')
 urlpatterns = [
     # --- Public Customer URLs ---
     path('restaurants/<slug:restaurant_slug>/menu/', PublicMenuListView.as_view(), name='public-menu-list'),
+    path('restaurants/<slug:restaurant_slug>/menu/search/', PublicMenuSearchView.as_view(), name='public-menu-search'),
     path('restaurants/<slug:restaurant_slug>/orders/', FrontendOrderCreateView.as_view(), name='frontend-order-create'),
     # --- Internal Staff URLs ---
     path('order-items/<int:item_id>/update-status/', ChefOrderItemUpdateView.as_view(), name='update-order-item-status'),
@@ -30,8 +33,11 @@ urlpatterns = [
     path('captain/bills/<int:bill_id>/reorder/', CaptainReorderView.as_view(), name='captain-reorder'),
     path('cashier/pending-bills/', CashierBillListView.as_view(), name='cashier-bill-list'),
     path('cashier/bills/<int:bill_id>/pay/', CashierMarkAsPaidView.as_view(), name='cashier-mark-as-paid'),
+    path('cashier/bills/settle/', CashierBatchSettleView.as_view(), name='cashier-batch-settle'),
+    path('restaurant/events/', OrderEventListView.as_view(), name='order-events'),
     # --- Admin Analytics URL ---
     path('admin/analytics/', AdminAnalyticsView.as_view(), name='admin-analytics'),
+    path('admin/analytics/restaurants/', PlatformAnalyticsView.as_view(), name='platform-analytics'),
     # --- Restaurant Admin Management URLs ---
     # This single line includes all the URLs generated by the router above
     path('restaurant/', include(router.urls)),
@@ -43,6 +49,7 @@ urlpatterns = [
     path('kitchen/orders/', KitchenOrderListView.as_view(), name='kitchen-order-list'),
     # path for the admin's historical order report
     path('restaurant/reports/orders/', AdminOrderReportView.as_view(), name='admin-order-report'),
+    path('restaurant/screens/', ConnectedScreensView.as_view(), name='connected-screens'),
 
     path('orders/<int:bill_id>/add_items/', AddItemsToOrderView.as_view(), name='add-items-to-order'),
 
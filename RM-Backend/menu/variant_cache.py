@@ -0,0 +1,131 @@
+# menu/variant_cache.py
+
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+
+from .menu_cache import menu_version
+from .models import MenuItem, MenuItemVariant
+
+DEFAULTS = {
+    # Restaurants whose variants are kept, least recently ordered from
+    # dropped first
+    'MAX_RESTAURANTS': 500,
+}
+
+
+def get_variant_cache_settings():
+    return {**DEFAULTS, **getattr(settings, 'VARIANT_CACHE', {})}
+
+
+class ResolvedVariant:
+    """What an order line needs to know about the variant it names."""
+    __slots__ = (
+        'variant_id', 'menu_item_id', 'restaurant_id', 'item_name', 'variant_name',
+        'price', 'preparation_time', 'is_available', 'station_id',
+    )
+
+    def __init__(self, variant_id, menu_item_id, restaurant_id, item_name, variant_name,
+                 price, preparation_time, is_available, station_id):
+        self.variant_id = variant_id
+        self.menu_item_id = menu_item_id
+        self.restaurant_id = restaurant_id
+        self.item_name = item_name
+        self.variant_name = variant_name
+        self.price = price
+        self.preparation_time = preparation_time
+        self.is_available = is_available
+        self.station_id = station_id
+
+    def as_variant(self):
+        """
+        A MenuItemVariant with its menu_item, built without a query, for
+        code that reads order_item.variant (kitchen queue, load, tickets).
+        A new instance every time, so callers never share one.
+        """
+        variant = MenuItemVariant(
+            id=self.variant_id, menu_item_id=self.menu_item_id, variant_name=self.variant_name,
+            price=self.price, preparation_time=self.preparation_time,
+        )
+        variant.menu_item = MenuItem(
+            id=self.menu_item_id, restaurant_id=self.restaurant_id, name=self.item_name,
+            is_available=self.is_available,
+        )
+        return variant
+
+
+class _RestaurantVariants:
+    __slots__ = ('version', 'by_key')
+
+    def __init__(self, version, by_key):
+        self.version = version
+        self.by_key = by_key
+
+
+_restaurants = OrderedDict()
+_lock = threading.Lock()
+
+
+def _load(restaurant_id):
+    rows = MenuItemVariant.objects.filter(menu_item__restaurant_id=restaurant_id).values_list(
+        'id', 'menu_item_id', 'menu_item__name', 'variant_name', 'price', 'preparation_time',
+        'menu_item__is_available', 'menu_item__category__station_id',
+    )
+    return {
+        (menu_item_id, variant_name): ResolvedVariant(
+            variant_id, menu_item_id, restaurant_id, item_name, variant_name,
+            price, preparation_time, is_available, station_id,
+        )
+        for variant_id, menu_item_id, item_name, variant_name, price, preparation_time, is_available, station_id in rows
+    }
+
+
+def restaurant_variants(restaurant_id):
+    """
+    {(menu_item_id, variant_name): ResolvedVariant} of every variant of a
+    restaurant. Checked against the menu version on every call (one cache
+    read) and loaded again with a single query when the menu changed, or
+    on every call while the cache cannot be reached.
+    """
+    version = menu_version(restaurant_id)
+    if version is None:
+        # The cache is down, so changes to the menu cannot be seen
+        return _load(restaurant_id)
+    with _lock:
+        entry = _restaurants.get(restaurant_id)
+        if entry is not None and entry.version == version:
+            _restaurants.move_to_end(restaurant_id)
+            return entry.by_key
+
+    by_key = _load(restaurant_id)
+    max_restaurants = get_variant_cache_settings()['MAX_RESTAURANTS']
+    with _lock:
+        _restaurants[restaurant_id] = _RestaurantVariants(version, by_key)
+        _restaurants.move_to_end(restaurant_id)
+        while len(_restaurants) > max_restaurants:
+            _restaurants.popitem(last=False)
+    return by_key
+
+
+def resolve_variants(restaurant_id, lines):
+    """
+    The ResolvedVariant of each (menu_item_id, variant_name) line of a cart,
+    in order. Raises MenuItemVariant.DoesNotExist, like the get() it
+    replaces, when a line names no variant of this restaurant.
+    """
+    by_key = restaurant_variants(restaurant_id)
+    resolved = []
+    for menu_item_id, variant_name in lines:
+        variant = by_key.get((menu_item_id, variant_name))
+        if variant is None:
+            raise MenuItemVariant.DoesNotExist(
+                f"No variant {variant_name!r} of menu item {menu_item_id} in restaurant {restaurant_id}"
+            )
+        resolved.append(variant)
+    return resolved
+
+
+def reset_variant_cache():
+    with _lock:
+        _restaurants.clear()
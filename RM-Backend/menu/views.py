@@ -1,35 +1,71 @@
 # menu/views.py
 from django.shortcuts import render,get_object_or_404
 from rest_framework import generics, viewsets 
+from rest_framework.decorators import action
 from .models import Category , OrderItem ,Bill ,MenuItem , MenuItemVariant
 from .serializers import CategorySerializer, BillSerializer, OrderItemWriteSerializer
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
 from geopy.distance import geodesic
-from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
 from users.permissions import (
     IsChefOrAdmin, 
     IsCaptainOrAdmin, 
     IsCashierOrAdmin, 
-    IsKitchenStaffOrAdmin  # Make sure this new one is here!
+    IsKitchenStaffOrAdmin,  # Make sure this new one is here!
+    IsRestaurantAdmin,
+    IsPlatformAdmin
 )
 from restaurants.models import Restaurant 
-from .models import FoodType, Cuisine, Category 
-from .serializers import FoodTypeSerializer, CuisineSerializer, CategoryManageSerializer 
+from .models import FoodType, Cuisine, Category, Station
+from .serializers import FoodTypeSerializer, CuisineSerializer, CategoryManageSerializer, StationSerializer
 from .serializers import RestaurantOrderListSerializer, KitchenOrderSerializer
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.authentication import SessionAuthentication
 from .serializers import CashierBillSerializer ,MenuItemManageSerializer , PublicMenuItemSerializer, PublicMenuItemVariantSerializer
 from django.utils import timezone
-from django.db.models import Sum, F, Count
+from django.db.models import Prefetch
 from .serializers import FrontendOrderSerializer
-from datetime import timedelta
+from datetime import date, timedelta
 from .serializers import FrontendOrderItemSerializer  
+from .broadcasts import pending_bills_queryset
+from .outbox import events_after, get_outbox_settings, record_bills_paid, record_item_status, record_items_added
+from .broadcasts import connected_screens
+from .serializers import BatchSettlementSerializer, BulkAvailabilitySerializer
+from .availability import set_availability
+from .broadcasts import push_menu_availability
+from .settlement import settle_bills
+from .idempotency import idempotent
+from .throttling import PublicTokenBucketThrottle
+from .kitchen_queue import get_bill_eta, record_new_items, record_status_change, record_bills_closed
+from . import kitchen_load
+from .kitchen_load import check_kitchen_capacity
+from django.db import transaction
+from . import fast_serializers
+from .menu_cache import menu_item_fragments, public_menu_fragments
+from .search import get_menu_search_index, get_menu_search_settings
+from .models import ArchivedBill
+from .archive import created_in_month, created_on, paid_sales, top_dish
+from django.http import Http404
+from .platform_analytics import period_days, platform_analytics
+from .variant_cache import resolve_variants
+
+
+def get_user_restaurant(request):
+    """
+    Returns the restaurant of the logged-in Admin, or the one in the token
+    of a shared staff login (Chef, Captain, Cashier).
+    """
+    user = request.user
+    if hasattr(user, 'restaurant') and user.restaurant:
+        return user.restaurant
+    restaurant_id = request.auth.get('restaurant_id') if request.auth else None
+    return get_object_or_404(Restaurant, id=restaurant_id)
+
 class OrderCreateView(APIView):
    
 
+    @idempotent
     def post(self, request, restaurant_slug, *args, **kwargs):
         # First, get the specific restaurant from the URL
         restaurant = get_object_or_404(Restaurant, slug=restaurant_slug)
@@ -56,26 +92,21 @@ class OrderCreateView(APIView):
         serializer = BillSerializer(data=request.data)
         if not serializer.is_valid():
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        # Hold the order back if the kitchen is over capacity
+        capacity_response = check_kitchen_capacity(restaurant, accept_wait=request.data.get('accept_wait') is True)
+        if capacity_response is not None:
+            return capacity_response
         
-        # Assign the bill to the correct restaurant before saving
-        bill_instance = serializer.save(restaurant=restaurant)
-
-        # ... (The rest of the WebSocket logic remains the same) ...
-        detailed_items = [{
-            'order_item_id': item.id, 'name': item.variant.menu_item.name,
-            'variant': item.variant.variant_name, 'quantity': item.quantity
-        } for item in bill_instance.order_items.all()]
-        
-        websocket_message = {
-            'bill_id': bill_instance.id, 'customer_name': bill_instance.customer_name,
-            'table_number': bill_instance.table_number, 'items': detailed_items
-        }
-        
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chef_notifications_{restaurant.slug}', # Channel is now restaurant-specific
-            {'type': 'send.new.order', 'data': websocket_message}
-        )
+        # The bill, its load and its order event commit together (menu.outbox)
+        with transaction.atomic():
+            # Assign the bill to the correct restaurant before saving
+            bill_instance = serializer.save(restaurant=restaurant)
+            order_items = list(bill_instance.order_items.select_related('variant__menu_item'))
+            kitchen_load.add_items(restaurant.id, order_items)
+            # Published to the kitchen (per station) and cashier screens after commit
+            detailed_items = record_items_added(bill_instance, order_items, 'bill_added')
+        record_new_items(restaurant.id, order_items)
         
         response_data = {
             'bill_id': bill_instance.id, 'customer_name': bill_instance.customer_name,
@@ -88,6 +119,8 @@ class OrderDetailView(APIView):
     Get details of a specific order/bill
     """
     permission_classes = [AllowAny]  # Or [IsAuthenticated] if you want to restrict it
+    throttle_classes = [PublicTokenBucketThrottle]
+    throttle_scope = 'public_order_status'
     
     def get(self, request, order_id, *args, **kwargs):
         try:
@@ -118,6 +151,8 @@ class OrderDetailView(APIView):
                 'restaurant_slug': bill.restaurant.slug,
                 'order_items': order_items
             }
+            # Live position in the kitchen queue and estimated ready time
+            response_data.update(get_bill_eta(bill.restaurant_id, bill.id))
             
             return Response(response_data, status=status.HTTP_200_OK)
             
@@ -138,87 +173,32 @@ class ChefOrderItemUpdateView(APIView):
         if new_status not in valid_statuses:
             return Response({"error": "Invalid status provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-        try:
-            order_item = OrderItem.objects.select_related(
-                'bill', 'bill__restaurant', 'variant__menu_item'
-            ).get(id=order_item_id)
-        except OrderItem.DoesNotExist:
-            return Response({"error": "Order item not found."}, status=status.HTTP_404_NOT_FOUND)
-
-        order_item.status = new_status
-        order_item.save()
-
-        # Prepare the WebSocket message for the customer
-        customer_message = {
-            'type': 'order_status_update',
-            'order_item_id': order_item.id,
-            'status': order_item.status,
-            'item_name': order_item.variant.menu_item.name,
-        }
-        if new_status == OrderItem.OrderStatus.ACCEPTED:
-            customer_message['preparation_time'] = order_item.variant.preparation_time
-
-        try:
-            channel_layer = get_channel_layer()
-            
-            # --- THIS IS THE CORRECTED LOGIC ---
-            # Construct the group name using table number and restaurant slug
-            bill = order_item.bill
-            customer_group_name = f'customer_{order_item.bill.id}'
-
-            async_to_sync(channel_layer.group_send)(
-                customer_group_name,
-                customer_message
-            )
-            # --- END CORRECTION ---
-
-            # Check if this is the last item in the order to be marked as COMPLETED
-            if new_status == OrderItem.OrderStatus.COMPLETED:
-                # Get all items in this bill
-                bill_items = OrderItem.objects.filter(bill=order_item.bill)
-                # Check if all items are now completed
-                all_completed = all(item.status == OrderItem.OrderStatus.COMPLETED for item in bill_items)
-                
-                if all_completed:
-                    # Prepare data for cashier notification
-                    restaurant = bill.restaurant
-                    
-                    # Calculate total amount
-                    total_amount = sum(item.variant.price * item.quantity for item in bill_items)
-                    
-                    # Format items for the cashier
-                    items_data = [{
-                        'name': item.variant.menu_item.name,
-                        'variant_name': item.variant.variant_name,
-                        'quantity': item.quantity,
-                        'price': float(item.variant.price)
-                    } for item in bill_items]
-                    
-                    # Prepare the message
-                    cashier_message = {
-                        'id': bill.id,
-                        'table_number': bill.table_number,
-                        'totalAmount': float(total_amount),
-                        'items': items_data
-                    }
-                    
-                    # Send notification to cashier
-                    async_to_sync(channel_layer.group_send)(
-                        f'cashier_notifications_{restaurant.slug}',
-                        {
-                            'type': 'order_ready_for_payment',
-                            'data': cashier_message
-                        }
-                    )
-        except Exception as e:
-            # This 'except' block is now correctly indented
-            print(f"WebSocket notification error: {e}")
+        # Lock the item so two chefs updating it at once cannot both
+        # change the kitchen load counters, and its bill so a payment
+        # cannot take the item off the counters at the same time
+        with transaction.atomic():
+            try:
+                order_item = OrderItem.objects.select_for_update(of=('self', 'bill')).select_related(
+                    'bill', 'bill__restaurant', 'variant__menu_item'
+                ).get(id=order_item_id)
+            except OrderItem.DoesNotExist:
+                return Response({"error": "Order item not found."}, status=status.HTTP_404_NOT_FOUND)
+
+            old_status = order_item.status
+            order_item.status = new_status
+            order_item.save()
+            kitchen_load.apply_status_change(order_item.bill.restaurant_id, order_item, old_status)
+            # The event carries the ETA, which only this process's kitchen
+            # queue knows; the queue itself changes once this commits
+            eta = record_status_change(order_item.bill.restaurant_id, order_item)
+            record_item_status(order_item, eta)
 
         return Response({"message": f"Order item {order_item_id} updated to {new_status}"}, status=status.HTTP_200_OK)
 
 class CaptainOrderCreateView(APIView):
     permission_classes = [IsAuthenticated, IsCaptainOrAdmin]
 
+    @idempotent
     def post(self, request, *args, **kwargs):
         serializer = BillSerializer(data=request.data)
         if not serializer.is_valid():
@@ -231,25 +211,22 @@ class CaptainOrderCreateView(APIView):
                 {"error": "User is not associated with any restaurant"}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        bill_instance = serializer.save(restaurant=restaurant)
 
-        # Build and send the WebSocket message
-        detailed_items = [{
-            'order_item_id': item.id, 'name': item.variant.menu_item.name,
-            'variant': item.variant.variant_name, 'quantity': item.quantity
-        } for item in bill_instance.order_items.all()]
-        
-        websocket_message = {
-            'bill_id': bill_instance.id, 'customer_name': bill_instance.customer_name,
-            'table_number': bill_instance.table_number, 'items': detailed_items
-        }
-        
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chef_notifications_{restaurant.slug}',
-            {'type': 'send.new.order', 'data': websocket_message}
+        # Captains can seat an order even when the kitchen is over capacity
+        capacity_response = check_kitchen_capacity(
+            restaurant,
+            accept_wait=request.data.get('accept_wait') is True,
+            override=request.data.get('override_capacity') is True
         )
+        if capacity_response is not None:
+            return capacity_response
+        
+        with transaction.atomic():
+            bill_instance = serializer.save(restaurant=restaurant)
+            order_items = list(bill_instance.order_items.select_related('variant__menu_item'))
+            kitchen_load.add_items(restaurant.id, order_items)
+            detailed_items = record_items_added(bill_instance, order_items, 'bill_added')
+        record_new_items(restaurant.id, order_items)
         
         response_data = {
             'bill_id': bill_instance.id, 'customer_name': bill_instance.customer_name,
@@ -260,6 +237,7 @@ class CaptainOrderCreateView(APIView):
 class CaptainReorderView(APIView):
     permission_classes = [IsAuthenticated, IsCaptainOrAdmin]
 
+    @idempotent
     def post(self, request, bill_id, *args, **kwargs):
         try:
             bill = Bill.objects.get(id=bill_id, payment_status=Bill.PaymentStatus.PENDING)
@@ -272,51 +250,56 @@ class CaptainReorderView(APIView):
         if not item_serializer.is_valid():
             return Response(item_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-        new_items_data = item_serializer.validated_data
-        new_order_items = []
-        for item_data in new_items_data:
-            order_item = OrderItem.objects.create(
-                bill=bill,
-                variant_id=item_data['variant_id'],
-                quantity=item_data['quantity']
-            )
-            new_order_items.append(order_item)
-
-        # --- Broadcast ONLY the new items to the Chef Panel ---
-        detailed_items = []
-        for item in new_order_items:
-            detailed_items.append({
-                'order_item_id': item.id, 'name': item.variant.menu_item.name,
-                'variant': item.variant.variant_name, 'quantity': item.quantity
-            })
-        
-        websocket_message = {
-            'bill_id': bill.id, 'customer_name': bill.customer_name,
-            'table_number': bill.table_number, 'items': detailed_items
-        }
-        
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            'chef_notifications',
-            {'type': 'send.new.order', 'data': websocket_message}
+        capacity_response = check_kitchen_capacity(
+            bill.restaurant,
+            accept_wait=request.data.get('accept_wait') is True,
+            override=request.data.get('override_capacity') is True
         )
+        if capacity_response is not None:
+            return capacity_response
+
+        new_items_data = item_serializer.validated_data
+        with transaction.atomic():
+            stations = OrderItem.stations_of([item_data['variant_id'] for item_data in new_items_data])
+            new_order_items = OrderItem.objects.bulk_create([
+                OrderItem(
+                    bill=bill,
+                    variant_id=item_data['variant_id'],
+                    quantity=item_data['quantity'],
+                    station_id=stations.get(item_data['variant_id'])
+                )
+                for item_data in new_items_data
+            ])
+            new_order_items = list(OrderItem.objects.filter(
+                id__in=[item.id for item in new_order_items]
+            ).select_related('variant__menu_item').order_by('id'))
+            kitchen_load.add_items(bill.restaurant_id, new_order_items)
+
+            # --- Broadcast ONLY the new items to the Chef Panel ---
+            record_items_added(bill, new_order_items, 'bill_updated')
+        record_new_items(bill.restaurant_id, new_order_items)
 
         return Response({"message": "Items added successfully."}, status=status.HTTP_200_OK)
 
 class CashierBillListView(generics.ListAPIView):
+    """
+    Lists the PENDING bills of the cashier's own restaurant. Live screens
+    get the same list over the cashier WebSocket and only need this on load.
+    """
     permission_classes = [IsAuthenticated, IsCashierOrAdmin]
     serializer_class = CashierBillSerializer
-    queryset = Bill.objects.filter(payment_status=Bill.PaymentStatus.PENDING).prefetch_related('order_items__variant__menu_item')
+
+    def get_queryset(self):
+        return pending_bills_queryset(get_user_restaurant(self.request))
+
+    def list(self, request, *args, **kwargs):
+        # Flat rows instead of CashierBillSerializer; the output is the same
+        return Response(fast_serializers.cashier_bills(self.get_queryset()))
 
 class CashierMarkAsPaidView(APIView):
     permission_classes = [IsAuthenticated, IsCashierOrAdmin]
 
     def post(self, request, bill_id, *args, **kwargs):
-        try:
-            bill = Bill.objects.get(id=bill_id, payment_status=Bill.PaymentStatus.PENDING)
-        except Bill.DoesNotExist:
-            return Response({"error": "Active bill not found."}, status=status.HTTP_404_NOT_FOUND)
-        
         # Get the payment method from the request body
         payment_method = request.data.get('payment_method')
 
@@ -328,13 +311,63 @@ class CashierMarkAsPaidView(APIView):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        # Update the bill with both the new status and the payment method
-        bill.payment_status = Bill.PaymentStatus.PAID
-        bill.payment_method = payment_method
-        bill.save()
+        # Update the bill with both the new status and the payment method.
+        # The lock makes a second payment (or a chef's status change) wait
+        # and then see the bill as PAID.
+        with transaction.atomic():
+            try:
+                bill = Bill.objects.select_for_update().get(id=bill_id, payment_status=Bill.PaymentStatus.PENDING)
+            except Bill.DoesNotExist:
+                return Response({"error": "Active bill not found."}, status=status.HTTP_404_NOT_FOUND)
+            bill.payment_status = Bill.PaymentStatus.PAID
+            bill.payment_method = payment_method
+            bill.save()
+            kitchen_load.remove_bills(bill.restaurant_id, [bill.id])
+            record_bills_paid(bill.restaurant_id, [bill.id])
+        record_bills_closed(bill.restaurant_id, [bill.id])
         
         return Response({"message": f"Bill {bill_id} has been marked as PAID with method {payment_method}."}, status=status.HTTP_200_OK)
 
+class OrderEventListView(APIView):
+    """
+    The order events of the user's restaurant after ?after=<sequence>, for
+    a kitchen or cashier screen (or read model) catching up after a
+    reconnect. Every WebSocket order message carries its `sequence`.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        restaurant = get_user_restaurant(request)
+        try:
+            after = max(int(request.query_params.get('after', 0)), 0)
+            limit = request.query_params.get('limit')
+            limit = min(max(int(limit), 1), get_outbox_settings()['REPLAY_LIMIT']) if limit else None
+        except ValueError:
+            return Response({'error': 'after and limit must be numbers.'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(events_after(restaurant.id, after, limit), status=status.HTTP_200_OK)
+
+class CashierBatchSettleView(APIView):
+    """
+    Settles many bills of the cashier's restaurant in one request, e.g. at
+    the end of a shift. Returns a result for every requested bill.
+    """
+    permission_classes = [IsAuthenticated, IsCashierOrAdmin]
+
+    def post(self, request, *args, **kwargs):
+        serializer = BatchSettlementSerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+        restaurant = get_user_restaurant(request)
+        settlements = [
+            (item['bill_id'], item['payment_method'])
+            for item in serializer.validated_data['bills']
+        ]
+        results = settle_bills(restaurant, settlements)
+        paid_count = sum(1 for result in results if result['status'] == Bill.PaymentStatus.PAID)
+
+        return Response({'paid_count': paid_count, 'results': results}, status=status.HTTP_200_OK)
+
 class AdminAnalyticsView(APIView):
     """
     Provides analytics data for the admin dashboard.
@@ -346,53 +379,18 @@ class AdminAnalyticsView(APIView):
         current_month = today.month
         current_year = today.year
 
+        # Live and archived order items are both counted (menu.archive)
         # --- 1. Calculate Sales Today ---
-        sales_today_query = OrderItem.objects.filter(
-            bill__payment_status=Bill.PaymentStatus.PAID,
-            created_at__date=today
-        ).aggregate(
-            total_sales=Sum(F('quantity') * F('variant__price'))
-        )
-        sales_today = sales_today_query['total_sales'] or 0
+        sales_today = paid_sales(**created_on(today))
 
         # --- 2. Calculate Sales This Month ---
-        sales_month_query = OrderItem.objects.filter(
-            bill__payment_status=Bill.PaymentStatus.PAID,
-            created_at__year=current_year,
-            created_at__month=current_month
-        ).aggregate(
-            total_sales=Sum(F('quantity') * F('variant__price'))
-        )
-        sales_this_month = sales_month_query['total_sales'] or 0
+        sales_this_month = paid_sales(**created_in_month(current_year, current_month))
 
         # --- 3. Find Top Dish Today ---
-        top_dish_today_query = OrderItem.objects.filter(
-            bill__payment_status=Bill.PaymentStatus.PAID,
-            created_at__date=today
-        ).values(
-            'variant__menu_item__name', 'variant__variant_name'
-        ).annotate(
-            total_quantity=Sum('quantity')
-        ).order_by('-total_quantity').first()
-        
-        top_dish_today = "N/A"
-        if top_dish_today_query:
-            top_dish_today = f"{top_dish_today_query['variant__menu_item__name']} ({top_dish_today_query['variant__variant_name']})"
+        top_dish_today = top_dish(**created_on(today))
 
         # --- 4. Find Top Dish This Month ---
-        top_dish_month_query = OrderItem.objects.filter(
-            bill__payment_status=Bill.PaymentStatus.PAID,
-            created_at__year=current_year,
-            created_at__month=current_month
-        ).values(
-            'variant__menu_item__name', 'variant__variant_name'
-        ).annotate(
-            total_quantity=Sum('quantity')
-        ).order_by('-total_quantity').first()
-
-        top_dish_this_month = "N/A"
-        if top_dish_month_query:
-            top_dish_this_month = f"{top_dish_month_query['variant__menu_item__name']} ({top_dish_month_query['variant__variant_name']})"
+        top_dish_this_month = top_dish(**created_in_month(current_year, current_month))
 
         # --- Assemble the final data ---
         data = {
@@ -404,6 +402,38 @@ class AdminAnalyticsView(APIView):
 
         return Response(data, status=status.HTTP_200_OK)
 
+class PlatformAnalyticsView(APIView):
+    """
+    Sales, order counts and top dishes of every restaurant for the platform
+    super-admin, over ?period=today|week|month|year (default month) or
+    ?start=YYYY-MM-DD&end=YYYY-MM-DD. Restaurants are aggregated in parallel
+    and cached one by one (menu.platform_analytics).
+    """
+    permission_classes = [IsAuthenticated, IsPlatformAdmin]
+
+    def get_days(self):
+        start = self.request.query_params.get('start')
+        end = self.request.query_params.get('end')
+        if start or end:
+            first_day = date.fromisoformat(start) if start else timezone.now().date()
+            last_day = date.fromisoformat(end) if end else timezone.now().date()
+            if first_day > last_day:
+                raise ValueError("start must not be after end")
+            return first_day, last_day
+        return period_days(self.request.query_params.get('period', 'month').lower())
+
+    def get(self, request, *args, **kwargs):
+        try:
+            first_day, last_day = self.get_days()
+        except ValueError as exc:
+            return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+
+        data = platform_analytics(first_day, last_day)
+        data['total_sales'] = f"{data['total_sales']:.2f}"
+        for row in data['restaurants']:
+            row['sales'] = f"{row['sales']:.2f}"
+        return Response(data, status=status.HTTP_200_OK)
+
 class MenuItemManageViewSet(viewsets.ModelViewSet):
     """
     A ViewSet for Restaurant Admins to manage their own MenuItems.
@@ -426,6 +456,30 @@ class MenuItemManageViewSet(viewsets.ModelViewSet):
         """
         serializer.save(restaurant=self.request.user.restaurant)
 
+    def perform_update(self, serializer):
+        was_available = serializer.instance.is_available
+        menu_item = serializer.save()
+        if menu_item.is_available != was_available:
+            transaction.on_commit(lambda: push_menu_availability(
+                menu_item.restaurant, [menu_item.id], menu_item.is_available
+            ))
+
+    @action(detail=False, methods=['post'], url_path='availability')
+    def bulk_availability(self, request):
+        """
+        Takes many items off the menu (or puts them back) at once, selected
+        by 'item_ids', 'category' or 'cuisine'.
+        """
+        serializer = BulkAvailabilitySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+        updated_ids = set_availability(
+            request.user.restaurant, data['is_available'],
+            item_ids=data.get('item_ids'), category_id=data.get('category'), cuisine_id=data.get('cuisine')
+        )
+        return Response({'is_available': data['is_available'], 'updated_ids': updated_ids}, status=status.HTTP_200_OK)
+
 class PublicMenuListView(generics.ListAPIView):
     """
     Provides a public, flat list of all available menu items for a
@@ -433,6 +487,8 @@ class PublicMenuListView(generics.ListAPIView):
     """
     serializer_class = PublicMenuItemSerializer
     permission_classes = [AllowAny] # This is a public endpoint
+    throttle_classes = [PublicTokenBucketThrottle]
+    throttle_scope = 'public_menu'
 
     def get_queryset(self):
         """
@@ -448,6 +504,39 @@ class PublicMenuListView(generics.ListAPIView):
             is_available=True
         ).prefetch_related('variants', 'food_types', 'cuisines')
 
+    def list(self, request, *args, **kwargs):
+        # Items are served from pre-encoded JSON fragments; only items that
+        # changed since they were last served go through the serializer
+        restaurant = get_object_or_404(Restaurant, slug=self.kwargs.get('restaurant_slug'))
+        return Response(public_menu_fragments(restaurant))
+
+class PublicMenuSearchView(APIView):
+    """
+    Searches the available items of a restaurant by name and description,
+    optionally limited to food types and cuisines:
+    ?q=panner tik&food_type=1&cuisine=3. Returns the items in the same shape
+    as the public menu list, best match first.
+    """
+    permission_classes = [AllowAny]
+    throttle_classes = [PublicTokenBucketThrottle]
+    throttle_scope = 'public_menu_search'
+
+    def get(self, request, restaurant_slug, *args, **kwargs):
+        restaurant = get_object_or_404(Restaurant, slug=restaurant_slug)
+        try:
+            food_types = [int(value) for value in request.query_params.getlist('food_type')]
+            cuisines = [int(value) for value in request.query_params.getlist('cuisine')]
+            limit = int(request.query_params.get('limit', get_menu_search_settings()['RESULT_LIMIT']))
+        except ValueError:
+            return Response(
+                {'error': "'food_type', 'cuisine' and 'limit' must be numbers."},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        item_ids = get_menu_search_index(restaurant.id).search(
+            request.query_params.get('q', ''), food_types, cuisines, limit=max(1, min(limit, 100))
+        )
+        return Response(menu_item_fragments(restaurant.id, item_ids))
+
 class CategoryManageViewSet(viewsets.ModelViewSet):
     serializer_class = CategoryManageSerializer
     permission_classes = [IsAuthenticated]
@@ -458,6 +547,20 @@ class CategoryManageViewSet(viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save(restaurant=self.request.user.restaurant)
 
+class StationManageViewSet(viewsets.ModelViewSet):
+    """
+    Lets a Restaurant Admin define the kitchen stations (Tandoor, Bar, ...)
+    that categories are routed to.
+    """
+    serializer_class = StationSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        return Station.objects.filter(restaurant=self.request.user.restaurant)
+
+    def perform_create(self, serializer):
+        serializer.save(restaurant=self.request.user.restaurant)
+
 class FoodTypeViewSet(viewsets.ModelViewSet):
     serializer_class = FoodTypeSerializer
     permission_classes = [IsAuthenticated]
@@ -486,6 +589,25 @@ class RestaurantOrderViewSet(viewsets.ReadOnlyModelViewSet):
             restaurant=self.request.user.restaurant
         ).order_by('-created_at').prefetch_related('order_items__variant__menu_item')
 
+    def get_archived_queryset(self):
+        return ArchivedBill.objects.filter(
+            restaurant=self.request.user.restaurant
+        ).order_by('-created_at')
+
+    def get_object(self):
+        # Archived bills have the same fields and related names as Bill
+        try:
+            return super().get_object()
+        except Http404:
+            return get_object_or_404(
+                self.get_archived_queryset().prefetch_related('order_items__variant__menu_item'),
+                pk=self.kwargs['pk']
+            )
+
+    def list(self, request, *args, **kwargs):
+        # Flat rows instead of RestaurantOrderListSerializer; the output is the same
+        return Response(fast_serializers.restaurant_orders(self.get_queryset(), self.get_archived_queryset()))
+
 class RestaurantAnalyticsView(APIView):
     """
     Provides analytics data specifically for the logged-in Restaurant Admin.
@@ -498,45 +620,20 @@ class RestaurantAnalyticsView(APIView):
         current_month = today.month
         current_year = today.year
 
-        # Base queryset filtered for the admin's restaurant and paid bills
-        base_queryset = OrderItem.objects.filter(
-            bill__restaurant=user.restaurant,
-            bill__payment_status=Bill.PaymentStatus.PAID
-        )
+        # Paid items of the admin's restaurant, live and archived (menu.archive)
+        restaurant_filter = {'bill__restaurant': user.restaurant}
 
         # 1. Calculate Sales Today
-        sales_today_query = base_queryset.filter(created_at__date=today).aggregate(
-            total_sales=Sum(F('quantity') * F('variant__price'))
-        )
-        sales_today = sales_today_query['total_sales'] or 0
+        sales_today = paid_sales(**created_on(today), **restaurant_filter)
 
         # 2. Calculate Sales This Month
-        sales_month_query = base_queryset.filter(
-            created_at__year=current_year, created_at__month=current_month
-        ).aggregate(
-            total_sales=Sum(F('quantity') * F('variant__price'))
-        )
-        sales_this_month = sales_month_query['total_sales'] or 0
+        sales_this_month = paid_sales(**created_in_month(current_year, current_month), **restaurant_filter)
 
         # 3. Find Top Dish Today
-        top_dish_today_query = base_queryset.filter(created_at__date=today).values(
-            'variant__menu_item__name', 'variant__variant_name'
-        ).annotate(total_quantity=Sum('quantity')).order_by('-total_quantity').first()
-        
-        top_dish_today = "N/A"
-        if top_dish_today_query:
-            top_dish_today = f"{top_dish_today_query['variant__menu_item__name']} ({top_dish_today_query['variant__variant_name']})"
+        top_dish_today = top_dish(**created_on(today), **restaurant_filter)
 
         # 4. Find Top Dish This Month
-        top_dish_month_query = base_queryset.filter(
-            created_at__year=current_year, created_at__month=current_month
-        ).values(
-            'variant__menu_item__name', 'variant__variant_name'
-        ).annotate(total_quantity=Sum('quantity')).order_by('-total_quantity').first()
-
-        top_dish_this_month = "N/A"
-        if top_dish_month_query:
-            top_dish_this_month = f"{top_dish_month_query['variant__menu_item__name']} ({top_dish_month_query['variant__variant_name']})"
+        top_dish_this_month = top_dish(**created_in_month(current_year, current_month), **restaurant_filter)
 
         # Assemble the final data
         data = {
@@ -548,12 +645,25 @@ class RestaurantAnalyticsView(APIView):
 
         return Response(data, status=status.HTTP_200_OK)
 
+class ConnectedScreensView(APIView):
+    """
+    Number of kitchen, cashier and customer screens connected to the
+    logged-in Restaurant Admin's restaurant.
+    """
+    permission_classes = [IsAuthenticated, IsRestaurantAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(connected_screens(request.user.restaurant), status=status.HTTP_200_OK)
+
 class FrontendOrderCreateView(APIView):
     """
     Handles order creation based on the frontend team's spec.
     """
     permission_classes = [AllowAny] # This is a public endpoint
+    throttle_classes = [PublicTokenBucketThrottle]
+    throttle_scope = 'public_order_create'
 
+    @idempotent
     def post(self, request, restaurant_slug, *args, **kwargs):
         restaurant = get_object_or_404(Restaurant, slug=restaurant_slug)
 
@@ -564,49 +674,42 @@ class FrontendOrderCreateView(APIView):
         
         validated_data = serializer.validated_data
 
-        # 2. Create the Bill
-        bill = Bill.objects.create(
-            restaurant=restaurant,
-            customer_name=validated_data['customer_name'],
-            table_number=validated_data['table_number']
-        )
-        
-        # 3. Find variants and create OrderItems
-        order_items_for_broadcast = []
+        # Hold the order back if the kitchen is over capacity
+        capacity_response = check_kitchen_capacity(restaurant, accept_wait=request.data.get('accept_wait') is True)
+        if capacity_response is not None:
+            return capacity_response
+
+        # 2. Find the variants of the whole cart (only of this restaurant)
+        # in the process-local cache, before anything is written
         try:
-            for item_data in validated_data['items']:
-                variant = MenuItemVariant.objects.get(
-                    menu_item_id=item_data['menu_item_id'],
-                    variant_name=item_data['variant_name'],
-                    menu_item__restaurant=restaurant # Ensure it belongs to this restaurant
-                )
-                order_item = OrderItem.objects.create(
-                    bill=bill,
-                    variant=variant,
-                    quantity=item_data['quantity']
-                )
-                # Prepare item details for the real-time message
-                order_items_for_broadcast.append({
-                    'order_item_id': order_item.id, 'name': variant.menu_item.name,
-                    'variant': variant.variant_name, 'quantity': order_item.quantity
-                })
+            variants = resolve_variants(restaurant.id, [
+                (item_data['menu_item_id'], item_data['variant_name']) for item_data in validated_data['items']
+            ])
         except MenuItemVariant.DoesNotExist:
-            # If any item is invalid, delete the created bill and return an error
-            bill.delete()
             return Response({'error': 'An invalid menu item was submitted.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # 4. Broadcast to the Chef's Panel
-        websocket_message = {
-            'bill_id': bill.id, 'customer_name': bill.customer_name,
-            'table_number': bill.table_number, 'items': order_items_for_broadcast
-        }
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chef_notifications_{restaurant.slug}',
-            {'type': 'send.new.order', 'data': websocket_message}
-        )
+        # The bill, its items, its load and its order event commit together
+        with transaction.atomic():
+            # 3. Create the Bill
+            bill = Bill.objects.create(
+                restaurant=restaurant,
+                customer_name=validated_data['customer_name'],
+                table_number=validated_data['table_number']
+            )
+
+            # 4. Create the OrderItems in one insert
+            created_items = OrderItem.objects.bulk_create([
+                OrderItem(bill=bill, variant=variant.as_variant(), station_id=variant.station_id,
+                          quantity=item_data['quantity'])
+                for variant, item_data in zip(variants, validated_data['items'])
+            ])
+            kitchen_load.add_items(restaurant.id, created_items)
+
+            # 5. Broadcast to the Chef's Panel once committed
+            record_items_added(bill, created_items, 'bill_added')
+        record_new_items(restaurant.id, created_items)
         
-        # 5. Return the response in the format the frontend expects
+        # 6. Return the response in the format the frontend expects
         response_data = {
             "order_id": bill.id,
             "queue_number": bill.id # Using the bill ID as a simple queue number
@@ -622,25 +725,41 @@ class KitchenOrderListView(generics.ListAPIView):
     permission_classes = [IsAuthenticated, IsKitchenStaffOrAdmin]
 
     def get_queryset(self):
-        user = self.request.user
-        
         # Determine the restaurant from the logged-in user (Admin) or token (Chef)
-        if hasattr(user, 'restaurant') and user.restaurant:
-            restaurant = user.restaurant
-        else:
-            restaurant_id = self.request.auth.get('restaurant_id')
-            restaurant = get_object_or_404(Restaurant, id=restaurant_id)
+        restaurant = get_user_restaurant(self.request)
+
+        active_statuses = [OrderItem.OrderStatus.PENDING, OrderItem.OrderStatus.ACCEPTED]
+
+        # A station tablet asks for ?station=<slug> and only gets its own items
+        station_slug = self.request.query_params.get('station')
+        if station_slug:
+            station = get_object_or_404(Station, restaurant=restaurant, slug=station_slug)
+            # Both conditions in one filter() so they apply to the same item,
+            # which lets the database use the (station, status) index
+            self.item_filter = {'station': station}
+            return Bill.objects.filter(
+                restaurant=restaurant,
+                payment_status=Bill.PaymentStatus.PENDING,
+            ).filter(
+                order_items__station=station,
+                order_items__status__in=active_statuses
+            ).distinct().order_by('created_at').prefetch_related(
+                Prefetch('order_items', queryset=OrderItem.objects.filter(station=station).select_related('variant__menu_item'))
+            )
 
         # Fetch unpaid bills that have at least one item that is not yet completed
         return Bill.objects.filter(
             restaurant=restaurant,
             payment_status=Bill.PaymentStatus.PENDING,
-            order_items__status__in=[
-                OrderItem.OrderStatus.PENDING,
-                OrderItem.OrderStatus.ACCEPTED
-            ]
+            order_items__status__in=active_statuses
         ).distinct().order_by('created_at').prefetch_related('order_items__variant__menu_item')
 
+    def list(self, request, *args, **kwargs):
+        # Flat rows instead of KitchenOrderSerializer; the output is the same
+        self.item_filter = None
+        bills = self.get_queryset()
+        return Response(fast_serializers.kitchen_orders(bills, self.item_filter))
+
 class AdminOrderReportView(generics.ListAPIView):
     """
     Provides a historical order report for the Restaurant Admin,
@@ -649,34 +768,47 @@ class AdminOrderReportView(generics.ListAPIView):
     serializer_class = RestaurantOrderListSerializer # We can reuse our detailed order serializer
     permission_classes = [IsAuthenticated]
 
-    def get_queryset(self):
-        user = self.request.user
-        restaurant = user.restaurant
-        
+    def get_period_filter(self):
         # Get the 'period' from the URL, e.g., /.../?period=week
         period = self.request.query_params.get('period', 'today').lower()
         
         today = timezone.now().date()
-        queryset = Bill.objects.filter(restaurant=restaurant)
 
         if period == 'today':
-            queryset = queryset.filter(created_at__date=today)
+            return {'created_at__date': today}
         elif period == 'week':
             start_of_week = today - timedelta(days=7)
-            queryset = queryset.filter(created_at__date__gte=start_of_week)
+            return {'created_at__date__gte': start_of_week}
         elif period == 'month':
-            queryset = queryset.filter(created_at__year=today.year, created_at__month=today.month)
+            return {'created_at__year': today.year, 'created_at__month': today.month}
         elif period == 'year':
-            queryset = queryset.filter(created_at__year=today.year)
-        
+            return {'created_at__year': today.year}
+        return {}
+
+    def get_queryset(self):
+        user = self.request.user
+        restaurant = user.restaurant
+        queryset = Bill.objects.filter(restaurant=restaurant, **self.get_period_filter())
         return queryset.order_by('-created_at')
 
+    def get_archived_queryset(self):
+        return ArchivedBill.objects.filter(
+            restaurant=self.request.user.restaurant, **self.get_period_filter()
+        ).order_by('-created_at')
+
+    def list(self, request, *args, **kwargs):
+        # Flat rows instead of RestaurantOrderListSerializer; the output is the same
+        return Response(fast_serializers.restaurant_orders(self.get_queryset(), self.get_archived_queryset()))
+
 class AddItemsToOrderView(APIView):
     """
     Handles a customer adding new items to their own existing, pending order.
     """
     permission_classes = [AllowAny] # This can be public as long as the bill ID is known
+    throttle_classes = [PublicTokenBucketThrottle]
+    throttle_scope = 'public_order_add'
 
+    @idempotent
     def post(self, request, bill_id, *args, **kwargs):
         print(f"=== DEBUG: Received data ===")
         print(f"Bill ID: {bill_id}")
@@ -700,44 +832,30 @@ class AddItemsToOrderView(APIView):
         
         print(f"Validation passed. Validated data: {item_serializer.validated_data}")
 
-        new_items_data = item_serializer.validated_data
-        order_items_for_broadcast = []
+        capacity_response = check_kitchen_capacity(bill.restaurant, accept_wait=request.data.get('accept_wait') is True)
+        if capacity_response is not None:
+            return capacity_response
 
-        # Create the new OrderItem objects and link them to the existing bill
+        new_items_data = item_serializer.validated_data
         try:
-            for item_data in new_items_data:
-                variant = MenuItemVariant.objects.get(
-                    menu_item_id=item_data['menu_item_id'],
-                    variant_name=item_data['variant_name'],
-                    menu_item__restaurant=bill.restaurant
-                )
-                order_item = OrderItem.objects.create(
-                    bill=bill,
-                    variant=variant,
-                    quantity=item_data['quantity']
-                )
-                # Prepare details of the new items for the WebSocket message
-                order_items_for_broadcast.append({
-                    'order_item_id': order_item.id, 
-                    'name': variant.menu_item.name,
-                    'variant': variant.variant_name, 
-                    'quantity': order_item.quantity
-                })
+            variants = resolve_variants(bill.restaurant_id, [
+                (item_data['menu_item_id'], item_data['variant_name']) for item_data in new_items_data
+            ])
         except MenuItemVariant.DoesNotExist:
             return Response({'error': 'An invalid menu item was submitted.'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Broadcast ONLY the new items to the correct restaurant's Chef Panel
-        websocket_message = {
-            'bill_id': bill.id, 
-            'customer_name': bill.customer_name,
-            'table_number': bill.table_number, 
-            'items': order_items_for_broadcast
-        }
-        channel_layer = get_channel_layer()
-        async_to_sync(channel_layer.group_send)(
-            f'chef_notifications_{bill.restaurant.slug}',
-            {'type': 'send.new.order', 'data': websocket_message}
-        )
+        # Create the new OrderItem objects and link them to the existing bill
+        with transaction.atomic():
+            created_items = OrderItem.objects.bulk_create([
+                OrderItem(bill=bill, variant=variant.as_variant(), station_id=variant.station_id,
+                          quantity=item_data['quantity'])
+                for variant, item_data in zip(variants, new_items_data)
+            ])
+            kitchen_load.add_items(bill.restaurant_id, created_items)
+
+            # Broadcast ONLY the new items to the correct restaurant's Chef Panel
+            record_items_added(bill, created_items, 'bill_updated')
+        record_new_items(bill.restaurant_id, created_items)
         
         # Return the entire updated order so the frontend can refresh its state
         updated_bill_serializer = KitchenOrderSerializer(bill)
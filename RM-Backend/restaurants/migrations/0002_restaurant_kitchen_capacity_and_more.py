@@ -0,0 +1,28 @@
+# Generated by Django 5.2.5 on 2026-10-19 07:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('restaurants', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='restaurant',
+            name='kitchen_capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Outstanding prep minutes or items the kitchen accepts. Leave empty for no limit.', null=True),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='kitchen_capacity_unit',
+            field=models.CharField(choices=[('MINUTES', 'Prep minutes'), ('ITEMS', 'Items')], default='MINUTES', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='restaurant',
+            name='kitchen_overload_policy',
+            field=models.CharField(choices=[('QUOTE', 'Quote a wait'), ('REJECT', 'Reject')], default='QUOTE', max_length=20),
+        ),
+    ]
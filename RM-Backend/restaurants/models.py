@@ -19,6 +19,25 @@ class Restaurant(models.Model):
         help_text="Geofence radius in meters"
     )
 
+    # Kitchen capacity used to hold back new orders when the kitchen is full
+    class CapacityUnit(models.TextChoices):
+        MINUTES = 'MINUTES', 'Prep minutes'
+        ITEMS = 'ITEMS', 'Items'
+    class OverloadPolicy(models.TextChoices):
+        QUOTE = 'QUOTE', 'Quote a wait'
+        REJECT = 'REJECT', 'Reject'
+    kitchen_capacity = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Outstanding prep minutes or items the kitchen accepts. Leave empty for no limit."
+    )
+    kitchen_capacity_unit = models.CharField(
+        max_length=20, choices=CapacityUnit.choices, default=CapacityUnit.MINUTES
+    )
+    kitchen_overload_policy = models.CharField(
+        max_length=20, choices=OverloadPolicy.choices, default=OverloadPolicy.QUOTE
+    )
+
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
@@ -0,0 +1,56 @@
+# restromanager/admin_mixins.py
+
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models.query import QuerySet
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that takes the row count from the PostgreSQL planner estimate
+    instead of running COUNT(*) over the whole table. Exact counts are still
+    used below EXACT_COUNT_BELOW rows, where they are cheap, and on other
+    databases.
+    """
+    EXACT_COUNT_BELOW = 10000
+
+    @cached_property
+    def count(self):
+        estimate = self.estimated_count()
+        if estimate is None or estimate < self.EXACT_COUNT_BELOW:
+            return super().count
+        return estimate
+
+    def estimated_count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet) or connections[queryset.db].vendor != 'postgresql':
+            return None
+        plan = json.loads(queryset.order_by().explain(format='json'))
+        # Depending on the driver, the plan may or may not be wrapped in a list
+        if isinstance(plan, list):
+            plan = plan[0]
+        return int(plan['Plan']['Plan Rows'])
+
+
+class LargeTableAdminMixin:
+    """
+    Changelist settings for admins of tables that grow without bound.
+
+    Rows are loaded with their list_select_related and list_prefetch_related
+    relations, the page count comes from EstimatedCountPaginator, and the
+    unfiltered total ("N total") is not counted at all. Admins using this
+    should also use autocomplete_fields or raw_id_fields for foreign keys,
+    so the change form does not render a <select> with every row.
+    """
+    show_full_result_count = False
+    paginator = EstimatedCountPaginator
+    list_prefetch_related = ()
+
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        if self.list_prefetch_related:
+            qs = qs.prefetch_related(*self.list_prefetch_related)
+        return qs
@@ -0,0 +1,271 @@
+# restromanager/admission.py
+
+import asyncio
+import threading
+from collections import deque
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import JsonResponse
+
+# Priority classes, most important first
+STAFF_WRITE = 'staff_write'
+STAFF_READ = 'staff_read'
+PUBLIC_WRITE = 'public_write'
+PUBLIC_READ = 'public_read'
+PRIORITY_ORDER = (STAFF_WRITE, STAFF_READ, PUBLIC_WRITE, PUBLIC_READ)
+STAFF_CLASSES = (STAFF_WRITE, STAFF_READ)
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+DEFAULTS = {
+    'ENABLED': True,
+    # Requests outside these prefixes (admin, static files) are not limited
+    'CONTROLLED_PATH_PREFIXES': ['/api/'],
+    # Anonymous customer endpoints. Everything else under /api/ is staff,
+    # for requests that carry a valid access token
+    'PUBLIC_PATH_PREFIXES': ['/api/restaurants/', '/api/orders/'],
+    # class -> (max concurrent requests, max queued requests)
+    'LIMITS': {
+        STAFF_WRITE: (16, 64),
+        STAFF_READ: (16, 32),
+        PUBLIC_WRITE: (8, 16),
+        PUBLIC_READ: (8, 8),
+    },
+    # How long a queued request waits for a slot before it is shed
+    'QUEUE_TIMEOUT': 5.0,
+    'RETRY_AFTER': 2,
+}
+
+
+def get_admission_settings():
+    return {**DEFAULTS, **getattr(settings, 'ADMISSION_CONTROL', {})}
+
+
+class _Waiter:
+    """A queued request. `wake()` may be called from any thread."""
+
+    def __init__(self, loop=None):
+        self.granted = False
+        self.loop = loop
+        if loop is None:
+            self.event = threading.Event()
+        else:
+            self.future = loop.create_future()
+
+    def wake(self):
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(self._resolve)
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(True)
+
+
+class _ClassState:
+    def __init__(self, limit, max_queue):
+        self.limit = limit
+        self.max_queue = max_queue
+        self.active = 0
+        self.queue = deque()
+        self.admitted = 0
+        self.shed = 0
+
+
+class AdmissionController:
+    """
+    Per-process concurrency limits with a bounded queue for every priority
+    class. Public requests are shed as soon as a staff class has to queue,
+    so the kitchen and the cashier keep their worker time under overload.
+    """
+
+    def __init__(self, limits):
+        self._lock = threading.Lock()
+        self._classes = {name: _ClassState(*limits[name]) for name in PRIORITY_ORDER}
+
+    def _staff_is_queueing(self):
+        return any(self._classes[name].queue for name in STAFF_CLASSES)
+
+    def _try_enter(self, name, loop=None):
+        """
+        Returns True when admitted, None when shed, or a _Waiter to wait on.
+        """
+        state = self._classes[name]
+        with self._lock:
+            if name not in STAFF_CLASSES and self._staff_is_queueing():
+                state.shed += 1
+                return None
+            if state.active < state.limit and not state.queue:
+                state.active += 1
+                state.admitted += 1
+                return True
+            if len(state.queue) >= state.max_queue:
+                state.shed += 1
+                return None
+            waiter = _Waiter(loop)
+            state.queue.append(waiter)
+            return waiter
+
+    def _give_up(self, name, waiter):
+        """
+        Called when a waiter timed out. Returns True if a slot was handed to
+        it in the meantime, in which case the request goes ahead after all.
+        """
+        state = self._classes[name]
+        with self._lock:
+            if waiter.granted:
+                return True
+            state.queue.remove(waiter)
+            state.shed += 1
+            return False
+
+    def enter(self, name, timeout):
+        waiter = self._try_enter(name)
+        if waiter is True or waiter is None:
+            return bool(waiter)
+        if waiter.event.wait(timeout):
+            return True
+        return self._give_up(name, waiter)
+
+    async def aenter(self, name, timeout):
+        waiter = self._try_enter(name, asyncio.get_running_loop())
+        if waiter is True or waiter is None:
+            return bool(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return self._give_up(name, waiter)
+        except asyncio.CancelledError:
+            # The client went away while queued: take the waiter out of the
+            # queue, or hand back the slot it was given in the meantime
+            if self._give_up(name, waiter):
+                self.leave(name)
+            raise
+
+    def leave(self, name):
+        state = self._classes[name]
+        with self._lock:
+            if state.queue:
+                # Hand the slot straight to the oldest waiter of this class
+                waiter = state.queue.popleft()
+                waiter.granted = True
+                state.admitted += 1
+                waiter.wake()
+            else:
+                state.active -= 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                name: {
+                    'active': state.active,
+                    'queue_depth': len(state.queue),
+                    'limit': state.limit,
+                    'max_queue': state.max_queue,
+                    'admitted': state.admitted,
+                    'shed': state.shed,
+                }
+                for name, state in self._classes.items()
+            }
+
+
+def has_valid_access_token(request):
+    """
+    Whether the request sends a bearer access token with a valid signature
+    that has not expired. No database query: the user is looked up later,
+    by the view's authentication.
+    """
+    from rest_framework_simplejwt.exceptions import TokenError
+    from rest_framework_simplejwt.settings import api_settings
+    from rest_framework_simplejwt.tokens import AccessToken
+
+    scheme, _, raw_token = request.headers.get('Authorization', '').partition(' ')
+    if scheme not in api_settings.AUTH_HEADER_TYPES or not raw_token.strip():
+        return False
+    try:
+        AccessToken(raw_token.strip())
+    except TokenError:
+        return False
+    return True
+
+
+# The controller of this worker process, created by the middleware
+controller = None
+
+
+def get_admission_stats():
+    if controller is None:
+        return {'enabled': False, 'classes': {}}
+    return {'enabled': True, 'classes': controller.stats()}
+
+
+class AdmissionControlMiddleware:
+    """
+    Sorts /api/ requests into priority classes (staff writes > staff reads >
+    public writes > public reads), limits how many of each run at once and
+    answers 503 with Retry-After instead of queueing without bound. Requests
+    without a valid access token are public wherever they go, so a login
+    flood or bad tokens cannot take the staff slots.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        global controller
+        config = get_admission_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.controlled_prefixes = tuple(config['CONTROLLED_PATH_PREFIXES'])
+        self.public_prefixes = tuple(config['PUBLIC_PATH_PREFIXES'])
+        self.queue_timeout = config['QUEUE_TIMEOUT']
+        self.retry_after = config['RETRY_AFTER']
+        limits = {**DEFAULTS['LIMITS'], **config['LIMITS']}
+        controller = self.controller = AdmissionController(limits)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def classify(self, request):
+        path = request.path
+        if not path.startswith(self.controlled_prefixes):
+            return None
+        is_read = request.method in SAFE_METHODS
+        if path.startswith(self.public_prefixes) or not has_valid_access_token(request):
+            return PUBLIC_READ if is_read else PUBLIC_WRITE
+        return STAFF_READ if is_read else STAFF_WRITE
+
+    def shed_response(self):
+        response = JsonResponse(
+            {'error': 'The server is busy, please try again shortly.'},
+            status=503
+        )
+        response['Retry-After'] = str(self.retry_after)
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        name = self.classify(request)
+        if name is None:
+            return self.get_response(request)
+        if not self.controller.enter(name, self.queue_timeout):
+            return self.shed_response()
+        try:
+            return self.get_response(request)
+        finally:
+            self.controller.leave(name)
+
+    async def __acall__(self, request):
+        name = self.classify(request)
+        if name is None:
+            return await self.get_response(request)
+        if not await self.controller.aenter(name, self.queue_timeout):
+            return self.shed_response()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.controller.leave(name)
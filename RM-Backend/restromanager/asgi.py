@@ -8,18 +8,21 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'restromanager.settings')
 django_asgi_app = get_asgi_application()
 
+from django.conf import settings
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.auth import AuthMiddlewareStack
 import menu.routing
 
+websocket_router = URLRouter(menu.routing.websocket_urlpatterns)
+# The API-only profile (restromanager.settings_api) has no session app, and
+# the consumers do not read scope['user']
+if 'django.contrib.sessions' in settings.INSTALLED_APPS:
+    websocket_router = AuthMiddlewareStack(websocket_router)
+
 application = ProtocolTypeRouter({
     # Django's ASGI application to handle traditional HTTP requests
     "http": django_asgi_app,
 
     # WebSocket chat handler
-    "websocket": AuthMiddlewareStack(
-        URLRouter(
-            menu.routing.websocket_urlpatterns
-        )
-    ),
+    "websocket": websocket_router,
 })
\ No newline at end of file
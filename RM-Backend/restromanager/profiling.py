@@ -0,0 +1,205 @@
+# restromanager/profiling.py
+
+import cProfile
+import json
+import logging
+import pstats
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import ExitStack
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    # An ADMIN (or superuser) sending this header gets the request profiled
+    'HEADER': 'X-Profile',
+    # Fraction of all requests profiled regardless of who sends them
+    'SAMPLE_RATE': 0.0,
+    'DIRECTORY': Path(settings.BASE_DIR) / 'profiles',
+    # Oldest profiles are deleted once the directory grows past this
+    'MAX_TOTAL_BYTES': 50 * 1024 * 1024,
+    'TOP_FUNCTIONS': 25,
+}
+
+
+def get_profiling_settings():
+    return {**DEFAULTS, **getattr(settings, 'PROFILING', {})}
+
+
+def is_profiling_admin(request):
+    """
+    Whether the request comes from a restaurant ADMIN or a superuser. The
+    API authenticates with JWT inside the views, so the token is checked
+    here; only called for requests that asked to be profiled.
+    """
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        from rest_framework.exceptions import AuthenticationFailed
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+
+        try:
+            authenticated = JWTAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        if authenticated is None:
+            return False
+        user = authenticated[0]
+    return user.is_superuser or getattr(user, 'role', None) == 'ADMIN'
+
+
+class QueryRecorder:
+    """execute_wrapper that keeps every statement of a request with its time."""
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'alias': context['connection'].alias,
+                'sql': sql,
+                'params': repr(params),
+                'many': many,
+                'duration_ms': round((time.perf_counter() - start) * 1000, 3),
+            })
+
+    def summary(self):
+        # The same statement with the same parameters run more than once
+        runs = Counter((query['sql'], query['params']) for query in self.queries)
+        durations = Counter()
+        for query in self.queries:
+            durations[query['sql'], query['params']] += query['duration_ms']
+        return {
+            'query_count': len(self.queries),
+            'query_time_ms': round(sum(query['duration_ms'] for query in self.queries), 3),
+            'duplicate_queries': [
+                {'sql': sql, 'params': params, 'count': count, 'total_ms': round(durations[sql, params], 3)}
+                for (sql, params), count in runs.most_common() if count > 1
+            ],
+            'queries': self.queries,
+        }
+
+
+def top_functions(profile, limit):
+    stats = pstats.Stats(profile)
+    stats.sort_stats(pstats.SortKey.CUMULATIVE)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, calls, own_time, cumulative_time, _callers = stats.stats[func]
+        rows.append({
+            'function': pstats.func_std_string(func),
+            'calls': calls,
+            'primitive_calls': primitive_calls,
+            'own_ms': round(own_time * 1000, 3),
+            'cumulative_ms': round(cumulative_time * 1000, 3),
+        })
+    return rows
+
+
+def enforce_retention(directory, max_total_bytes):
+    """Deletes the oldest profiles until the directory fits in max_total_bytes."""
+    files = sorted(
+        (path for path in directory.iterdir() if path.suffix in ('.prof', '.json')),
+        key=lambda path: path.stat().st_mtime,
+    )
+    total = sum(path.stat().st_size for path in files)
+    for path in files:
+        if total <= max_total_bytes:
+            break
+        total -= path.stat().st_size
+        path.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware:
+    """
+    Runs a request under cProfile, with every SQL statement it executes,
+    when an ADMIN sends the profiling header or the request is sampled,
+    and writes <id>.prof (for pstats / snakeviz) and <id>.json (top
+    functions, query count, duplicate queries) to DIRECTORY. The id is
+    returned in the X-Profile-Id header. Removed from the stack when
+    PROFILING['ENABLED'] is off.
+    """
+    sync_capable = True
+    async_capable = False
+
+    # One profiled request at a time per process: the profiler only sees
+    # its own thread, and concurrent profiles would slow the worker down
+    _busy = threading.Lock()
+
+    def __init__(self, get_response):
+        config = get_profiling_settings()
+        if not config['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = config['HEADER']
+        self.sample_rate = config['SAMPLE_RATE']
+        self.directory = Path(config['DIRECTORY'])
+        self.max_total_bytes = config['MAX_TOTAL_BYTES']
+        self.top_functions = config['TOP_FUNCTIONS']
+
+    def wants_profile(self, request):
+        if request.headers.get(self.header):
+            return is_profiling_admin(request)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def __call__(self, request):
+        if not self.wants_profile(request):
+            return self.get_response(request)
+        if not self._busy.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            return self.profile(request)
+        finally:
+            self._busy.release()
+
+    def profile(self, request):
+        recorder = QueryRecorder()
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            profile.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profile.disable()
+        duration_ms = round((time.perf_counter() - start) * 1000, 3)
+
+        profile_id = '{}-{}-{}-{}'.format(
+            time.strftime('%Y%m%d-%H%M%S'), uuid.uuid4().hex[:6], request.method.lower(),
+            re.sub(r'[^a-z0-9]+', '-', request.path.lower()).strip('-')[:80] or 'root',
+        )
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            profile.dump_stats(self.directory / f'{profile_id}.prof')
+            summary = {
+                'id': profile_id,
+                'method': request.method,
+                'path': request.get_full_path(),
+                'status': response.status_code,
+                'duration_ms': duration_ms,
+                'top_functions': top_functions(profile, self.top_functions),
+                **recorder.summary(),
+            }
+            (self.directory / f'{profile_id}.json').write_text(json.dumps(summary, indent=2, default=str))
+            enforce_retention(self.directory, self.max_total_bytes)
+        except OSError:
+            # A full or read-only disk must not fail the request
+            logger.exception("Could not write profile %s", profile_id)
+            return response
+        response['X-Profile-Id'] = profile_id
+        return response
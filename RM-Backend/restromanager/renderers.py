@@ -0,0 +1,120 @@
+# restromanager/renderers.py
+
+import json
+import re
+import secrets
+
+from rest_framework.compat import INDENT_SEPARATORS, LONG_SEPARATORS, SHORT_SEPARATORS
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is used without it
+    orjson = None
+
+
+class JSONFragment(bytes):
+    """
+    Already-encoded JSON (e.g. a cached menu item) that FastJSONRenderer
+    copies into the response as it is, without decoding or re-encoding it.
+    """
+
+
+class _FragmentCollector:
+    """
+    Replaces fragments with placeholder strings while the data is encoded,
+    then splices the fragment bytes into the encoded output.
+    """
+
+    def __init__(self):
+        self.fragments = []
+        self.token = secrets.token_hex(4)
+
+    def placeholder(self, fragment):
+        self.fragments.append(fragment)
+        # NUL is always written as \u0000, so no real string can look like this
+        return f'\x00{self.token}:{len(self.fragments) - 1}\x00'
+
+    def splice(self, content):
+        if not self.fragments:
+            return content
+        pattern = re.compile(rb'"\\u0000' + self.token.encode() + rb':(\d+)\\u0000"')
+        return pattern.sub(lambda match: self.fragments[int(match.group(1))], content)
+
+
+class _FragmentEncoder(encoders.JSONEncoder):
+    def __init__(self, *args, collector=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.collector = collector
+
+    def default(self, obj):
+        if isinstance(obj, JSONFragment):
+            return self.collector.placeholder(obj)
+        return super().default(obj)
+
+
+def _is_fragment_list(data):
+    return isinstance(data, list) and all(isinstance(item, JSONFragment) for item in data)
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    Drop-in replacement for DRF's JSONRenderer with the same output.
+
+    Compact responses are encoded with orjson when it is installed, using
+    DRF's own rules for Decimal, datetime and the other types orjson does
+    not handle the same way. Indented responses (the browsable API) and
+    installs without orjson use the stdlib encoder. Either way, JSONFragment
+    values in the data are spliced in as they are.
+    """
+    encoder_class = _FragmentEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        indent = self.get_indent(accepted_media_type, renderer_context)
+        if indent is None and self.compact and _is_fragment_list(data):
+            # e.g. the cached public menu: nothing to encode at all
+            return b'[' + b','.join(data) + b']'
+        collector = _FragmentCollector()
+
+        # orjson only writes compact UTF-8
+        if orjson is not None and indent is None and self.compact and not self.ensure_ascii:
+            content = self._render_orjson(data, collector)
+        else:
+            content = self._render_stdlib(data, indent, collector)
+        return collector.splice(content)
+
+    def _render_orjson(self, data, collector):
+        drf_encoder = _FragmentEncoder(collector=collector)
+        content = orjson.dumps(
+            data,
+            default=drf_encoder.default,
+            # DRF formats datetimes differently (milliseconds, 'Z' for UTC)
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+        )
+        # Same escaping as JSONRenderer, for responses embedded in <script>
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+    def _render_stdlib(self, data, indent, collector):
+        if indent is None:
+            separators = SHORT_SEPARATORS if self.compact else LONG_SEPARATORS
+        else:
+            separators = INDENT_SEPARATORS
+        content = json.dumps(
+            data, cls=self.encoder_class, collector=collector,
+            indent=indent, ensure_ascii=self.ensure_ascii,
+            allow_nan=not self.strict, separators=separators
+        )
+        content = content.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029')
+        return content.encode()
+
+
+def encode_fragment(data):
+    """Encodes data once, for reuse as a JSONFragment in later responses."""
+    return JSONFragment(FastJSONRenderer().render(data))
+
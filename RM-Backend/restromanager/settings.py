@@ -1,5 +1,6 @@
 import os
 from pathlib import Path
+from corsheaders.defaults import default_headers
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -27,6 +28,8 @@ CORS_ALLOWED_ORIGINS = [
     "http://localhost:5174", # Vite development server (alternate port)
     "http://127.0.0.1:5174", # Vite development server alternative URL (alternate port)
 ]
+# Allow clients to send the Idempotency-Key header on order requests
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
 
 
 # Application definition
@@ -44,6 +47,7 @@ INSTALLED_APPS = [
     'users',
     'menu',
     'restaurants',
+    'tasks',
     'rest_framework',
     'rest_framework_simplejwt',
     'drf_spectacular',     # for genrating api documantaion 
@@ -52,6 +56,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # First, so that overload is shed before any other work is done
+    'restromanager.admission.AdmissionControlMiddleware',
+    'restromanager.slow_queries.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -60,6 +67,8 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Last, so the profile covers the view and not the other middleware
+    'restromanager.profiling.ProfilingMiddleware',
 
 ]
 
@@ -95,6 +104,16 @@ CHANNEL_LAYERS = {
 }
 
 
+# Shared cache for all workers (throttling buckets and other counters).
+# Uses a separate Redis database from the channel layer.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://127.0.0.1:6380/1',
+    }
+}
+
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
@@ -155,12 +174,137 @@ AUTH_USER_MODEL = 'users.StaffUser'
 # Add this entire dictionary at the bottom of the file
 REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Same output as DRF's JSONRenderer; uses orjson when it is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'restromanager.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework_simplejwt.authentication.JWTAuthentication',
     ],
+    # Reverse proxies in front of the app. Throttles key anonymous clients
+    # on the address the outermost of them saw; with 0 X-Forwarded-For is
+    # ignored, since clients can put anything in it.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', '0')),
+    # Token-bucket budgets for the public customer endpoints (menu.throttling).
+    # '60/min' means a burst of 60 requests, refilled at one per second.
+    'DEFAULT_THROTTLE_RATES': {
+        'public_menu': '60/min',
+        # Search-as-you-type sends a request per keystroke
+        'public_menu_search': '120/min',
+        'public_order_create': '10/min',
+        'public_order_status': '120/min',
+        'public_order_add': '20/min',
+    },
 }
 
-# restromanager/settings.py
+# Priority-aware admission control (restromanager.admission). Limits are per
+# worker process: class -> (max concurrent requests, max queued requests).
+ADMISSION_CONTROL = {
+    'ENABLED': True,
+    'LIMITS': {
+        'staff_write': (16, 64),
+        'staff_read': (16, 32),
+        'public_write': (8, 16),
+        'public_read': (8, 8),
+    },
+    'QUEUE_TIMEOUT': 5.0,
+    'RETRY_AFTER': 2,
+}
+
+# In-memory kitchen queue used for live ETAs (menu.kitchen_queue)
+KITCHEN_QUEUE = {
+    'PARALLEL_COOKS': 3,
+    'RESYNC_SECONDS': 300,
+}
+
+# WebSocket presence registry (menu.presence): connection counts per group,
+# kept in the cache so publishers can skip groups nobody is connected to
+WS_PRESENCE = {
+    'ENABLED': True,
+    'HEARTBEAT_SECONDS': 30,
+}
+
+# Per-connection outbound queues of WebSocket clients; every client acks
+# the frames it receives (menu.outbound)
+WS_OUTBOUND = {
+    'ACK_WINDOW': 20,
+    'HIGH_WATER': 50,
+    'STALL_SECONDS': 30,
+    'MAX_QUEUE': 200,
+}
+
+# Customer WebSocket connections that send nothing (no ack or ping) for this
+# long are closed, so abandoned phones do not keep their bill group alive
+WS_CUSTOMER_IDLE_SECONDS = 60 * 60
+
+# Per-process menu search index (menu.search)
+MENU_SEARCH = {
+    'MAX_AGE_SECONDS': 600,
+    'POPULARITY_DAYS': 30,
+    'RESULT_LIMIT': 20,
+}
+
+# Background tasks (tasks.runner), run by `python manage.py run_workers`.
+# With EAGER they run inline in the request instead, e.g. without a worker
+TASKS = {
+    'EAGER': False,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_SECONDS': 2,
+    'POLL_SECONDS': 0.25,
+}
+
+# Order event outbox (menu.outbox): events published per relay batch, and
+# the most events returned to a screen catching up
+ORDER_EVENTS = {
+    'BATCH_SIZE': 100,
+    'REPLAY_LIMIT': 500,
+}
+
+# Per-restaurant platform analytics (menu.platform_analytics), aggregated
+# by a bounded thread pool, one database connection per worker
+PLATFORM_ANALYTICS = {
+    'MAX_WORKERS': 4,
+    'CACHE_TTL_SECONDS': 300,
+    'TOP_DISHES': 3,
+}
+
+# Process-local cache of menu variants used to resolve order lines
+# (menu.variant_cache): restaurants kept per process before the least
+# recently ordered from is dropped
+VARIANT_CACHE = {
+    'MAX_RESTAURANTS': 500,
+}
+
+# Opt-in request profiling (restromanager.profiling). When enabled, an
+# ADMIN sending "X-Profile: 1" (or a SAMPLE_RATE fraction of all requests)
+# is run under cProfile with its SQL recorded; the .prof and .json files
+# go to DIRECTORY, whose oldest files are deleted past MAX_TOTAL_BYTES.
+PROFILING = {
+    'ENABLED': os.environ.get('PROFILING_ENABLED') == '1',
+    'SAMPLE_RATE': 0.0,
+    'DIRECTORY': BASE_DIR / 'profiles',
+    'MAX_TOTAL_BYTES': 50 * 1024 * 1024,
+}
+
+# Slow query log (restromanager.slow_queries): statements slower than
+# THRESHOLD_MS, with their view and project call site, kept in memory and
+# appended to LOG_FILE (rotated at MAX_FILE_BYTES). Aggregate it with
+# python manage.py slow_query_report.
+SLOW_QUERIES = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'LOG_FILE': BASE_DIR / 'logs' / 'slow_queries.jsonl',
+    'MAX_FILE_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+}
+
+# OpenAPI schema built at deploy time (python manage.py spectacular --file
+# openapi-schema.yml) and served as a file by /api/schema/
+OPENAPI_SCHEMA_FILE = BASE_DIR / 'openapi-schema.yml'
+
+# How long a stored order response is replayed for a repeated Idempotency-Key
+IDEMPOTENCY_KEY_TTL_SECONDS = 24 * 60 * 60
 
 # restromanager/settings.py
 
@@ -0,0 +1,59 @@
+# restromanager/settings_api.py
+#
+# Profile for the workers that only serve /api/ and the WebSockets:
+#
+#     DJANGO_SETTINGS_MODULE=restromanager.settings_api daphne restromanager.asgi:application
+#
+# The admin (with jazzmin), sessions, messages, CSRF and drf_spectacular are
+# not loaded. Every API view authenticates with JWT, so none of them need the
+# session or CSRF middleware. The admin and the API docs keep running on
+# workers with the full restromanager.settings.
+#
+# The OpenAPI schema is not generated per request here. It is built once at
+# deploy time, with the full settings, into OPENAPI_SCHEMA_FILE:
+#
+#     python manage.py spectacular --file openapi-schema.yml
+
+from .settings import *  # noqa: F401,F403
+from .settings import INSTALLED_APPS, MIDDLEWARE, REST_FRAMEWORK, TEMPLATES
+
+API_EXCLUDED_APPS = [
+    'jazzmin',
+    'django.contrib.admin',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'drf_spectacular',
+]
+
+API_EXCLUDED_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in API_EXCLUDED_APPS]
+
+MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in API_EXCLUDED_MIDDLEWARE]
+
+ROOT_URLCONF = 'restromanager.urls_api'
+
+TEMPLATES = [{
+    **TEMPLATES[0],
+    'OPTIONS': {
+        **TEMPLATES[0]['OPTIONS'],
+        'context_processors': [
+            processor for processor in TEMPLATES[0]['OPTIONS']['context_processors']
+            if processor != 'django.contrib.messages.context_processors.messages'
+        ],
+    },
+}]
+
+REST_FRAMEWORK = {
+    **{key: value for key, value in REST_FRAMEWORK.items() if key != 'DEFAULT_SCHEMA_CLASS'},
+    # No browsable API: it renders forms through the template engine and
+    # expects the session login of the admin
+    'DEFAULT_RENDERER_CLASSES': ['restromanager.renderers.FastJSONRenderer'],
+}
@@ -0,0 +1,200 @@
+# restromanager/slow_queries.py
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.signals import setting_changed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+logger = logging.getLogger(__name__)
+
+# Every database connection gets an execute_wrapper that times its
+# statements. Only the ones over THRESHOLD_MS pay for more: their SQL is
+# normalized into a fingerprint and the stack is walked up to the first
+# frame of project code, and the record goes to an in-process ring buffer
+# and to a rotating JSONL file that slow_query_report aggregates.
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    # Records kept in memory per process (recent_slow_queries())
+    'BUFFER_SIZE': 500,
+    # None keeps the records in memory only
+    'LOG_FILE': Path(settings.BASE_DIR) / 'logs' / 'slow_queries.jsonl',
+    'MAX_FILE_BYTES': 10 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+}
+
+_config = None
+_buffer = deque(maxlen=DEFAULTS['BUFFER_SIZE'])
+_file_handler = None
+_lock = threading.Lock()
+_current_request = contextvars.ContextVar('slow_query_request', default=None)
+
+_THIS_FILE = os.path.normcase(os.path.abspath(__file__))
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_IN_LIST = re.compile(r'\bIN \(\s*\?(?:\s*,\s*\?)*\s*\)', re.IGNORECASE)
+_SPACE = re.compile(r'\s+')
+
+
+def get_slow_query_settings():
+    global _config, _buffer
+    if _config is None:
+        config = {**DEFAULTS, **getattr(settings, 'SLOW_QUERIES', {})}
+        if _buffer.maxlen != config['BUFFER_SIZE']:
+            _buffer = deque(_buffer, maxlen=config['BUFFER_SIZE'])
+        _config = config
+    return _config
+
+
+@receiver(setting_changed)
+def _reset_config(setting, **kwargs):
+    global _config, _file_handler
+    if setting != 'SLOW_QUERIES':
+        return
+    with _lock:
+        _config = None
+        if _file_handler is not None:
+            _file_handler.close()
+            _file_handler = None
+
+
+def normalize_sql(sql):
+    """The statement with its literals and parameters replaced by '?'."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql.replace('%s', '?'))
+    sql = _IN_LIST.sub('IN (...)', sql)
+    return _SPACE.sub(' ', sql).strip()
+
+
+def fingerprint(normalized_sql):
+    return hashlib.sha1(normalized_sql.encode()).hexdigest()[:12]
+
+
+def _project_call_site():
+    """'menu/views.py:123 in get_queryset' for the first frame of project code."""
+    root = os.path.normcase(str(settings.BASE_DIR)) + os.sep
+    frame = sys._getframe(1)
+    while frame is not None:
+        filename = os.path.normcase(os.path.abspath(frame.f_code.co_filename))
+        if filename.startswith(root) and filename != _THIS_FILE and 'site-packages' not in filename:
+            return f'{os.path.relpath(filename, root)}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return None
+
+
+def _current_view():
+    request = _current_request.get()
+    if request is None:
+        return None, None
+    match = getattr(request, 'resolver_match', None)
+    return (match._func_path if match is not None else None), request.path
+
+
+def _write(record, config):
+    global _file_handler
+    if not config['LOG_FILE']:
+        return
+    with _lock:
+        if _file_handler is None:
+            path = Path(config['LOG_FILE'])
+            path.parent.mkdir(parents=True, exist_ok=True)
+            _file_handler = RotatingFileHandler(
+                path, maxBytes=config['MAX_FILE_BYTES'], backupCount=config['BACKUP_COUNT'], delay=True
+            )
+        handler = _file_handler
+    handler.handle(logging.makeLogRecord({'msg': json.dumps(record, default=str)}))
+
+
+def record_slow_query(sql, duration_ms, many, alias, config):
+    normalized = normalize_sql(sql)
+    view, path = _current_view()
+    record = {
+        'time': datetime.now(timezone.utc).isoformat(),
+        'fingerprint': fingerprint(normalized),
+        'sql': normalized,
+        'duration_ms': round(duration_ms, 3),
+        'many': many,
+        'alias': alias,
+        'view': view,
+        'path': path,
+        'call_site': _project_call_site(),
+    }
+    _buffer.append(record)
+    try:
+        _write(record, config)
+    except OSError:
+        logger.exception("Could not write to the slow query log")
+    return record
+
+
+def slow_query_wrapper(execute, sql, params, many, context):
+    config = _config or get_slow_query_settings()
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration_ms = (time.perf_counter() - start) * 1000
+        if duration_ms >= config['THRESHOLD_MS']:
+            record_slow_query(sql, duration_ms, many, context['connection'].alias, config)
+
+
+@receiver(connection_created)
+def _install_wrapper(sender, connection, **kwargs):
+    # Sent again whenever the connection reconnects
+    if get_slow_query_settings()['ENABLED'] and slow_query_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, slow_query_wrapper)
+
+
+def recent_slow_queries():
+    """The slow queries of this process, oldest first."""
+    return list(_buffer)
+
+
+class SlowQueryMiddleware:
+    """
+    Remembers the request being served, so slow queries are attributed to
+    its view.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not get_slow_query_settings()['ENABLED']:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = _current_request.set(request)
+        try:
+            return self.get_response(request)
+        finally:
+            _current_request.reset(token)
+
+    async def __acall__(self, request):
+        token = _current_request.set(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            _current_request.reset(token)
@@ -0,0 +1,265 @@
+import asyncio
+import datetime
+import io
+import json
+import os
+import tempfile
+import threading
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import SimpleTestCase, RequestFactory, TestCase, override_settings
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+from rest_framework.renderers import JSONRenderer
+
+from .admission import (
+    AdmissionController, AdmissionControlMiddleware,
+    STAFF_WRITE, STAFF_READ, PUBLIC_WRITE, PUBLIC_READ,
+)
+from . import renderers, settings_api
+from .profiling import ProfilingMiddleware, enforce_retention
+from .slow_queries import normalize_sql, recent_slow_queries
+from .renderers import FastJSONRenderer, JSONFragment
+from .views import OpenAPISchemaFileView
+from users.models import StaffUser
+
+
+class AdmissionControllerTests(SimpleTestCase):
+    def setUp(self):
+        self.controller = AdmissionController({
+            STAFF_WRITE: (1, 2), STAFF_READ: (1, 1),
+            PUBLIC_WRITE: (1, 1), PUBLIC_READ: (1, 0),
+        })
+
+    def test_public_reads_are_shed_first(self):
+        self.assertTrue(self.controller.enter(PUBLIC_READ, timeout=0))
+        # No queue for public reads: the next one is shed immediately
+        self.assertFalse(self.controller.enter(PUBLIC_READ, timeout=0))
+        stats = self.controller.stats()[PUBLIC_READ]
+        self.assertEqual((stats['active'], stats['shed']), (1, 1))
+
+    def test_public_work_is_shed_while_staff_is_queueing(self):
+        self.assertTrue(self.controller.enter(STAFF_WRITE, timeout=0))
+        waiting = threading.Thread(target=self.controller.enter, args=(STAFF_WRITE, 5))
+        waiting.start()
+        while self.controller.stats()[STAFF_WRITE]['queue_depth'] == 0:
+            pass
+        self.assertFalse(self.controller.enter(PUBLIC_WRITE, timeout=0))
+
+        # Releasing the slot hands it to the queued staff request
+        self.controller.leave(STAFF_WRITE)
+        waiting.join()
+        stats = self.controller.stats()[STAFF_WRITE]
+        self.assertEqual((stats['active'], stats['queue_depth'], stats['admitted']), (1, 0, 2))
+
+    def test_queued_request_times_out_and_is_counted(self):
+        self.assertTrue(self.controller.enter(STAFF_READ, timeout=0))
+        self.assertFalse(self.controller.enter(STAFF_READ, timeout=0.01))
+        stats = self.controller.stats()[STAFF_READ]
+        self.assertEqual((stats['queue_depth'], stats['shed']), (0, 1))
+
+
+    def test_cancelled_waiters_do_not_keep_a_slot(self):
+        async def cancel_while_queued(grant_first):
+            self.assertTrue(await self.controller.aenter(STAFF_WRITE, timeout=0))
+            waiting = asyncio.ensure_future(self.controller.aenter(STAFF_WRITE, timeout=5))
+            await asyncio.sleep(0)
+            if grant_first:
+                # The slot is handed over just before the client goes away
+                self.controller.leave(STAFF_WRITE)
+            waiting.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiting
+            if not grant_first:
+                self.controller.leave(STAFF_WRITE)
+
+        for grant_first in (False, True):
+            asyncio.run(cancel_while_queued(grant_first))
+            stats = self.controller.stats()[STAFF_WRITE]
+            self.assertEqual((stats['active'], stats['queue_depth']), (0, 0))
+
+
+class AdmissionMiddlewareTests(SimpleTestCase):
+    def test_classification_and_shed_response(self):
+        middleware = AdmissionControlMiddleware(lambda request: None)
+        factory = RequestFactory()
+        self.assertEqual(middleware.classify(factory.get('/api/restaurants/cafe/menu/')), PUBLIC_READ)
+        self.assertEqual(middleware.classify(factory.post('/api/orders/5/add_items/')), PUBLIC_WRITE)
+        staff = {'HTTP_AUTHORIZATION': f'Bearer {AccessToken()}'}
+        self.assertEqual(middleware.classify(factory.get('/api/kitchen/orders/', **staff)), STAFF_READ)
+        self.assertEqual(middleware.classify(factory.post('/api/cashier/bills/5/pay/', **staff)), STAFF_WRITE)
+        self.assertIsNone(middleware.classify(factory.get('/admin/')))
+
+        # Without a valid token a staff path is public traffic
+        self.assertEqual(middleware.classify(factory.get('/api/kitchen/orders/')), PUBLIC_READ)
+        self.assertEqual(middleware.classify(factory.post('/api/auth/login/')), PUBLIC_WRITE)
+        forged = {'HTTP_AUTHORIZATION': 'Bearer not.a.token'}
+        self.assertEqual(middleware.classify(factory.post('/api/cashier/bills/5/pay/', **forged)), PUBLIC_WRITE)
+
+        response = middleware.shed_response()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '2')
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    payload = {
+        'price': Decimal('249.50'),
+        'created_at': datetime.datetime(2025, 8, 20, 14, 2, 11, 503271, tzinfo=datetime.timezone.utc),
+        'date': datetime.date(2025, 8, 20),
+        'name': 'Paneer \u2028 Tikka – थाली',
+        'items': [{'id': 1, 'quantity': 2, 'ready': None, 'hot': True}],
+        7: 'non-string key',
+    }
+
+    def test_same_bytes_as_the_drf_renderer(self):
+        expected = JSONRenderer().render(self.payload)
+        self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        with mock.patch.object(renderers, 'orjson', None):
+            self.assertEqual(FastJSONRenderer().render(self.payload), expected)
+        self.assertEqual(
+            FastJSONRenderer().render(self.payload, 'application/json; indent=4'),
+            JSONRenderer().render(self.payload, 'application/json; indent=4')
+        )
+
+    def test_fragments_are_spliced_in_unchanged(self):
+        fragment = JSONFragment(b'{"name":"Cached","variants":[{"price":"10.00"}]}')
+        for orjson in (renderers.orjson, None):
+            with mock.patch.object(renderers, 'orjson', orjson):
+                content = FastJSONRenderer().render({'items': [fragment, {'name': 'Fresh'}]})
+            self.assertIn(bytes(fragment), content)
+            self.assertEqual(json.loads(content)['items'][0]['variants'][0]['price'], '10.00')
+
+
+class APIProfileTests(SimpleTestCase):
+    def test_api_profile_drops_the_admin_stack(self):
+        for app in ('jazzmin', 'django.contrib.admin', 'django.contrib.sessions', 'drf_spectacular'):
+            self.assertNotIn(app, settings_api.INSTALLED_APPS)
+        self.assertNotIn('django.middleware.csrf.CsrfViewMiddleware', settings_api.MIDDLEWARE)
+        self.assertNotIn('DEFAULT_SCHEMA_CLASS', settings_api.REST_FRAMEWORK)
+        # Everything the API itself needs is still there
+        for app in ('django.contrib.auth', 'users', 'menu', 'restaurants', 'rest_framework'):
+            self.assertIn(app, settings_api.INSTALLED_APPS)
+        self.assertEqual(settings_api.MIDDLEWARE[0], 'restromanager.admission.AdmissionControlMiddleware')
+
+    def test_prebuilt_schema_is_served_from_the_file(self):
+        view = OpenAPISchemaFileView.as_view()
+        with tempfile.TemporaryDirectory() as directory:
+            schema_file = Path(directory) / 'openapi-schema.yml'
+            with override_settings(OPENAPI_SCHEMA_FILE=schema_file):
+                self.assertEqual(view(RequestFactory().get('/api/schema/')).status_code, 404)
+
+                schema_file.write_text('openapi: 3.0.3\n')
+                response = view(RequestFactory().get('/api/schema/'))
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(b''.join(response.streaming_content), b'openapi: 3.0.3\n')
+
+
+class ProfilingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.admin = StaffUser.objects.create_user(username="profiler", password="pass12345", role="ADMIN")
+        self.chef = StaffUser.objects.create_user(username="cook", password="pass12345", role="CHEF")
+
+    def middleware(self, **config):
+        def view(request):
+            # The same query twice, to be reported as a duplicate
+            for _ in range(2):
+                StaffUser.objects.filter(username="profiler").exists()
+            return HttpResponse("ok")
+
+        with override_settings(PROFILING={'ENABLED': True, 'DIRECTORY': self.directory.name, **config}):
+            return ProfilingMiddleware(view)
+
+    def test_disabled_profiling_leaves_the_stack(self):
+        with override_settings(PROFILING={'ENABLED': False}):
+            with self.assertRaises(MiddlewareNotUsed):
+                ProfilingMiddleware(lambda request: None)
+
+    def test_admin_requests_with_the_header_are_profiled(self):
+        middleware = self.middleware()
+        request = RequestFactory().get('/api/kitchen/orders/', HTTP_X_PROFILE='1')
+        request.user = self.admin
+        response = middleware(request)
+
+        profile_id = response['X-Profile-Id']
+        self.assertTrue((Path(self.directory.name) / f'{profile_id}.prof').exists())
+        summary = json.loads((Path(self.directory.name) / f'{profile_id}.json').read_text())
+        self.assertEqual((summary['path'], summary['status'], summary['query_count']), ('/api/kitchen/orders/', 200, 2))
+        self.assertEqual(summary['duplicate_queries'][0]['count'], 2)
+        self.assertTrue(summary['top_functions'])
+
+    def test_only_admins_can_ask_for_a_profile(self):
+        middleware = self.middleware()
+        request = RequestFactory().get('/api/kitchen/orders/', HTTP_X_PROFILE='1')
+        request.user = self.chef
+        self.assertNotIn('X-Profile-Id', middleware(request))
+
+        # The API authenticates with JWT, not with the session
+        token = RefreshToken.for_user(self.admin).access_token
+        request = RequestFactory().get('/api/kitchen/orders/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION=f'Bearer {token}')
+        self.assertIn('X-Profile-Id', middleware(request))
+        request = RequestFactory().get('/api/kitchen/orders/', HTTP_X_PROFILE='1', HTTP_AUTHORIZATION='Bearer junk')
+        self.assertNotIn('X-Profile-Id', middleware(request))
+
+    def test_sampled_requests_are_profiled_for_anyone(self):
+        middleware = self.middleware(SAMPLE_RATE=1.0)
+        self.assertIn('X-Profile-Id', middleware(RequestFactory().get('/api/restaurants/cafe/menu/')))
+
+    def test_oldest_profiles_are_deleted_past_the_size_limit(self):
+        directory = Path(self.directory.name)
+        for n in range(4):
+            path = directory / f'{n}.json'
+            path.write_text('x' * 100)
+            os.utime(path, (n, n))
+        enforce_retention(directory, 250)
+        self.assertEqual(sorted(path.name for path in directory.iterdir()), ['2.json', '3.json'])
+
+
+class SlowQueryLogTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.log_file = Path(self.directory.name) / 'slow.jsonl'
+
+    def test_sql_is_normalized_into_a_fingerprint(self):
+        self.assertEqual(
+            normalize_sql('SELECT "a"."id" FROM "a"  WHERE "a"."id" IN (%s, %s, %s) AND "a"."name" = \'x\' LIMIT 21'),
+            'SELECT "a"."id" FROM "a" WHERE "a"."id" IN (...) AND "a"."name" = ? LIMIT ?',
+        )
+        self.assertEqual(normalize_sql('SELECT 1 FROM "t1" WHERE "id" IN (%s)'), 'SELECT ? FROM "t1" WHERE "id" IN (...)')
+
+    def test_slow_queries_are_attributed_to_their_view_and_line(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        with override_settings(SLOW_QUERIES={'THRESHOLD_MS': 0, 'LOG_FILE': self.log_file}, CACHES=locmem):
+            self.client.get(reverse('order-detail', kwargs={'order_id': 999}))
+            StaffUser.objects.filter(username="nobody").exists()
+
+        records = [json.loads(line) for line in self.log_file.read_text().splitlines()]
+        self.assertEqual(records, recent_slow_queries()[-len(records):])
+        from_view = [record for record in records if record['view'] == 'menu.views.OrderDetailView']
+        self.assertTrue(from_view)
+        self.assertTrue(from_view[0]['call_site'].startswith('menu/views.py:'))
+        self.assertEqual(from_view[0]['path'], '/api/orders/999/')
+        # Outside of a request there is no view, only the line
+        self.assertIsNone(records[-1]['view'])
+        self.assertTrue(records[-1]['call_site'].startswith('restromanager/tests.py:'))
+
+    def test_report_groups_records_by_fingerprint(self):
+        with override_settings(SLOW_QUERIES={'THRESHOLD_MS': 0, 'LOG_FILE': self.log_file}):
+            for username in ("a", "b", "c"):
+                StaffUser.objects.filter(username=username).exists()
+            StaffUser.objects.count()
+            out = io.StringIO()
+            call_command('slow_query_report', '--json', stdout=out)
+
+        offenders = {offender['sql']: offender for offender in json.loads(out.getvalue())}
+        exists = [offender for sql, offender in offenders.items() if 'WHERE' in sql and 'users_staffuser' in sql]
+        self.assertEqual(exists[0]['count'], 3)
+        self.assertTrue(exists[0]['call_sites'][0][0].startswith('restromanager/tests.py:'))
+
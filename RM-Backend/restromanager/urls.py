@@ -1,18 +1,25 @@
 # restromanager/urls.py
 
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
-from users.views import CustomTokenObtainPairView
-from rest_framework_simplejwt.views import TokenRefreshView
+from . import urls_api
+from .views import OpenAPISchemaFileView
+
+# Serve the schema built at deploy time when there is one, so the full
+# workers do not generate it per request either
+schema_view = (
+    OpenAPISchemaFileView.as_view()
+    if settings.OPENAPI_SCHEMA_FILE.exists()
+    else SpectacularAPIView.as_view()
+)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
 
-    # All API related URLs will now start directly with /api/
-    path('api/', include('menu.urls')),
-    path('api/auth/', include('users.urls')),
-    path('api/auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    *urls_api.api_urlpatterns,
+    path('api/schema/', schema_view, name='schema'),
+    path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'), name='swagger-ui'),
 
-]
\ No newline at end of file
+]
@@ -0,0 +1,27 @@
+# restromanager/urls_api.py
+#
+# The /api/ routes. Used as the URLconf of the API-only worker profile
+# (restromanager.settings_api) and included by restromanager.urls.
+
+from django.urls import path, include
+from users.views import CustomTokenObtainPairView
+from rest_framework_simplejwt.views import TokenRefreshView
+from .views import AdmissionStatsView, OpenAPISchemaFileView, WebSocketStatsView
+
+api_urlpatterns = [
+    # All API related URLs will now start directly with /api/
+    path('api/', include('menu.urls')),
+    path('api/auth/', include('users.urls')),
+    path('api/auth/login/', CustomTokenObtainPairView.as_view(), name='token_obtain_pair'),
+    path('api/auth/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+
+    # Monitoring for the worker that answers the request
+    path('api/ops/admission/', AdmissionStatsView.as_view(), name='ops-admission-stats'),
+    path('api/ops/websockets/', WebSocketStatsView.as_view(), name='ops-websocket-stats'),
+]
+
+urlpatterns = [
+    *api_urlpatterns,
+    # The schema built at deploy time
+    path('api/schema/', OpenAPISchemaFileView.as_view(), name='schema'),
+]
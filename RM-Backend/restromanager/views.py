@@ -0,0 +1,50 @@
+# restromanager/views.py
+
+from django.conf import settings
+from django.http import FileResponse
+from rest_framework import status
+from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from menu.outbound import get_outbound_stats
+from users.permissions import IsRestaurantAdmin
+from .admission import get_admission_stats
+
+class AdmissionStatsView(APIView):
+    """
+    Queue depth, in-flight requests and shed counts of the admission
+    controller of the worker process that answers the request.
+    """
+    permission_classes = [IsAuthenticated, IsRestaurantAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_admission_stats(), status=status.HTTP_200_OK)
+
+class WebSocketStatsView(APIView):
+    """
+    Open WebSocket connections of this worker process and how many events
+    are queued for clients that fall behind.
+    """
+    permission_classes = [IsAuthenticated, IsRestaurantAdmin]
+
+    def get(self, request, *args, **kwargs):
+        return Response(get_outbound_stats(), status=status.HTTP_200_OK)
+
+
+class OpenAPISchemaFileView(APIView):
+    """
+    Serves the OpenAPI schema built at deploy time into OPENAPI_SCHEMA_FILE,
+    instead of generating it for every request.
+    """
+    permission_classes = [AllowAny]
+    authentication_classes = []
+
+    def get(self, request, *args, **kwargs):
+        path = settings.OPENAPI_SCHEMA_FILE
+        if not path.exists():
+            return Response(
+                {'error': 'The API schema has not been built. Run "python manage.py spectacular --file '
+                          f'{path.name}" on deploy.'},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return FileResponse(path.open('rb'), content_type='application/vnd.oai.openapi')
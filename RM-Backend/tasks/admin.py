@@ -0,0 +1,16 @@
+# tasks/admin.py
+
+from django.contrib import admin
+from django.utils import timezone
+from .models import Task
+
+@admin.register(Task)
+class TaskAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_after', 'locked_by', 'updated_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'updated_at')
+    actions = ['retry']
+
+    @admin.action(description="Queue the selected tasks to run again")
+    def retry(self, request, queryset):
+        queryset.update(status=Task.Status.QUEUED, attempts=0, run_after=timezone.now(), locked_by='', locked_at=None)
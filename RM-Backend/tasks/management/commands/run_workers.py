@@ -0,0 +1,28 @@
+import signal
+
+from django.core.management.base import BaseCommand
+
+from tasks.runner import Worker
+
+
+class Command(BaseCommand):
+    help = (
+        'Runs the queued background tasks (tasks.runner) on a pool of '
+        'threads. Start one per machine or container; several can run at '
+        'once. SIGINT or SIGTERM stops claiming tasks and exits once the '
+        'running ones are finished.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--worker-id', help='Name stored on claimed tasks (default host:pid)')
+        parser.add_argument('--until-empty', action='store_true',
+                            help='Exit once no task is due instead of waiting for more')
+
+    def handle(self, *args, **options):
+        worker = Worker(threads=options['threads'], worker_id=options['worker_id'])
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stop())
+        self.stdout.write(f"Worker {worker.worker_id} running tasks on {options['threads']} threads")
+        worker.run(until_empty=options['until_empty'])
+        self.stdout.write(f'Stopped: {worker.succeeded} tasks succeeded, {worker.failed} failed')
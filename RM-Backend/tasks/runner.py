@@ -0,0 +1,210 @@
+# tasks/runner.py
+
+import logging
+import os
+import socket
+import threading
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import DatabaseError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    # Run tasks inline when they are enqueued instead of leaving them to
+    # run_workers (development without a worker, and tests)
+    'EAGER': False,
+    'MAX_ATTEMPTS': 5,
+    # Retry n waits BACKOFF_SECONDS * 2 ** (n - 1), at most MAX_BACKOFF_SECONDS
+    'BACKOFF_SECONDS': 2,
+    'MAX_BACKOFF_SECONDS': 300,
+    # How often an idle worker looks for new tasks
+    'POLL_SECONDS': 0.25,
+    # A RUNNING task not finished after this long is taken to belong to a
+    # worker that died, and is run again
+    'LOCK_TIMEOUT_SECONDS': 300,
+}
+
+_registry = {}
+
+
+def get_task_settings():
+    return {**DEFAULTS, **getattr(settings, 'TASKS', {})}
+
+
+def task(func=None, *, max_attempts=None):
+    """
+    Registers a function as a task. `func.enqueue(*args, **kwargs)` then
+    queues a call of it, which run_workers picks up once the current
+    transaction commits. Arguments must be JSON serialisable (ids rather
+    than model instances), and since a failed call is retried the function
+    should be safe to run more than once.
+    """
+    def register(func):
+        name = f'{func.__module__}.{func.__qualname__}'
+        _registry[name] = func
+        func.task_name = name
+        func.enqueue = lambda *args, **kwargs: enqueue(name, args, kwargs, max_attempts)
+        return func
+
+    return register(func) if func is not None else register
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=None):
+    """
+    Queues a call of the task `name`. The row is written (or in EAGER mode,
+    the task is run) when the current transaction commits, right away
+    outside of one, so a task never runs before the rows it refers to are
+    visible, and nothing is queued by a request that rolls back.
+    """
+    config = get_task_settings()
+    args, kwargs = list(args), dict(kwargs or {})
+    if config['EAGER']:
+        transaction.on_commit(lambda: run_eagerly(name, args, kwargs))
+        return
+    transaction.on_commit(lambda: Task.objects.create(
+        name=name, args=args, kwargs=kwargs,
+        max_attempts=max_attempts or config['MAX_ATTEMPTS'], run_after=timezone.now(),
+    ))
+
+
+def run_eagerly(name, args, kwargs):
+    # Like a worker, a failing task does not fail the request
+    try:
+        _registry[name](*args, **kwargs)
+    except Exception:
+        logger.exception("Task %s failed", name)
+
+
+def backoff(attempts, config):
+    return timedelta(seconds=min(config['BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['MAX_BACKOFF_SECONDS']))
+
+
+def claim_tasks(worker_id, limit, config):
+    """
+    Marks up to `limit` due tasks as RUNNING for this worker and returns
+    them. Each one is claimed with a conditional UPDATE, so two workers
+    (or two processes on SQLite, where SKIP LOCKED is not available) can
+    never both claim the same task.
+    """
+    now = timezone.now()
+    due = Q(status=Task.Status.QUEUED, run_after__lte=now) | Q(
+        status=Task.Status.RUNNING, locked_at__lt=now - timedelta(seconds=config['LOCK_TIMEOUT_SECONDS'])
+    )
+    with transaction.atomic():
+        candidates = list(
+            Task.objects.filter(due).order_by('run_after').select_for_update(skip_locked=True)
+            .values_list('id', 'status', 'locked_at')[:limit]
+        )
+        claimed = []
+        for task_id, task_status, locked_at in candidates:
+            if Task.objects.filter(id=task_id, status=task_status, locked_at=locked_at).update(
+                status=Task.Status.RUNNING, locked_by=worker_id, locked_at=now, attempts=F('attempts') + 1
+            ):
+                claimed.append(task_id)
+    return list(Task.objects.filter(id__in=claimed).order_by('run_after'))
+
+
+def execute(task_row, config):
+    """
+    Runs one claimed task. It is deleted when it succeeds, and queued again
+    after a backoff (or marked FAILED after its last attempt) when it
+    raises. Returns True when it succeeded.
+    """
+    func = _registry.get(task_row.name)
+    try:
+        if func is None:
+            raise LookupError(f"No task is registered as {task_row.name!r}")
+        func(*task_row.args, **task_row.kwargs)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning("Task %s (%s) failed on attempt %s", task_row.id, task_row.name, task_row.attempts)
+        retry = func is not None and task_row.attempts < task_row.max_attempts
+        Task.objects.filter(id=task_row.id, locked_by=task_row.locked_by).update(
+            status=Task.Status.QUEUED if retry else Task.Status.FAILED,
+            run_after=timezone.now() + backoff(task_row.attempts, config) if retry else task_row.run_after,
+            locked_by='', locked_at=None, last_error=error, updated_at=timezone.now(),
+        )
+        return False
+    Task.objects.filter(id=task_row.id, locked_by=task_row.locked_by).delete()
+    return True
+
+
+class Worker:
+    """
+    Claims due tasks and runs them on a pool of `threads` threads. One
+    dispatcher loop does all the polling, so an idle worker costs one
+    indexed query per POLL_SECONDS however many threads it has.
+    """
+
+    def __init__(self, threads=4, worker_id=None):
+        self.threads = threads
+        self.worker_id = worker_id or f'{socket.gethostname()}:{os.getpid()}'
+        self.config = get_task_settings()
+        self.stopping = threading.Event()
+        self.succeeded = 0
+        self.failed = 0
+
+    def stop(self):
+        """Stops claiming tasks; the ones running are finished first."""
+        self.stopping.set()
+
+    def run_task(self, task_row):
+        close_old_connections()
+        try:
+            return execute(task_row, self.config)
+        except DatabaseError:
+            # The outcome could not be saved; the task runs again once its
+            # lock expires
+            logger.exception("Could not finish task %s", task_row.id)
+            return False
+        finally:
+            close_old_connections()
+
+    def run(self, until_empty=False):
+        """
+        Runs tasks until stop() is called, or with `until_empty` until no
+        task is due or running.
+        """
+        running = set()
+        with ThreadPoolExecutor(max_workers=self.threads, thread_name_prefix='task-worker') as pool:
+            while not self.stopping.is_set():
+                finished = {future for future in running if future.done()}
+                for future in finished:
+                    if future.result():
+                        self.succeeded += 1
+                    else:
+                        self.failed += 1
+                running -= finished
+
+                claimed = []
+                free = self.threads - len(running)
+                if free:
+                    try:
+                        claimed = claim_tasks(self.worker_id, free, self.config)
+                    except DatabaseError:
+                        logger.exception("Could not claim tasks")
+                        connection.close()
+                for task_row in claimed:
+                    running.add(pool.submit(self.run_task, task_row))
+
+                if claimed:
+                    continue
+                if until_empty and not running:
+                    break
+                if running:
+                    wait(running, timeout=self.config['POLL_SECONDS'], return_when=FIRST_COMPLETED)
+                else:
+                    self.stopping.wait(self.config['POLL_SECONDS'])
+        for future in running:
+            if future.result():
+                self.succeeded += 1
+            else:
+                self.failed += 1
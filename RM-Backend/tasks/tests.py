@@ -0,0 +1,120 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from .models import Task
+from .runner import Worker, claim_tasks, execute, get_task_settings, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def flaky(value):
+    if value not in calls:
+        calls.append(value)
+        raise RuntimeError("first attempt fails")
+
+
+class TaskQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def claim_one(self):
+        claimed = claim_tasks('test-worker', 1, get_task_settings())
+        self.assertEqual(len(claimed), 1)
+        return claimed[0]
+
+    def test_tasks_are_queued_when_the_transaction_commits(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.enqueue("a")
+            self.assertFalse(Task.objects.exists())
+        self.assertEqual(list(Task.objects.values_list('name', 'args', 'status')),
+                         [(record.task_name, ["a"], Task.Status.QUEUED)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record.enqueue("b")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual(calls, [])
+
+    @override_settings(TASKS={'EAGER': True})
+    def test_eager_tasks_run_inline_once_committed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            record.enqueue("now")
+            self.assertEqual(calls, [])
+        self.assertEqual(calls, ["now"])
+        self.assertFalse(Task.objects.exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            try:
+                with transaction.atomic():
+                    record.enqueue("rolled back")
+                    raise RuntimeError
+            except RuntimeError:
+                pass
+        self.assertEqual(calls, ["now"])
+
+    def test_success_deletes_and_failure_retries_with_backoff(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            flaky.enqueue("x")
+        self.assertFalse(execute(self.claim_one(), get_task_settings()))
+
+        retried = Task.objects.get()
+        self.assertEqual((retried.status, retried.attempts), (Task.Status.QUEUED, 1))
+        self.assertIn("first attempt fails", retried.last_error)
+        self.assertGreater(retried.run_after, timezone.now())
+        # Not due until the backoff is over
+        self.assertEqual(claim_tasks('test-worker', 1, get_task_settings()), [])
+
+        Task.objects.update(run_after=timezone.now())
+        self.assertTrue(execute(self.claim_one(), get_task_settings()))
+        self.assertFalse(Task.objects.exists())
+
+    def test_tasks_fail_after_their_last_attempt(self):
+        Task.objects.create(name=flaky.task_name, args=["y"], max_attempts=1, run_after=timezone.now())
+        Task.objects.create(name='tasks.tests.removed', max_attempts=5, run_after=timezone.now())
+        config = get_task_settings()
+        for task_row in claim_tasks('test-worker', 5, config):
+            execute(task_row, config)
+        self.assertEqual(list(Task.objects.values_list('status', flat=True)), [Task.Status.FAILED] * 2)
+        self.assertIn("No task is registered", Task.objects.get(name='tasks.tests.removed').last_error)
+
+    def test_claimed_tasks_are_not_claimed_again_until_their_lock_expires(self):
+        Task.objects.create(name=record.task_name, args=["z"], max_attempts=5, run_after=timezone.now())
+        claimed = self.claim_one()
+        self.assertEqual((claimed.status, claimed.attempts, claimed.locked_by), (Task.Status.RUNNING, 1, 'test-worker'))
+        self.assertEqual(claim_tasks('other-worker', 5, get_task_settings()), [])
+
+        # The first worker died
+        Task.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        reclaimed = claim_tasks('other-worker', 5, get_task_settings())
+        self.assertEqual([(task_row.locked_by, task_row.attempts) for task_row in reclaimed], [('other-worker', 2)])
+
+
+# The worker threads use their own connections, so the tasks must be
+# committed. One thread: the in-memory test database locks whole tables
+# between connections, and with its only thread busy the worker does not
+# poll while a task runs
+class WorkerTests(TransactionTestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_runs_every_due_task(self):
+        for n in range(10):
+            record.enqueue(n)
+        worker = Worker(threads=1, worker_id='test-worker')
+        worker.run(until_empty=True)
+        self.assertEqual(sorted(calls), list(range(10)))
+        self.assertEqual((worker.succeeded, worker.failed), (10, 0))
+        self.assertFalse(Task.objects.exists())
@@ -2,10 +2,13 @@
 
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from restromanager.admin_mixins import LargeTableAdminMixin
 from .models import StaffUser
 
-class StaffUserAdmin(UserAdmin):
+class StaffUserAdmin(LargeTableAdminMixin, UserAdmin):
     list_display = ('username', 'email', 'role', 'restaurant', 'is_staff')
+    list_select_related = ('restaurant',)
+    autocomplete_fields = ('restaurant',)
     fieldsets = UserAdmin.fieldsets + (
         ('Restaurant Info', {'fields': ('role', 'restaurant')}),
     )
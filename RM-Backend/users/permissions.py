@@ -58,4 +58,19 @@ class IsKitchenStaffOrAdmin(BasePermission):
         is_captain = user_role == 'CAPTAIN' or token_role == 'CAPTAIN'
         
         # Return True if the user is an Admin, Chef, OR Captain
-        return is_admin or is_chef or is_captain
\ No newline at end of file
+        return is_admin or is_chef or is_captain
+
+class IsRestaurantAdmin(BasePermission):
+    """
+    Allows access only to authenticated Restaurant Admins.
+    """
+    def has_permission(self, request, view):
+        return getattr(request.user, 'role', None) == 'ADMIN'
+
+class IsPlatformAdmin(BasePermission):
+    """
+    Allows access only to the platform super-admins (Django superusers),
+    who see every restaurant.
+    """
+    def has_permission(self, request, view):
+        return bool(getattr(request.user, 'is_superuser', False))
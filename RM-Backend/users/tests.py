@@ -1,3 +1,30 @@
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
 
-# Create your tests here.
+from restaurants.models import Restaurant
+from .models import StaffUser
+
+
+class StaffUserAdminTests(TestCase):
+    def setUp(self):
+        self.client.force_login(StaffUser.objects.create_superuser(username="root", password="pass12345", email=""))
+
+    def count_queries(self, url):
+        # Warm the per-process caches (content types) first
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_changelist_does_not_query_per_row(self):
+        url = reverse('admin:users_staffuser_changelist')
+        single = self.count_queries(url)
+        for i in range(5):
+            restaurant = Restaurant.objects.create(
+                name=f"Diner {i}", slug=f"diner-{i}", latitude=10.0, longitude=10.0
+            )
+            StaffUser.objects.create_user(username=f"chef-{i}", password="pass12345", role="CHEF", restaurant=restaurant)
+        self.assertEqual(self.count_queries(url), single)
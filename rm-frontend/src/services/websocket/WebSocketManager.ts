@@ -8,6 +8,9 @@ class WebSocketManager {
   private reconnectAttempts = 0;
   private maxReconnectAttempts = 5;
   private reconnectTimeout: NodeJS.Timeout | null = null;
+  // The server sends a bounded number of frames until they are acked
+  private lastSeq = 0;
+  private ackTimeout: NodeJS.Timeout | null = null;
   private currentConfig: {
     role: UserRole;
     restaurantSlug?: string;
@@ -26,9 +29,13 @@ class WebSocketManager {
       case 'CHEF':
         wsUrl = `${WS_BASE_URL}/chef/${restaurantSlug}/`;
         break;
-      case 'CASHIER':
-        wsUrl = `${WS_BASE_URL}/cashier/${restaurantSlug}/`;
+      case 'CASHIER': {
+        // The cashier feed carries every open bill, so the server checks
+        // the staff token before accepting the connection
+        const token = localStorage.getItem('token') || '';
+        wsUrl = `${WS_BASE_URL}/cashier/${restaurantSlug}/?token=${encodeURIComponent(token)}`;
         break;
+      }
       case 'CUSTOMER': // Explicitly handle CUSTOMER role
         if (billId) {
           // --- THIS IS THE FIX ---
@@ -45,6 +52,7 @@ class WebSocketManager {
     }
 
     this.disconnect(); // Ensure any old connection is closed
+    this.lastSeq = 0;
     this.socket = new WebSocket(wsUrl);
     this.setupEventHandlers();
   }
@@ -62,6 +70,9 @@ class WebSocketManager {
         const data = JSON.parse(event.data);
         console.log('📨 WebSocket raw message received:', data); // 🔥 ADD: Debug logging
         this.notifyListeners(data);
+        if (typeof data.seq === 'number') {
+          this.scheduleAck(data.seq);
+        }
       } catch (error) {
         console.error('❌ Failed to parse WebSocket message:', error, 'Raw:', event.data);
       }
@@ -105,6 +116,18 @@ class WebSocketManager {
     }, delay);
   }
 
+  // Frames that arrive together are acknowledged with a single ack
+  private scheduleAck(seq: number): void {
+    this.lastSeq = Math.max(this.lastSeq, seq);
+    if (this.ackTimeout) return;
+    this.ackTimeout = setTimeout(() => {
+      this.ackTimeout = null;
+      if (this.socket && this.socket.readyState === WebSocket.OPEN) {
+        this.socket.send(JSON.stringify({ type: 'ack', seq: this.lastSeq }));
+      }
+    }, 0);
+  }
+
   addListener(key: string, callback: WebSocketCallback): void {
     this.listeners.set(key, callback);
   }
@@ -136,6 +159,10 @@ class WebSocketManager {
       clearTimeout(this.reconnectTimeout);
       this.reconnectTimeout = null;
     }
+    if (this.ackTimeout) {
+      clearTimeout(this.ackTimeout);
+      this.ackTimeout = null;
+    }
     
     if (this.socket) {
       // Remove event listeners before closing to prevent reconnect attempts on manual disconnect